@@ -1491,7 +1491,7 @@ public function convertToHtml(Request $request, Document $document)
             
             // Log sample content for debugging
             $sampleText = '';
-            if (preg_match('/<div[^>]*class="pdf-text"[^>]*>(.*?)<\/div>/s', $html, $matches)) {
+            if (preg_match('/<div[^>]*class="pdf-text(?:\s[^"]*)?"[^>]*>(.*?)<\/div>/s', $html, $matches)) {
                 $sampleText = substr(strip_tags($matches[1]), 0, 100);
             }
             
@@ -1539,7 +1539,7 @@ private function convertPdfToEditableHtml(Request $request, $pdfPath, Document $
             
             // Debug logging
             $pageCount = substr_count($html, 'data-page="');
-            $textElements = substr_count($html, 'class="pdf-text"');
+            $textElements = preg_match_all('/class="pdf-text(?:\s[^"]*)?"/', $html);
             $editableElements = substr_count($html, 'contenteditable');
             
             Log::info('Successfully converted PDF with Universal converter', [
@@ -2551,9 +2551,10 @@ private function renderEditableContent($content, $mode = 'combined')
             }
 
             // Process images to add proper containers and controls
+            // (extra classes may follow pdf-image in the class attribute)
             $imageIndex = 0;
             $editableHtml = preg_replace_callback(
-                '/<img([^>]*?)class="pdf-image"([^>]*?)\/?>/',
+                '/<img([^>]*?)class="pdf-image(?:\s[^"]*)?"([^>]*?)\/?>/',
                 function ($matches) use (&$imageIndex) {
                     $imgTag = $matches[0];
                     $attributes1 = $matches[1];
@@ -2587,7 +2588,7 @@ function ($matches) use (&$imageIndex) {
                     
                     // Keep the img tag simple with just the source
                     $imgTagClean = preg_replace('/style="[^"]*"/', '', $imgTag);
-                    $imgTagClean = str_replace('class="pdf-image"', 'class="pdf-image" id="image_' . $imageIndex . '" style="' . $imgStyle . 'display:block;"', $imgTagClean);
+                    $imgTagClean = preg_replace('/class="(pdf-image(?:\s[^"]*)?)"/', 'class="$1" id="image_' . $imageIndex . '" style="' . $imgStyle . 'display:block;"', $imgTagClean, 1);
                     
                     $wrappedImg .= $imgTagClean;
                     
@@ -2611,7 +2612,8 @@ function ($matches) use (&$imageIndex) {
             );
 
             // Make text content editable
-            $editableHtml = preg_replace('/<span([^>]*?)class="pdf-text"([^>]*?)>/', '<span$1class="pdf-text"$2 contenteditable="true">', $editableHtml);
+            // Spans carry their generated style class after pdf-text (class="pdf-text t3")
+            $editableHtml = preg_replace('/<span([^>]*?)class="(pdf-text(?:\s[^"]*)?)"([^>]*?)>/', '<span$1class="$2"$3 contenteditable="true">', $editableHtml);
 
             // Ensure tables are editable
             $editableHtml = preg_replace('/<td([^>]*)>/i', '<td$1 contenteditable="true">', $editableHtml);
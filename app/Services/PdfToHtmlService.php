@@ -6,16 +6,24 @@
 use Illuminate\Support\Facades\Config;
 use Illuminate\Support\Facades\File;
 use Illuminate\Support\Facades\Log;
+use Symfony\Component\Process\Exception\ProcessTimedOutException;
 use Symfony\Component\Process\Process;
 
 class PdfToHtmlService
 {
+    /**
+     * Seconds the PHP process limit adds to the Python chain budget, covering
+     * interpreter startup and the final write of the output.
+     */
+    private const CHAIN_TIMEOUT_MARGIN = 15;
+
     /**
      * Convert PDF to structured HTML using the configured PyMuPDF script.
      *
      * @param string $pdfPath Path to the PDF file.
      * @param int|null $documentId The document ID, used for storing associated images.
-     * @param string|null $version The specific converter version to use (e.g., 'v11', 'v10').
+     * @param string|null $version The specific converter version to use (e.g., 'v11', 'v10'), or 'auto' to
+     *                             pick it from a probe of the document. Null walks the fallback chain.
      * @return array The structured HTML content or an error structure.
      */
     public function convertPdfToStructuredHtml($pdfPath, $documentId = null, $version = null)
@@ -90,8 +98,27 @@ private function extractWithPyMuPDF($pdfPath, $documentId = null, $requestedVers
     {
         $imageDir = $this->prepareImageDirectory($documentId);
 
+        $entryPoint = null;
+        if (Config::get('pdf_converter.in_process', false)) {
+            $entryPoint = Config::get('pdf_converter.entry_point');
+
+            if (! $entryPoint || ! File::exists($entryPoint)) {
+                Log::warning('Converter entry point not found, running the converter scripts one by one.', ['path' => $entryPoint]);
+                $entryPoint = null;
+            }
+        }
+
+        // The entry point probes the document itself, the per-script loop needs the choice up front
+        if ($requestedVersion === 'auto' && ! $entryPoint) {
+            $requestedVersion = $this->probeConverter($pdfPath);
+        }
+
         $convertersToTry = $this->getConverterChain($requestedVersion);
 
+        if ($entryPoint) {
+            return $this->extractWithConverterChain($entryPoint, $pdfPath, $imageDir, $convertersToTry, $documentId);
+        }
+
         foreach ($convertersToTry as $versionKey) {
             $scriptPath = Config::get("pdf_converter.converters.{$versionKey}");
 
@@ -109,7 +136,24 @@ private function extractWithPyMuPDF($pdfPath, $documentId = null, $requestedVers
             ]);
 
             $process->setTimeout(120); // 2 minutes timeout
-            $process->run();
+            $timedOut = false;
+            try {
+                $process->run();
+            } catch (ProcessTimedOutException $e) {
+                $timedOut = true;
+            }
+
+            // Pages are written out as they are converted: after a timeout the completed ones are kept
+            if ($timedOut) {
+                $output = $process->getOutput();
+                if ($output && strpos($output, '<div') !== false) {
+                    Log::warning("PyMuPDF conversion with {$versionKey} timed out, keeping the pages converted so far.", [
+                        'output_length' => strlen($output),
+                    ]);
+
+                    return $documentId ? $this->fixImagePaths($output, $documentId, $imageDir) : $output;
+                }
+            }
 
             if ($process->isSuccessful()) {
                 $output = $process->getOutput();
@@ -139,6 +183,93 @@ private function extractWithPyMuPDF($pdfPath, $documentId = null, $requestedVers
         return null;
     }
 
+    /**
+     * Run the whole converter chain in a single Python process.
+     *
+     * The entry point opens the PDF once and tries each converter in order,
+     * reporting the winning converter and the timing of every attempt.
+     *
+     * @param string $entryPoint
+     * @param string $pdfPath
+     * @param string $imageDir
+     * @param array $convertersToTry
+     * @param int|null $documentId
+     * @return string|null The resulting HTML, or null on failure.
+     */
+    private function extractWithConverterChain($entryPoint, $pdfPath, $imageDir, array $convertersToTry, $documentId = null)
+    {
+        $timeout = Config::get('pdf_converter.timeout', 120);
+
+        $process = new Process([
+            'python3',
+            $entryPoint,
+            $pdfPath,
+            $imageDir,
+            '--chain=' . implode(',', $convertersToTry),
+            '--timeout=' . $timeout,
+            '--strategy-timeout=' . Config::get('pdf_converter.strategy_timeout', 60),
+        ]);
+
+        // The entry point stops each converter itself and finishes within the chain budget,
+        // but a long native MuPDF call cannot be interrupted: PHP keeps a hard limit beyond it
+        $process->setTimeout($timeout + self::CHAIN_TIMEOUT_MARGIN);
+        $timedOut = false;
+        try {
+            $process->run();
+        } catch (ProcessTimedOutException $e) {
+            $timedOut = true;
+        }
+
+        // Pages are written out as they are converted: after a timeout the completed ones are kept
+        if ($timedOut) {
+            $output = $process->getOutput();
+            if ($output && strpos($output, '<div') !== false) {
+                Log::warning('Converter chain timed out, keeping the pages converted so far.', [
+                    'output_length' => strlen($output),
+                ]);
+
+                return $documentId ? $this->fixImagePaths($output, $documentId, $imageDir) : $output;
+            }
+        }
+
+        $errorOutput = $process->getErrorOutput();
+        $report = null;
+        if (preg_match('/^Converter report: (.+)$/m', $errorOutput, $matches)) {
+            $report = json_decode($matches[1], true);
+        }
+
+        if (isset($report['probe'])) {
+            Log::info("Converter probe chose {$report['probe']['strategy']}.", [
+                'reasons' => $report['probe']['reasons'],
+                'metrics' => $report['probe']['metrics'],
+            ]);
+        }
+
+        if ($process->isSuccessful()) {
+            $output = $process->getOutput();
+            if ($output && (strpos($output, '<style>') !== false || strpos($output, '<div') !== false)) {
+                Log::info('Successfully converted PDF using ' . ($report['strategy'] ?? 'the converter chain') . '.', [
+                    'attempts' => $report['attempts'] ?? [],
+                ]);
+
+                if ($documentId) {
+                    $output = $this->fixImagePaths($output, $documentId, $imageDir);
+                }
+
+                return $output;
+            }
+        }
+
+        Log::error('All PDF conversion attempts failed.', [
+            'pdf_path' => $pdfPath,
+            'exit_code' => $process->getExitCode(),
+            'attempts' => $report['attempts'] ?? [],
+            'error' => substr($errorOutput, 0, 1000),
+        ]);
+
+        return null;
+    }
+
     /**
      * Prepare and return the directory path for storing images.
      *
@@ -159,6 +290,44 @@ private function prepareImageDirectory($documentId = null)
         return $imageDir;
     }
 
+    /**
+     * Choose a converter from a few sampled pages of the PDF.
+     *
+     * Falls back to the first converter of the fallback chain when the probe fails.
+     *
+     * @param string $pdfPath
+     * @return string|null
+     */
+    private function probeConverter($pdfPath)
+    {
+        $fallback = Config::get('pdf_converter.fallback_chain', [])[0] ?? null;
+
+        $process = new Process([
+            'python3',
+            resource_path('scripts/python/converter_probe.py'),
+            $pdfPath,
+        ]);
+        $process->setTimeout(30);
+        $process->run();
+
+        $probe = json_decode($process->getOutput(), true);
+        if (! $process->isSuccessful() || empty($probe['success'])) {
+            Log::warning('Converter probe failed.', [
+                'pdf_path' => $pdfPath,
+                'error' => $probe['error'] ?? substr($process->getErrorOutput(), 0, 1000),
+            ]);
+
+            return $fallback;
+        }
+
+        Log::info("Converter probe chose {$probe['strategy']}.", [
+            'reasons' => $probe['reasons'],
+            'metrics' => $probe['metrics'],
+        ]);
+
+        return $probe['strategy'];
+    }
+
     /**
      * Determines the order of converters to try.
      *
@@ -169,6 +338,11 @@ private function getConverterChain($requestedVersion = null)
     {
         $fallbackChain = Config::get('pdf_converter.fallback_chain', []);
 
+        if ($requestedVersion === 'auto') {
+            // Resolved by the converter entry point from a probe of the document
+            return array_merge(['auto'], $fallbackChain);
+        }
+
         if ($requestedVersion && in_array($requestedVersion, $fallbackChain)) {
             // Prioritize the requested version
             $chain = [$requestedVersion];
@@ -220,6 +394,10 @@ function ($matches) use ($documentId, $imageDir) {
                         $newSrc = "/documents/{$documentId}/assets/" . basename($src);
                         Log::debug("Fixed image path", ['original' => $src, 'new' => $newSrc]);
 
+                        // Multi-resolution backgrounds list their files in srcset too
+                        $beforeSrc = $this->fixSrcsetPaths($beforeSrc, $documentId);
+                        $afterSrc = $this->fixSrcsetPaths($afterSrc, $documentId);
+
                         return "<img{$beforeSrc}src=\"{$newSrc}\"{$afterSrc}>";
                     }
                 }
@@ -230,6 +408,30 @@ function ($matches) use ($documentId, $imageDir) {
         );
     }
 
+    /**
+     * Replace the file names of a srcset attribute with route-based URLs
+     */
+    private function fixSrcsetPaths($attributes, $documentId)
+    {
+        return preg_replace_callback(
+            '/srcset="([^"]*)"/i',
+            function ($matches) use ($documentId) {
+                $candidates = array_map(function ($candidate) use ($documentId) {
+                    $parts = preg_split('/\s+/', trim($candidate), 2);
+                    if ($parts[0] === '' || str_contains($parts[0], '/') || strpos($parts[0], 'data:') === 0) {
+                        return trim($candidate);
+                    }
+                    $parts[0] = "/documents/{$documentId}/assets/" . basename($parts[0]);
+
+                    return implode(' ', $parts);
+                }, explode(',', $matches[1]));
+
+                return 'srcset="' . implode(', ', $candidates) . '"';
+            },
+            $attributes
+        );
+    }
+
     /**
      * Extract content using the base64 converter for self-contained HTML.
      *
@@ -257,9 +459,18 @@ private function extractWithBase64Converter($pdfPath)
         ]);
 
         $process->setTimeout(120); // 2 minutes timeout
-        $process->run();
+        $timedOut = false;
+        try {
+            $process->run();
+        } catch (ProcessTimedOutException $e) {
+            // Pages are written out as they are converted: keep the completed ones
+            $timedOut = true;
+            Log::warning('Base64 conversion timed out, keeping the pages converted so far.', [
+                'output_length' => strlen($process->getOutput()),
+            ]);
+        }
 
-        if ($process->isSuccessful()) {
+        if ($process->isSuccessful() || $timedOut) {
             $output = $process->getOutput();
             if ($output && strpos($output, '<!DOCTYPE html>') !== false) {
                 Log::info("Successfully converted PDF to self-contained HTML with base64 images.");
@@ -235,6 +235,14 @@ private function removeBlankPages($pdfPath)
 import sys
 import fitz  # PyMuPDF
 
+# Use the shared page classifier when the scripts directory is given
+if len(sys.argv) > 2:
+    sys.path.insert(0, sys.argv[2])
+try:
+    from page_classifier import classify_page, PAGE_BLANK
+except ImportError:
+    classify_page = None
+
 def remove_blank_pages(pdf_path):
     try:
         doc = fitz.open(pdf_path)
@@ -243,21 +251,26 @@ private function removeBlankPages($pdfPath)
         for page_num in range(len(doc)):
             page = doc[page_num]
             
-            # Check if page has content
-            # A page is considered blank if it has very little text and no images
-            text = page.get_text().strip()
-            images = page.get_images()
-            drawings = page.get_drawings()
-            
-            # Page is not blank if it has:
-            # - More than 10 characters of text
-            # - Any images
-            # - Any vector drawings
-            has_content = (
-                len(text) > 10 or 
-                len(images) > 0 or 
-                len(drawings) > 0
-            )
+            if classify_page:
+                # Blank means no text, no images and no vector drawings:
+                # pages are never deleted on how they render
+                has_content = classify_page(page)['type'] != PAGE_BLANK
+            else:
+                # Check if page has content
+                # A page is considered blank if it has very little text and no images
+                text = page.get_text().strip()
+                images = page.get_images()
+                drawings = page.get_drawings()
+                
+                # Page is not blank if it has:
+                # - More than 10 characters of text
+                # - Any images
+                # - Any vector drawings
+                has_content = (
+                    len(text) > 10 or 
+                    len(images) > 0 or 
+                    len(drawings) > 0
+                )
             
             if has_content:
                 non_blank_pages.append(page_num)
@@ -311,9 +324,10 @@ private function removeBlankPages($pdfPath)
         
         // Execute Python script
         $command = sprintf(
-            'python3 %s %s 2>&1',
+            'python3 %s %s %s 2>&1',
             escapeshellarg($scriptFile),
-            escapeshellarg($pdfPath)
+            escapeshellarg($pdfPath),
+            escapeshellarg(resource_path('scripts/python'))
         );
         
         exec($command, $output, $returnCode);
@@ -9,6 +9,11 @@
     | Specifies the default converter version to use. This can be any of the
     | keys defined in the 'converters' array below.
     |
+    | Conversions requested without a version walk the 'fallback_chain' below.
+    | Requesting the 'auto' version lets a probe of a few sampled pages pick
+    | the fastest converter suited to the content (scanned, vector-heavy or
+    | text documents), with the fallback chain behind it.
+    |
     */
     'default_converter' => env('PDF_CONVERTER_VERSION', 'v10'),
 
@@ -48,4 +53,28 @@
         'v7',
         'v2',
     ],
+
+    /*
+    |--------------------------------------------------------------------------
+    | In-Process Fallback
+    |--------------------------------------------------------------------------
+    |
+    | When enabled, the whole chain runs in a single Python process through
+    | the unified entry point: the PDF is opened once, page caches are shared
+    | between attempts and a failing converter does not cost a new process.
+    | The per-script loop is used when disabled or when the entry point is
+    | missing.
+    |
+    | In-process, 'timeout' is the limit of the whole chain and each
+    | converter is stopped after 'strategy_timeout' seconds (or when the
+    | chain budget runs out) so the next one still gets its turn.
+    |
+    */
+    'in_process' => env('PDF_CONVERTER_IN_PROCESS', false),
+
+    'entry_point' => resource_path('scripts/python/pymupdf_converter.py'),
+
+    'timeout' => 120,
+
+    'strategy_timeout' => 60,
 ];
@@ -28,16 +28,32 @@ export class PDFEditorCore {
      */
     init(container) {
         this.container = container;
+        this.resolveImageReferences();
         this.scanExistingElements();
         this.attachGlobalListeners();
         this.createOverlayCanvas();
     }
 
     /**
-     * Scan and register all existing PDF elements
+     * Fill in the src of images deduplicated by the base64 converter
+     * (<img data-image-ref="pdf-img-N"> pointing at <template id="pdf-img-N">),
+     * in the whole container or only under root
      */
-    scanExistingElements() {
-        const elements = this.container.querySelectorAll('.pdf-text, .pdf-image, .pdf-vector, .pdf-table');
+    resolveImageReferences(root = this.container) {
+        root.querySelectorAll('img.pdf-image[data-image-ref]:not([src])').forEach(img => {
+            const definition = this.container.querySelector(`template[id="${img.dataset.imageRef}"]`);
+            const source = definition && definition.content.querySelector('img');
+            if (source) {
+                img.setAttribute('src', source.getAttribute('src'));
+            }
+        });
+    }
+
+    /**
+     * Scan and register all existing PDF elements (only those under root when given)
+     */
+    scanExistingElements(root = this.container) {
+        const elements = root.querySelectorAll('.pdf-text, .pdf-image, .pdf-vector, .pdf-table');
         elements.forEach(el => {
             const id = el.dataset.elementId || this.generateId();
             el.dataset.elementId = id;
@@ -1383,8 +1399,8 @@ export class PDFEditorCore {
         const styleMap = new Map();
         
         // Get all PDF elements from the original container
-        // Include all images, vectors, lines, tables, annotations, highlights and added elements
-        const originalElements = this.container.querySelectorAll('.pdf-text, .pdf-image, .pdf-vector, .pdf-line, .pdf-added, .pdf-table-wrapper, .pdf-annotation, .pdf-highlight, img, svg, div[data-line="true"]');
+        // Include all images, vectors, lines, tables, annotations, highlights, paragraphs and added elements
+        const originalElements = this.container.querySelectorAll('.pdf-text, .pdf-paragraph, .pdf-image, .pdf-vector, .pdf-line, .pdf-added, .pdf-table-wrapper, .pdf-annotation, .pdf-highlight, img, svg, div[data-line="true"]');
         originalElements.forEach(el => {
             const id = Math.random().toString(36).substr(2, 9);
             el.dataset.tempId = id;
@@ -1392,9 +1408,11 @@ export class PDFEditorCore {
             // Get the computed styles from the REAL element
             const computed = window.getComputedStyle(el);
             const rect = el.getBoundingClientRect();
-            const containerRect = this.container.getBoundingClientRect();
+            // Runs of a paragraph (--paragraphs output) are positioned inside it, not in the container
+            const paragraph = el.parentElement && el.parentElement.closest('.pdf-paragraph');
+            const containerRect = (paragraph || this.container).getBoundingClientRect();
             
-            // Calculate absolute positions relative to container
+            // Calculate absolute positions relative to container (or paragraph)
             const relativeLeft = rect.left - containerRect.left;
             const relativeTop = rect.top - containerRect.top;
             
@@ -2042,6 +2060,15 @@ body { margin: 0; padding: 20px; background: #f5f5f5; }
     }
     
     attachGlobalListeners() {
+        // Pages inserted lazily by the split output of the base64 converter
+        document.addEventListener('pdf-page-loaded', (e) => {
+            const page = e.detail && e.detail.page;
+            if (page && this.container.contains(page)) {
+                this.resolveImageReferences(page);
+                this.scanExistingElements(page);
+            }
+        });
+        
         // Selection box variables
         let isSelecting = false;
         let selectionBox = null;
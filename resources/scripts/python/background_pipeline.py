@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Text-free page background pipeline for the background-render converters
+
+The converters used to copy each page into a temporary document, redact its
+spans, render it and close it again. This pipeline copies the document once,
+redacts every page of the copy as the converter walks the pages (reusing the
+text dict the converter needs for its text overlay anyway). Streaming
+converters render each background before the page referencing it is
+written out (render_page), so a run cut short by a timeout leaves no page
+pointing at a missing file. Rendering happens in the converter process: the
+copy is modified page by page as the converter goes, so there is no
+finished text-free document a worker pool could render ahead from.
+
+Two engines hide the text:
+- "redact": one redaction annotation per span, then apply_redactions
+  (the historical behaviour),
+- "strip": the text-showing operators are removed from the page and form
+  XObject content streams, nested forms included (content_stream.strip_text).
+  Linear in the content size, no span geometry, and graphics overlapping
+  the text are untouched.
+
+Backgrounds of pages without drawings or images (nor text, when the text
+is kept) can be skipped, and each
+background can be written at several densities (1x, 2x...) for an srcset,
+in any format of image_encoding.py.
+"""
+
+import os
+import re
+
+import fitz  # PyMuPDF
+
+from content_stream import strip_text
+from image_encoding import ImageEncoder, FORMATS, FORMAT_AUTO, FORMAT_PNG, DEFAULT_QUALITY, FILE_EXTENSIONS
+from page_classifier import drawing_count
+from pixmap_utils import is_blank_pixmap
+
+HIDE_TEXT_REDACT = 'redact'
+HIDE_TEXT_STRIP = 'strip'
+
+HIDE_TEXT_ENGINES = (HIDE_TEXT_REDACT, HIDE_TEXT_STRIP)
+
+# Render the pages as they are (full-page renders under a transparent text layer)
+KEEP_TEXT = 'none'
+
+# Resolution of the preview used for format choice and for the blank check
+# of pages without drawings or images (shadings)
+PREVIEW_ZOOM = 0.25
+
+# Indirect object reference in a PDF dictionary
+REFERENCE = re.compile(r"(\d+)\s+\d+\s+R")
+
+
+def split_background_options(argv):
+    """Separate the background options from the positional arguments.
+
+    Recognises --hide-text=<engine>, --background-format=<format> and
+    --background-quality=<n>. Returns (positional_args, options) where
+    options has the keys hide_text, image_format and image_quality; the
+    converters keep their historical "script.py pdf_file image_dir
+    [output_html]" command line.
+    """
+    options = {'hide_text': HIDE_TEXT_REDACT, 'image_format': FORMAT_PNG, 'image_quality': DEFAULT_QUALITY}
+    args = []
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name == '--hide-text':
+            if value not in HIDE_TEXT_ENGINES:
+                raise ValueError(f'Unknown text hiding engine: {value} (expected one of {", ".join(HIDE_TEXT_ENGINES)})')
+            options['hide_text'] = value
+        elif name == '--background-format':
+            if value not in FORMATS:
+                raise ValueError(f'Unknown background format: {value} (expected one of {", ".join(FORMATS)})')
+            options['image_format'] = value
+        elif name == '--background-quality':
+            options['image_quality'] = int(value)
+        else:
+            args.append(arg)
+    return args, options
+
+
+def iter_spans(text_dict):
+    """Yield the spans of a page text dict"""
+    for block in text_dict.get("blocks", []):
+        if block.get("type") == 0:
+            for line in block.get("lines", []):
+                yield from line.get("spans", [])
+
+
+def _xobject_refs(doc, xref):
+    """xrefs listed in the /Resources /XObject dictionary of a form (direct or indirect)"""
+    kind, value = doc.xref_get_key(xref, "Resources/XObject")
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    elif kind != "dict":
+        return []
+    return [int(ref) for ref in REFERENCE.findall(value)]
+
+
+def _iter_forms(doc, xrefs, seen):
+    """Yield the form XObjects among xrefs and the forms they draw, recursively.
+
+    xrefs already in seen are skipped, yielded ones are added to it: shared
+    and self-referencing forms come out once.
+    """
+    pending = list(xrefs)
+    while pending:
+        xref = pending.pop()
+        if xref in seen:
+            continue
+        seen.add(xref)
+        if doc.xref_get_key(xref, "Subtype") != ("name", "/Form"):
+            continue
+        yield xref
+        pending.extend(_xobject_refs(doc, xref))
+
+
+def _render_page(page, outputs, encoder):
+    """Render a page once at the highest density and write every output.
+
+    outputs: (density, path, format) tuples sorted by increasing density.
+    Lower densities are downscaled from the highest render.
+    """
+    top = outputs[-1][0]
+    pix = page.get_pixmap(matrix=fitz.Matrix(top, top), alpha=False)
+    for density, path, fmt in outputs:
+        scaled = pix
+        if density != top:
+            scaled = fitz.Pixmap(pix, max(1, round(pix.width * density / top)),
+                                 max(1, round(pix.height * density / top)))
+        encoder.image_format = fmt
+        _mime, data = encoder.encode_pixmap(scaled)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+class BackgroundPipeline:
+    """Render page backgrounds without their text.
+
+    Usage: call add_page() for each page while building the HTML, then
+    render() once at the end. File names returned by add_page() can be
+    written to the HTML right away; the files exist once render_page() for
+    that page, or render(), returns.
+
+    With several densities, files are named <name>@<density>x.<ext> and
+    srcset() gives the matching srcset attribute value.
+    """
+
+    def __init__(self, doc, img_dir, zoom=2, filename="page_{page}_bg.png",
+                 margin=0, fill=None, engine=HIDE_TEXT_REDACT,
+                 densities=None, image_format=FORMAT_PNG, image_quality=DEFAULT_QUALITY,
+                 skip_blank=False):
+        if engine not in HIDE_TEXT_ENGINES + (KEEP_TEXT,):
+            raise ValueError(f'Unknown text hiding engine: {engine}')
+        self.engine = engine
+        self.doc = doc
+        self.img_dir = img_dir
+        self.densities = tuple(sorted(densities)) if densities else (zoom,)
+        self.filename = filename
+        self.margin = margin
+        self.fill = fill
+        self.image_format = image_format
+        self.encoder = ImageEncoder(image_format, image_quality, passthrough=False)
+        self.skip_blank = skip_blank
+        self._jobs = {}
+        self._sources = {}
+        self._stripped_forms = set()
+
+        if engine == KEEP_TEXT:
+            # Nothing is modified, render the document itself
+            self.copy = doc
+            self._owns_copy = False
+        else:
+            # One copy of the whole document, text removed page by page
+            self.copy = fitz.open()
+            self.copy.insert_pdf(doc)
+            self._owns_copy = True
+
+    def add_page(self, page_num, text_dict=None):
+        """Remove the text of a page from the copy and return its background file name.
+
+        The name is the one of the highest density. Returns None when
+        skip_blank is set and the page has nothing to render (see _is_empty).
+        text_dict (page.get_text("dict")) is needed by the redact engine, and
+        saves a text extraction for the blank check when the text is kept.
+        """
+        # Judged on the original page: redactions add white fill drawings to the copy
+        empty = self.skip_blank and self._is_empty(self.doc[page_num], text_dict)
+
+        page = self.copy[page_num]
+        if self.engine == HIDE_TEXT_STRIP:
+            self._strip_page(page)
+        elif self.engine == HIDE_TEXT_REDACT:
+            self._redact_page(page, text_dict)
+
+        fmt = self.image_format
+        if empty or fmt == FORMAT_AUTO:
+            preview = page.get_pixmap(matrix=fitz.Matrix(PREVIEW_ZOOM, PREVIEW_ZOOM), alpha=False)
+            if empty and is_blank_pixmap(preview):
+                return None
+            if fmt == FORMAT_AUTO:
+                # Decided now so the file extension is known when the HTML is written
+                fmt = self.encoder.choose_format(preview)
+
+        base = os.path.splitext(self.filename.format(page=page_num + 1))[0]
+        ext = FILE_EXTENSIONS[fmt]
+        if len(self.densities) == 1:
+            names = [(self.densities[0], f"{base}.{ext}")]
+        else:
+            names = [(density, f"{base}@{density:g}x.{ext}") for density in self.densities]
+
+        self._sources[page_num] = names
+        self._jobs[page_num] = [(density, os.path.join(self.img_dir, name), fmt) for density, name in names]
+        return names[-1][1]
+
+    def render_page(self, page_num):
+        """Render the background of an added page now, in this process"""
+        outputs = self._jobs.pop(page_num, None)
+        if outputs:
+            _render_page(self.copy[page_num], outputs, self.encoder)
+
+    def srcset(self, page_num):
+        """srcset attribute value of a page background added with add_page()"""
+        return ", ".join(f"{name} {density:g}x" for density, name in self._sources.get(page_num, []))
+
+    def _is_empty(self, page, text_dict):
+        """True if the page draws no images and no vector paths (and no text when it is kept).
+
+        A low-resolution render alone would average hairlines, table
+        borders and light fills out to white and drop their whole layer.
+        """
+        if page.get_image_info() or drawing_count(page):
+            return False
+        if self.engine != KEEP_TEXT:
+            return True
+        if text_dict is None:
+            return not page.get_text("text").strip()
+        return not any(span.get("text", "").strip() for span in iter_spans(text_dict))
+
+    def _strip_page(self, page):
+        doc = self.copy
+        xrefs = page.get_contents()
+        if xrefs:
+            # Merge split content streams so the text state carries over
+            data = b"\n".join(doc.xref_stream(xref) or b"" for xref in xrefs)
+            doc.update_stream(xrefs[0], strip_text(data))
+            for xref in xrefs[1:]:
+                doc.update_stream(xref, b"")
+
+        # Form XObjects are often shared between pages, strip each one once
+        for xref in _iter_forms(doc, [xobject[0] for xobject in page.get_xobjects()], self._stripped_forms):
+            data = doc.xref_stream(xref)
+            if data:
+                doc.update_stream(xref, strip_text(data))
+
+    def _redact_page(self, page, text_dict):
+        redacted = False
+        for span in iter_spans(text_dict):
+            bbox = span.get("bbox")
+            if not bbox or len(bbox) < 4:
+                continue
+            rect = fitz.Rect(bbox)
+            if self.margin:
+                rect.x0 -= self.margin
+                rect.y0 -= self.margin
+                rect.x1 += self.margin
+                rect.y1 += self.margin
+            if self.fill is not None:
+                page.add_redact_annot(rect, fill=self.fill)
+            else:
+                page.add_redact_annot(rect)
+            redacted = True
+
+        if redacted:
+            page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+
+    def render(self):
+        """Render every added page not rendered yet and close the copy"""
+        try:
+            for page_num, outputs in self._jobs.items():
+                _render_page(self.copy[page_num], outputs, self.encoder)
+        finally:
+            if self._owns_copy:
+                self.copy.close()
+            self._jobs = {}
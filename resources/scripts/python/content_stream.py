@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+PDF content stream tokenizer and rule detector
+
+A single linear pass over a page content stream that tracks the graphics
+state (q/Q, cm, line width, colors) and reports thin filled rectangles and
+horizontal stroked lines in page coordinates. Used by the converters to find
+horizontal rules that get_drawings() may miss.
+
+Form XObjects invoked with Do are not descended into.
+
+strip_text() rewrites a content stream without its text-showing operators,
+which the converters use to render text-free page backgrounds.
+"""
+
+import math
+import re
+
+OPERAND = 0
+OPERATOR = 1
+
+_WHITESPACE = re.compile(rb'[ \t\r\n\f\x00]+|%[^\r\n]*')
+_REGULAR = re.compile(rb'[^ \t\r\n\f\x00()<>\[\]{}/%]+')
+_NAME = re.compile(rb'/[^ \t\r\n\f\x00()<>\[\]{}/%]*')
+_HEX_STRING = re.compile(rb'<[0-9A-Fa-f \t\r\n\f\x00]*>')
+_STRING_SPECIAL = re.compile(rb'[()\\]')
+_NUMBER = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)$')
+_INLINE_IMAGE_END = re.compile(rb'[ \t\r\n\f\x00]EI(?=[ \t\r\n\f\x00]|$)')
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+class Name(bytes):
+    """A PDF name operand (without the leading slash)"""
+
+
+def _skip_literal_string(data, pos):
+    """Return the position right after the literal string starting at data[pos] == '('"""
+    depth = 1
+    pos += 1
+    while depth:
+        match = _STRING_SPECIAL.search(data, pos)
+        if match is None:
+            return len(data)
+        char = match.group()
+        pos = match.end()
+        if char == b'\\':
+            pos += 1
+        elif char == b'(':
+            depth += 1
+        else:
+            depth -= 1
+    return pos
+
+
+def tokenize(data, positions=False):
+    """Yield (OPERAND, value) and (OPERATOR, bytes) tokens from a content stream.
+
+    Numbers become floats, names Name, arrays lists, dictionaries dicts;
+    string contents are not decoded (their raw bytes are returned).
+    Inline image data between ID and EI is skipped.
+    With positions=True, tokens are (kind, value, end) where end is the
+    offset right after the token.
+    """
+    pos = 0
+    end = len(data)
+    containers = []
+
+    def emit(value):
+        if containers:
+            containers[-1].append(value)
+            return None
+        return (OPERAND, value)
+
+    while pos < end:
+        match = _WHITESPACE.match(data, pos)
+        if match:
+            pos = match.end()
+            continue
+
+        char = data[pos:pos + 1]
+        token = None
+
+        if char == b'/':
+            match = _NAME.match(data, pos)
+            pos = match.end()
+            token = emit(Name(match.group()[1:]))
+        elif char == b'(':
+            start = pos
+            pos = _skip_literal_string(data, pos)
+            token = emit(data[start + 1:pos - 1])
+        elif char == b'<':
+            if data[pos:pos + 2] == b'<<':
+                containers.append([])
+                pos += 2
+            else:
+                match = _HEX_STRING.match(data, pos)
+                pos = match.end() if match else end
+                token = emit(match.group()[1:-1] if match else b'')
+        elif char == b'>':
+            if data[pos:pos + 2] == b'>>':
+                pos += 2
+                if containers:
+                    items = containers.pop()
+                    token = emit(dict(zip(items[::2], items[1::2])))
+            else:
+                pos += 1
+        elif char == b'[':
+            containers.append([])
+            pos += 1
+        elif char == b']':
+            pos += 1
+            if containers:
+                token = emit(containers.pop())
+        elif char in b'{})':
+            pos += 1
+        else:
+            match = _REGULAR.match(data, pos)
+            word = match.group()
+            pos = match.end()
+            if _NUMBER.match(word):
+                token = emit(float(word))
+            elif word in (b'true', b'false'):
+                token = emit(word == b'true')
+            elif word == b'null':
+                token = emit(None)
+            elif containers:
+                # Operator inside an unterminated array/dict: drop the container
+                containers = []
+                token = (OPERATOR, word)
+            else:
+                token = (OPERATOR, word)
+                if word == b'ID':
+                    # Skip one whitespace byte then the binary image data up to EI
+                    match = _INLINE_IMAGE_END.search(data, pos + 1)
+                    yield token + (pos,) if positions else token
+                    pos = match.end() if match else end
+                    token = (OPERATOR, b'EI')
+
+        if token is not None:
+            yield token + (pos,) if positions else token
+
+
+def iter_operations(data):
+    """Yield (operator, operands) pairs from a content stream"""
+    operands = []
+    for kind, value in tokenize(data):
+        if kind == OPERATOR:
+            yield value, operands
+            operands = []
+        else:
+            operands.append(value)
+
+
+def iter_operation_segments(data):
+    """Yield (operator, operands, start, end) where data[start:end] holds the
+    operands and the operator, starting right after the previous operator"""
+    operands = []
+    start = 0
+    for kind, value, end in tokenize(data, positions=True):
+        if kind == OPERATOR:
+            yield value, operands, start, end
+            operands = []
+            start = end
+        else:
+            operands.append(value)
+
+
+TEXT_SHOW_OPS = {b'Tj', b'TJ', b"'", b'"'}
+
+# Text render modes from 4 on add the glyphs to the clipping path
+_CLIP_RENDER_MODES = (4, 5, 6, 7)
+
+
+def strip_text(data):
+    """Return the content stream without visible text.
+
+    Text-showing operators are dropped together with their operands; BT/ET,
+    text state and everything else (colors, paths, images) are kept as is,
+    so the graphics state after each text object is unchanged. Text used as
+    a clipping path (render modes 4-7) is kept but switched to mode 7 (clip
+    only) so the graphics it clips still render.
+    """
+    out = []
+    mode = 0
+    saved = []
+
+    for op, operands, start, end in iter_operation_segments(data):
+        if op == b'q':
+            saved.append(mode)
+        elif op == b'Q':
+            if saved:
+                mode = saved.pop()
+        elif op == b'Tr':
+            if operands and isinstance(operands[0], float):
+                mode = int(operands[0])
+        elif op in TEXT_SHOW_OPS:
+            if mode not in _CLIP_RENDER_MODES:
+                continue
+            if mode != 7:
+                out.append(b'7 Tr\n%s\n%d Tr\n' % (data[start:end], mode))
+                continue
+
+        out.append(data[start:end])
+        # Segments end with an operator, so a newline is always a safe separator,
+        # except right after ID where exactly one byte precedes the image data
+        if op != b'ID':
+            out.append(b'\n')
+
+    return b''.join(out)
+
+
+def concat(m1, m2):
+    """Matrix product m1 x m2 (apply m1 first, then m2)"""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * c2,
+        a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2,
+        c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2,
+        e1 * b2 + f1 * d2 + f2,
+    )
+
+
+def _apply(m, x, y):
+    return m[0] * x + m[2] * y + m[4], m[1] * x + m[3] * y + m[5]
+
+
+def _color(operands):
+    """Convert gray / RGB / CMYK operands to an RGB tuple"""
+    values = [v for v in operands if isinstance(v, float)]
+    if len(values) == 1:
+        return (values[0],) * 3
+    if len(values) == 3:
+        return tuple(values)
+    if len(values) == 4:
+        c, m, y, k = values
+        return ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+    return (0.0, 0.0, 0.0)
+
+
+FILL_OPS = {b'f', b'F', b'f*', b'B', b'B*', b'b', b'b*'}
+STROKE_OPS = {b'S', b's', b'B', b'B*', b'b', b'b*'}
+PAINT_OPS = FILL_OPS | STROKE_OPS | {b'n'}
+FILL_COLOR_OPS = {b'g', b'rg', b'k', b'sc', b'scn'}
+STROKE_COLOR_OPS = {b'G', b'RG', b'K', b'SC', b'SCN'}
+
+
+def find_rules(data, page_matrix=IDENTITY, max_thickness=3.0, min_length=20.0):
+    """Find thin horizontal rectangles and lines in a content stream.
+
+    Coordinates are transformed by the CTM and then by page_matrix (PDF to
+    page space). Returns dicts with 'rect' (x0, y0, x1, y1), 'color' (RGB
+    tuple 0-1), 'width' (thickness) and 'kind' ('rect' or 'line').
+    """
+    rules = []
+    ctm = IDENTITY
+    device = page_matrix  # CTM followed by the page matrix
+    line_width = 1.0
+    fill_color = stroke_color = (0.0, 0.0, 0.0)
+    saved = []
+
+    rects = []     # (x, y, w, h) in user space, with the CTM at construction time
+    segments = []  # (x0, y0, x1, y1) in page space
+    current = None
+
+    for op, operands in iter_operations(data):
+        if op == b'q':
+            saved.append((ctm, line_width, fill_color, stroke_color))
+        elif op == b'Q':
+            if saved:
+                ctm, line_width, fill_color, stroke_color = saved.pop()
+                device = concat(ctm, page_matrix)
+        elif op == b'cm':
+            if len(operands) == 6 and all(isinstance(v, float) for v in operands):
+                ctm = concat(tuple(operands), ctm)
+                device = concat(ctm, page_matrix)
+        elif op == b'w':
+            if operands and isinstance(operands[0], float):
+                line_width = operands[0]
+        elif op in FILL_COLOR_OPS:
+            fill_color = _color(operands)
+        elif op in STROKE_COLOR_OPS:
+            stroke_color = _color(operands)
+        elif op == b'cs':
+            fill_color = (0.0, 0.0, 0.0)
+        elif op == b'CS':
+            stroke_color = (0.0, 0.0, 0.0)
+        elif op == b're':
+            if len(operands) == 4:
+                rects.append((tuple(operands), device))
+            current = None
+        elif op == b'm':
+            if len(operands) == 2:
+                current = _apply(device, *operands)
+        elif op == b'l':
+            if len(operands) == 2 and current is not None:
+                point = _apply(device, *operands)
+                segments.append(current + point)
+                current = point
+        elif op in (b'c', b'v', b'y'):
+            if len(operands) >= 4:
+                current = _apply(device, *operands[-2:])
+        elif op == b'h':
+            pass
+        elif op in PAINT_OPS:
+            filled = op in FILL_OPS
+            stroked = op in STROKE_OPS
+            if filled or stroked:
+                color = fill_color if filled else stroke_color
+                for (x, y, w, h), matrix in rects:
+                    xs, ys = zip(*(_apply(matrix, px, py) for px, py in ((x, y), (x + w, y), (x, y + h), (x + w, y + h))))
+                    x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+                    if y1 - y0 < max_thickness and x1 - x0 >= min_length:
+                        rules.append({'rect': (x0, y0, x1, y1), 'color': color,
+                                      'width': max(1.0, y1 - y0), 'kind': 'rect'})
+
+                if stroked:
+                    scale = abs(ctm[0] * ctm[3] - ctm[1] * ctm[2]) ** 0.5 or 1.0
+                    thickness = max(line_width * scale, 1.0)
+                    for x0, y0, x1, y1 in segments:
+                        if abs(y1 - y0) < 2 and abs(x1 - x0) >= min_length:
+                            y = (y0 + y1) / 2
+                            rules.append({'rect': (min(x0, x1), y - thickness / 2, max(x0, x1), y + thickness / 2),
+                                          'color': stroke_color, 'width': thickness, 'kind': 'line'})
+            rects = []
+            segments = []
+            current = None
+
+    return rules
+
+
+def page_rules(page, max_thickness=3.0, min_length=20.0):
+    """Find thin rules on a fitz page, in page coordinates"""
+    data = page.read_contents()
+    if not data:
+        return []
+    return find_rules(data, tuple(page.transformation_matrix), max_thickness, min_length)
+
+
+class RuleIndex:
+    """y-bucketed index of horizontal rules for O(1) adds and duplicate checks.
+
+    Buckets are tolerance high, so a check only looks at the rules of the
+    buckets within tolerance of its y.
+    """
+
+    def __init__(self, tolerance=2.0):
+        self.tolerance = tolerance
+        self._size = tolerance if tolerance > 0 else 1.0
+        self._buckets = {}  # bucket number -> [(y0, x0, x1)]
+
+    def add(self, rect):
+        self._buckets.setdefault(math.floor(rect[1] / self._size), []).append((rect[1], rect[0], rect[2]))
+
+    def is_duplicate(self, rect):
+        """True if a rule at nearly the same y overlaps this one horizontally"""
+        y0, x0, x1 = rect[1], rect[0], rect[2]
+        first = math.floor((y0 - self.tolerance) / self._size)
+        last = math.floor((y0 + self.tolerance) / self._size)
+        for bucket in range(first, last + 1):
+            for ey0, ex0, ex1 in self._buckets.get(bucket, ()):
+                if abs(ey0 - y0) <= self.tolerance and ex0 < x1 and x0 < ex1:
+                    return True
+        return False
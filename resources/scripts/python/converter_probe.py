@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Cheap document probe choosing a converter strategy
+
+A few pages spread over the document are measured with page_classifier
+(text length, image coverage, drawing count) and the fastest converter that
+still renders that content faithfully is picked:
+- scanned pages have no text for the span-based converters to work with,
+  v10 shows the scan as the page background with one render per page,
+- vector-heavy pages cost one render per drawing cluster in v11 and one
+  SVG path per drawing in base64, v10 renders each page once,
+- text pages with light graphics are converted by v11, which keeps every
+  element editable without rendering page backgrounds.
+The decision comes with the reasons behind it and the measurements.
+"""
+
+import sys
+import json
+import fitz  # PyMuPDF
+
+from page_classifier import classify_document, PAGE_SCANNED, PAGE_VECTOR, PAGE_BLANK
+
+# Pages measured per document, first and last page included
+SAMPLE_PAGES = 5
+
+# Share of scanned sampled pages from which the document is treated as scanned
+SCANNED_MIN_RATIO = 0.5
+
+# Average drawings per sampled page from which per-drawing rendering is too slow
+VECTOR_HEAVY_DRAWINGS = 300
+
+# Page background plus transparent text layer
+STRATEGY_BACKGROUND = 'v10'
+
+# Individual text, image and drawing elements, no page background
+STRATEGY_ELEMENTS = 'v11'
+
+
+def sample_pages(page_count, samples=SAMPLE_PAGES):
+    """Return up to samples 0-based page numbers spread evenly over the document"""
+    if page_count <= samples:
+        return list(range(page_count))
+    step = (page_count - 1) / (samples - 1)
+    return sorted({round(i * step) for i in range(samples)})
+
+
+def choose_strategy(metrics):
+    """Return (strategy, reasons) for the probe measurements"""
+    sampled = len(metrics['sampled_pages'])
+    if not sampled:
+        return STRATEGY_BACKGROUND, ['empty document']
+
+    types = metrics['page_types']
+    scanned = types.get(PAGE_SCANNED, 0)
+    drawings = metrics['drawings_per_page']
+
+    if scanned / sampled >= SCANNED_MIN_RATIO:
+        return STRATEGY_BACKGROUND, [
+            f'{scanned}/{sampled} sampled pages are scanned: no text for span-based converters, '
+            f'the scan is rendered as the page background'
+        ]
+    if drawings >= VECTOR_HEAVY_DRAWINGS:
+        return STRATEGY_BACKGROUND, [
+            f'{drawings} drawings per page (>= {VECTOR_HEAVY_DRAWINGS}): '
+            f'one background render per page instead of one element per drawing or drawing cluster'
+        ]
+
+    textless = scanned + types.get(PAGE_VECTOR, 0) + types.get(PAGE_BLANK, 0)
+    if textless == sampled:
+        return STRATEGY_BACKGROUND, [f'no text on the {sampled} sampled pages: nothing to keep editable']
+
+    return STRATEGY_ELEMENTS, [
+        f'{metrics["text_chars_per_page"]} text characters and {drawings} drawings per page: '
+        f'text, images and graphics kept as separate elements without page backgrounds'
+    ]
+
+
+def probe_document(doc, samples=SAMPLE_PAGES):
+    """Measure sampled pages of an opened document and choose a converter.
+
+    Returns {"strategy": ..., "reasons": [...], "metrics": {...}}.
+    """
+    pages = classify_document(doc, sample_pages(len(doc), samples))
+    count = len(pages) or 1
+
+    page_types = {}
+    for page in pages:
+        page_types[page['type']] = page_types.get(page['type'], 0) + 1
+
+    metrics = {
+        'page_count': len(doc),
+        'sampled_pages': [page['page'] for page in pages],
+        'page_types': page_types,
+        'text_chars_per_page': round(sum(page['text_chars'] for page in pages) / count),
+        'image_coverage': round(sum(page['image_coverage'] for page in pages) / count, 4),
+        'drawings_per_page': round(sum(page['drawing_count'] for page in pages) / count),
+    }
+    strategy, reasons = choose_strategy(metrics)
+    return {'strategy': strategy, 'reasons': reasons, 'metrics': metrics}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python converter_probe.py <pdf_path>", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        doc = fitz.open(sys.argv[1])
+        print(json.dumps(dict(probe_document(doc), success=True)))
+        doc.close()
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Random-access binary container for universal_pdf_extractor.py output.
+
+The container stores one compressed JSON record per page plus named
+document-level sections (metadata, outline, fonts...). A page offset table
+lets a reader seek directly to page N without decoding the rest of the file.
+
+Layout (all integers little-endian):
+
+    Header (40 bytes)
+        magic                 8s   b"GIGAPDFX"
+        version               u16  1
+        compression           u16  0 = none, 1 = zlib
+        page_count            u32
+        section_count         u32
+        section_table_offset  u64
+        page_table_offset     u64
+        reserved              u32  0
+
+    Records
+        Page and section payloads, UTF-8 JSON, compressed as declared
+        in the header. Written in extraction order.
+
+    Section table (section_count x 32 bytes)
+        name                  16s  ASCII, NUL padded
+        offset                u64  absolute file offset of the payload
+        length                u32  stored (compressed) length
+        raw_length            u32  uncompressed length
+
+    Page table (page_count x 16 bytes, page 1 first)
+        offset                u64  absolute file offset, 0 if page missing
+        length                u32  stored (compressed) length
+        raw_length            u32  uncompressed length
+"""
+
+import json
+import os
+import struct
+import zlib
+
+MAGIC = b"GIGAPDFX"
+VERSION = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+HEADER = struct.Struct("<8sHHIIQQI")
+SECTION_ENTRY = struct.Struct("<16sQII")
+PAGE_ENTRY = struct.Struct("<QII")
+
+SECTION_NAME_SIZE = 16
+
+
+class ContainerError(Exception):
+    """Raised when a container file is malformed or used incorrectly"""
+
+
+def _default_serializer(obj):
+    return json.dumps(obj, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class ExtractionContainerWriter:
+    """Write page records and document sections to a container file.
+
+    Records are written as soon as they are added, so memory stays bounded
+    by the largest single page. Tables and header are written on close();
+    leaving a with block on an exception deletes the partial file instead.
+    """
+
+    def __init__(self, path, page_count, compression=COMPRESSION_ZLIB, serializer=None):
+        self.path = path
+        self.page_count = page_count
+        self.compression = compression
+        self.serializer = serializer or _default_serializer
+        self._pages = [(0, 0, 0)] * page_count
+        self._sections = []
+        self._file = open(path, 'wb')
+        self._file.write(b"\0" * HEADER.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _write_record(self, obj):
+        raw = self.serializer(obj)
+        data = zlib.compress(raw, 6) if self.compression == COMPRESSION_ZLIB else raw
+        offset = self._file.tell()
+        self._file.write(data)
+        return offset, len(data), len(raw)
+
+    def add_page(self, page_num, record):
+        """Store the record of a 1-based page number"""
+        if page_num < 1 or page_num > self.page_count:
+            raise ContainerError(f'Page {page_num} out of range (1-{self.page_count})')
+        self._pages[page_num - 1] = self._write_record(record)
+
+    def add_section(self, name, record):
+        """Store a named document-level section"""
+        encoded = name.encode('ascii')
+        if len(encoded) > SECTION_NAME_SIZE:
+            raise ContainerError(f'Section name too long: {name}')
+        self._sections.append((encoded,) + self._write_record(record))
+
+    def close(self):
+        if self._file is None:
+            return
+
+        section_table_offset = self._file.tell()
+        for name, offset, length, raw_length in self._sections:
+            self._file.write(SECTION_ENTRY.pack(name, offset, length, raw_length))
+
+        page_table_offset = self._file.tell()
+        for offset, length, raw_length in self._pages:
+            self._file.write(PAGE_ENTRY.pack(offset, length, raw_length))
+
+        self._file.seek(0)
+        self._file.write(HEADER.pack(
+            MAGIC, VERSION, self.compression,
+            self.page_count, len(self._sections),
+            section_table_offset, page_table_offset, 0
+        ))
+        self._file.close()
+        self._file = None
+
+    def abort(self):
+        """Close and delete the partial file: a truncated extraction must not look like a container"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class ExtractionContainerReader:
+    """Read individual pages and sections from a container file.
+
+    Only the header and the two tables are read on open; page and section
+    payloads are read and decompressed on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+
+        header = self._file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            self.close()
+            raise ContainerError('Truncated container header')
+
+        (magic, version, self.compression, self.page_count, section_count,
+         section_table_offset, page_table_offset, _reserved) = HEADER.unpack(header)
+
+        if magic != MAGIC:
+            self.close()
+            raise ContainerError('Not an extraction container')
+        if version != VERSION:
+            self.close()
+            raise ContainerError(f'Unsupported container version {version}')
+
+        self._file.seek(section_table_offset)
+        self._sections = {}
+        for _ in range(section_count):
+            name, offset, length, raw_length = SECTION_ENTRY.unpack(self._file.read(SECTION_ENTRY.size))
+            self._sections[name.rstrip(b"\0").decode('ascii')] = (offset, length, raw_length)
+
+        self._file.seek(page_table_offset)
+        table = self._file.read(PAGE_ENTRY.size * self.page_count)
+        self._pages = [entry for entry in PAGE_ENTRY.iter_unpack(table)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def section_names(self):
+        return list(self._sections)
+
+    def _read_record(self, offset, length):
+        self._file.seek(offset)
+        data = self._file.read(length)
+        if self.compression == COMPRESSION_ZLIB:
+            data = zlib.decompress(data)
+        return json.loads(data.decode('utf-8'))
+
+    def read_page(self, page_num):
+        """Return the record of a 1-based page number, or None if it was not stored"""
+        if page_num < 1 or page_num > self.page_count:
+            raise ContainerError(f'Page {page_num} out of range (1-{self.page_count})')
+        offset, length, _raw_length = self._pages[page_num - 1]
+        if offset == 0:
+            return None
+        return self._read_record(offset, length)
+
+    def read_section(self, name):
+        """Return a document-level section by name"""
+        if name not in self._sections:
+            raise ContainerError(f'Unknown section: {name}')
+        offset, length, _raw_length = self._sections[name]
+        return self._read_record(offset, length)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Streaming HTML writer for the PyMuPDF converters
+
+Fragments of the page being converted are buffered and written out as soon
+as the page is finished, so peak memory is bounded by one page and a caller
+that stops reading early (timeout) still gets every completed page.
+"""
+
+import io
+import sys
+from contextlib import contextmanager
+
+
+class HtmlStreamWriter:
+    """Buffer the fragments of the current page and flush them per page.
+
+    Without a stream the output is collected in memory and returned by
+    close(), which keeps the converters usable as plain functions.
+    """
+
+    def __init__(self, stream=None):
+        self._collect = stream is None
+        self.stream = io.StringIO() if stream is None else stream
+        self._parts = []
+
+    def write(self, fragment):
+        self._parts.append(fragment)
+
+    def prepend(self, fragment):
+        """Insert a fragment before everything buffered since the last flush"""
+        if fragment:
+            self._parts.insert(0, fragment)
+
+    def flush(self):
+        if self._parts:
+            self.stream.write("".join(self._parts))
+            self._parts = []
+        self.stream.flush()
+
+    def end_page(self):
+        """Mark the current page as complete and write it out"""
+        self.flush()
+
+    def close(self):
+        """Write what is left; return the whole HTML when collecting in memory"""
+        self.flush()
+        if self._collect:
+            return self.stream.getvalue()
+        return None
+
+
+@contextmanager
+def output_stream(path=None):
+    """Yield a text stream for the given output path, stdout when no path is given"""
+    if not path:
+        yield sys.stdout
+        return
+    with open(path, 'w', encoding='utf-8') as stream:
+        yield stream
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Style interning for the text spans of the PyMuPDF converters
+
+Most spans of a document share a handful of font/size/color combinations.
+Instead of repeating the declarations inline on every span, each distinct
+declaration string becomes a generated CSS class and only the coordinates
+stay inline. Rules are handed out once, the first time a class is used, so
+a streaming converter can write them right before the page that needs them.
+"""
+
+# Generated class names are <prefix><n>
+DEFAULT_PREFIX = 't'
+
+
+class StyleRegistry:
+    """Map CSS declaration strings to generated class names"""
+
+    def __init__(self, prefix=DEFAULT_PREFIX):
+        self.prefix = prefix
+        self._classes = {}
+        self._pending = []
+
+    def class_for(self, declarations):
+        """Return the class name of a declaration string, creating it on first use"""
+        name = self._classes.get(declarations)
+        if name is None:
+            name = f"{self.prefix}{len(self._classes)}"
+            self._classes[declarations] = name
+            self._pending.append((name, f".{name}{{{declarations}}}"))
+        return name
+
+    def take_pending(self):
+        """Return and forget the (class name, CSS rule) pairs created since the last call"""
+        pending, self._pending = self._pending, []
+        return pending
+
+    def adopt(self, pending):
+        """Queue (class name, CSS rule) pairs handed out by another registry (e.g. in a worker process)"""
+        self._pending.extend(pending)
+
+    def take_style_block(self):
+        """<style> element with the rules created since the last call, empty string if none"""
+        rules = "".join(rule for _name, rule in self.take_pending())
+        return f"<style>{rules}</style>" if rules else ""
+
+    def __len__(self):
+        return len(self._classes)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Image encoder policy for the PyMuPDF converters
+
+Replaces the PIL round trip with pil_save(format="PNG", optimize=True) by:
+- passing the original image stream through when the browser can use it
+  as is (JPEG, PNG without soft mask),
+- native pix.tobytes() for PNG and JPEG,
+- WebP through PIL, only when asked for and available.
+
+In "auto" mode photographic content goes to JPEG and flat graphics
+(logos, diagrams, screenshots) to PNG. Byte and CPU time statistics are
+collected per output format.
+"""
+
+import time
+import fitz  # PyMuPDF
+
+from pixmap_utils import top_color_share
+
+FORMAT_AUTO = 'auto'
+FORMAT_PNG = 'png'
+FORMAT_JPEG = 'jpeg'
+FORMAT_WEBP = 'webp'
+
+FORMATS = (FORMAT_AUTO, FORMAT_PNG, FORMAT_JPEG, FORMAT_WEBP)
+
+FILE_EXTENSIONS = {
+    FORMAT_PNG: 'png',
+    FORMAT_JPEG: 'jpg',
+    FORMAT_WEBP: 'webp',
+}
+
+MIME_TYPES = {
+    FORMAT_PNG: 'image/png',
+    FORMAT_JPEG: 'image/jpeg',
+    FORMAT_WEBP: 'image/webp',
+}
+
+DEFAULT_QUALITY = 85
+
+# Images below this pixel count are always PNG (icons, bullets)
+PHOTO_MIN_PIXELS = 64 * 64
+
+# If the most frequent color covers more than this share of the image,
+# the content is considered flat graphics rather than a photo
+FLAT_COLOR_RATIO = 0.3
+
+
+class ImageEncoder:
+    """Encode images according to a format policy and collect statistics"""
+
+    def __init__(self, image_format=FORMAT_AUTO, quality=DEFAULT_QUALITY, passthrough=True):
+        if image_format not in FORMATS:
+            raise ValueError(f'Unknown image format: {image_format}')
+        self.image_format = image_format
+        self.quality = quality
+        self.passthrough = passthrough
+        self.stats = {}
+
+    def _record(self, fmt, raw_size, data, started):
+        entry = self.stats.setdefault(fmt, {'count': 0, 'raw_bytes': 0, 'bytes': 0, 'seconds': 0.0})
+        entry['count'] += 1
+        entry['raw_bytes'] += raw_size
+        entry['bytes'] += len(data)
+        entry['seconds'] += time.perf_counter() - started
+
+    def merge_stats(self, stats):
+        """Add statistics collected by another encoder (e.g. in a worker process)"""
+        for fmt, other in stats.items():
+            entry = self.stats.setdefault(fmt, {'count': 0, 'raw_bytes': 0, 'bytes': 0, 'seconds': 0.0})
+            for key in entry:
+                entry[key] += other.get(key, 0)
+
+    def summary(self):
+        """Return per-format totals plus an overall entry"""
+        total = {'count': 0, 'raw_bytes': 0, 'bytes': 0, 'seconds': 0.0}
+        for entry in self.stats.values():
+            for key in total:
+                total[key] += entry[key]
+        summary = {fmt: dict(entry, seconds=round(entry['seconds'], 4)) for fmt, entry in self.stats.items()}
+        summary['total'] = dict(total, seconds=round(total['seconds'], 4))
+        return summary
+
+    def _is_photographic(self, pix):
+        if pix.alpha or pix.n < 3 or pix.width * pix.height < PHOTO_MIN_PIXELS:
+            return False
+        return top_color_share(pix) < FLAT_COLOR_RATIO
+
+    def choose_format(self, pix):
+        """Return the output format the policy picks for this pixmap"""
+        fmt = self.image_format
+        if fmt == FORMAT_AUTO:
+            fmt = FORMAT_JPEG if self._is_photographic(pix) else FORMAT_PNG
+        if fmt == FORMAT_JPEG and pix.alpha:
+            # JPEG has no alpha channel
+            fmt = FORMAT_PNG
+        return fmt
+
+    def _encode_jpeg(self, pix):
+        try:
+            return pix.tobytes("jpeg", jpg_quality=self.quality)
+        except TypeError:
+            # Older PyMuPDF without jpg_quality
+            return pix.pil_tobytes(format="JPEG", quality=self.quality)
+
+    def encode_pixmap(self, pix):
+        """Encode a pixmap, return (mime_type, bytes)"""
+        started = time.perf_counter()
+
+        # Browsers only handle gray and RGB reliably
+        if pix.colorspace and pix.colorspace.n > 3:
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+
+        fmt = self.choose_format(pix)
+        data = None
+
+        if fmt == FORMAT_WEBP:
+            try:
+                data = pix.pil_tobytes(format="WEBP", quality=self.quality)
+            except Exception:
+                # PIL missing or built without WebP support
+                fmt = FORMAT_PNG if pix.alpha else FORMAT_JPEG
+
+        if fmt == FORMAT_JPEG:
+            data = self._encode_jpeg(pix)
+        elif fmt == FORMAT_PNG:
+            data = pix.tobytes("png")
+
+        self._record(fmt, pix.width * pix.height * pix.n, data, started)
+        return MIME_TYPES[fmt], data
+
+    def encode_xref(self, doc, xref):
+        """Encode an image xref, passing the original stream through when possible"""
+        started = time.perf_counter()
+
+        if self.passthrough and self.image_format in (FORMAT_AUTO, FORMAT_JPEG, FORMAT_PNG):
+            info = doc.extract_image(xref)
+            ext = (info or {}).get('ext')
+            if ext == 'jpg':
+                ext = FORMAT_JPEG
+            # CMYK streams and soft masks need decoding, browsers cannot use them as is
+            if (ext in (FORMAT_JPEG, FORMAT_PNG) and not info.get('smask') and info.get('colorspace', 3) <= 3
+                    and self.image_format in (FORMAT_AUTO, ext)):
+                data = info['image']
+                self._record('passthrough', info.get('width', 0) * info.get('height', 0) * info.get('colorspace', 3), data, started)
+                return MIME_TYPES[ext], data
+
+        pix = fitz.Pixmap(doc, xref)
+
+        # Re-attach the soft mask so transparency survives
+        smask = doc.xref_get_key(xref, "SMask")
+        if smask[0] == 'xref':
+            try:
+                mask = fitz.Pixmap(doc, int(smask[1].split()[0]))
+                if pix.alpha:
+                    pix = fitz.Pixmap(pix, 0)
+                if pix.colorspace and pix.colorspace.n > 3:
+                    pix = fitz.Pixmap(fitz.csRGB, pix)
+                pix = fitz.Pixmap(pix, mask)
+            except Exception:
+                pass
+
+        return self.encode_pixmap(pix)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Fast JSON serialisation for the extraction scripts
+
+Extraction code is expected to emit plain Python types (fitz geometry already
+converted with geom()), so the encoder never needs a per-object callback on
+the hot path. orjson is used when installed, the stdlib encoder otherwise.
+Output is written to the stream in chunks instead of one giant string.
+"""
+
+import sys
+import json
+import base64
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CHUNK_SIZE = 64 * 1024
+
+
+def geom(value):
+    """Convert a fitz Rect/IRect/Point/Matrix/Quad to a plain tuple (None stays None)"""
+    if value is None:
+        return None
+    if hasattr(value, 'ul') and hasattr(value, 'lr') and hasattr(value, 'ur'):
+        # Quad: tuple of four points
+        return tuple(tuple(point) for point in value)
+    return tuple(value)
+
+
+def _fallback(o):
+    """Last-resort conversion for values the extraction code did not normalise"""
+    if isinstance(o, (bytes, bytearray)):
+        return base64.b64encode(o).decode('utf-8')
+    try:
+        return tuple(o)
+    except TypeError:
+        return str(o)
+
+
+def dumps(obj):
+    """Serialise obj to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_fallback, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, default=_fallback).encode('utf-8')
+
+
+def dump(obj, stream=None):
+    """Write obj as JSON to a binary stream (stdout by default) in chunks, followed by a newline"""
+    if stream is None:
+        sys.stdout.flush()
+        stream = sys.stdout.buffer
+
+    if orjson is not None:
+        data = memoryview(orjson.dumps(obj, default=_fallback, option=orjson.OPT_NON_STR_KEYS))
+        for start in range(0, len(data), CHUNK_SIZE):
+            stream.write(data[start:start + CHUNK_SIZE])
+    else:
+        encoder = json.JSONEncoder(ensure_ascii=False, default=_fallback, check_circular=False)
+        pending = []
+        pending_size = 0
+        for chunk in encoder.iterencode(obj):
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= CHUNK_SIZE:
+                stream.write(''.join(pending).encode('utf-8'))
+                pending = []
+                pending_size = 0
+        if pending:
+            stream.write(''.join(pending).encode('utf-8'))
+
+    stream.write(b"\n")
+    stream.flush()
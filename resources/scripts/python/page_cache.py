@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Per-page display list cache for the PyMuPDF converters
+
+The page content stream is interpreted once into a fitz.DisplayList. Text
+extraction, clipped renders and blank checks are then replayed from that
+list instead of each calling a page-level method that parses the content
+stream again.
+
+Inside share_page_caches(doc), page_cache() hands out one PageCache per
+page, so converters run one after the other on the same document (the
+in-process fallback chain of pymupdf_converter.py) reuse each other's text
+dicts and drawings instead of extracting them again.
+"""
+
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+
+from pixmap_utils import is_blank_pixmap
+
+TEXT_FLAGS = fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE
+
+# Flags page.get_text("dict") uses when none are given
+DICT_FLAGS = fitz.TEXTFLAGS_DICT
+
+# Resolution of the throwaway render used by is_blank()
+BLANK_CHECK_ZOOM = 0.25
+
+# Pages of a document whose cache is kept while sharing is active
+SHARED_CACHE_PAGES = 64
+
+# (document, {page number: PageCache}) for each document sharing its caches.
+# page.parent may be a weak proxy, which is unhashable: documents are matched
+# by equality, which a proxy resolves against its referent
+_shared_caches = []
+
+
+class PageCache:
+    """Display list of one page plus the text pages and dicts built from it"""
+
+    def __init__(self, page):
+        self.page = page
+        self.rect = page.rect
+        self.displaylist = page.get_displaylist()
+        self._textpages = {}
+        self._text_dicts = {}
+        self._drawings = None
+
+    def textpage(self, flags=TEXT_FLAGS):
+        if flags not in self._textpages:
+            textpage = self.displaylist.get_textpage(flags=flags)
+            # PyMuPDF 1.24+ returns the raw MuPDF object, without the extract* methods
+            if not isinstance(textpage, fitz.TextPage):
+                textpage = fitz.TextPage(textpage)
+            self._textpages[flags] = textpage
+        return self._textpages[flags]
+
+    def text_dict(self, flags=TEXT_FLAGS):
+        """Same structure as page.get_text("dict", flags=flags)"""
+        if flags not in self._text_dicts:
+            self._text_dicts[flags] = self.textpage(flags).extractDICT()
+        return self._text_dicts[flags]
+
+    def drawings(self):
+        """Same as page.get_drawings()"""
+        if self._drawings is None:
+            self._drawings = self.page.get_drawings()
+        return self._drawings
+
+    def image_bboxes(self):
+        """Bounding boxes of every image drawn on the page, inline images included"""
+        textpage = self.textpage(fitz.TEXT_PRESERVE_IMAGES)
+        return [fitz.Rect(block[:4]) for block in textpage.extractBLOCKS() if block[6] == 1]
+
+    def render(self, clip=None, zoom=1.0, alpha=False):
+        """Render the page or a clip of it from the display list"""
+        return self.displaylist.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=alpha,
+                                           clip=fitz.Rect(clip) if clip is not None else None)
+
+    def is_blank(self, clip=None, zoom=BLANK_CHECK_ZOOM):
+        """True if the clip (whole page by default) renders to a single color (see pixmap_utils.py)"""
+        return is_blank_pixmap(self.render(clip, zoom))
+
+
+def open_document(source):
+    """Return (doc, owned) for a path or an already opened fitz.Document.
+
+    owned is True when the document was opened here and must be closed by
+    the caller.
+    """
+    if isinstance(source, fitz.Document):
+        return source, False
+    return fitz.open(source), True
+
+
+def _shared_caches_of(doc):
+    for shared_doc, caches in _shared_caches:
+        if doc == shared_doc:
+            return caches
+    return None
+
+
+def page_cache(page):
+    """PageCache of a page, shared while share_page_caches() is active for its document"""
+    caches = _shared_caches_of(page.parent)
+    if caches is None:
+        return PageCache(page)
+    cache = caches.get(page.number)
+    if cache is None:
+        cache = PageCache(page)
+        # Converters walk the pages in order: keeping the first pages (rather
+        # than the most recent ones) is what the next converter can reuse
+        if len(caches) < SHARED_CACHE_PAGES:
+            caches[page.number] = cache
+    return cache
+
+
+@contextmanager
+def share_page_caches(doc):
+    """Share the page caches of doc between the converters run in this block"""
+    entry = (doc, {})
+    _shared_caches.append(entry)
+    try:
+        yield
+    finally:
+        _shared_caches[:] = [shared for shared in _shared_caches if shared is not entry]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Cheap page content classifier using PyMuPDF (fitz)
+
+Labels each page as digital, scanned, mixed, vector or blank from three
+inexpensive measurements: extracted text length, image coverage ratio and
+vector drawing count. No text or drawing dictionaries are built, so the
+result can be used to route pages before running the expensive passes
+(scanned pages straight to OCR, blank pages skipped entirely).
+
+Text and image boxes come from the page's display list (page_cache.py), so
+a converter classifying a page reuses the text page it extracts from, and
+images are located in one pass whatever their number.
+"""
+
+import sys
+import json
+import fitz  # PyMuPDF
+
+from page_cache import page_cache
+
+PAGE_DIGITAL = 'digital'
+PAGE_SCANNED = 'scanned'
+PAGE_MIXED = 'mixed'
+PAGE_VECTOR = 'vector'
+PAGE_BLANK = 'blank'
+
+# A page needs more than this many characters to count as having text
+# (same threshold remove_blank_pages has always used)
+MIN_TEXT_CHARS = 10
+
+# Image coverage above which a text page is considered mixed content
+MIXED_MIN_IMAGE_COVERAGE = 0.02
+
+# Image coverage from which a page without text is considered scanned
+# (a logo on a vector diagram does not make it a scan)
+SCANNED_MIN_IMAGE_COVERAGE = 0.5
+
+
+def image_coverage(page, bboxes=None):
+    """Return the fraction of the page area covered by images (0.0 - 1.0)
+
+    bboxes are the image placements (PageCache.image_bboxes()), found on
+    the page when not given.
+    """
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    if page_area <= 0:
+        return 0.0
+
+    if bboxes is None:
+        bboxes = page_cache(page).image_bboxes()
+
+    covered = 0.0
+    for rect in bboxes:
+        clipped = rect & page_rect
+        if not clipped.is_empty:
+            covered += clipped.width * clipped.height
+
+    # Overlapping placements are summed, so clamp to the page
+    return min(covered / page_area, 1.0)
+
+
+def drawing_count(page):
+    """Count vector paths, preferring the C-level extractor when available"""
+    if hasattr(page, 'get_cdrawings'):
+        return len(page.get_cdrawings())
+    return len(page.get_drawings())
+
+
+def classify_page(page):
+    """Classify a page and return the label with the measurements behind it"""
+    cache = page_cache(page)
+    text_chars = len(cache.textpage().extractText().strip())
+    # Every placement, inline images included, from one pass over the display list
+    images = cache.image_bboxes()
+    coverage = image_coverage(page, images) if images else 0.0
+    drawings = drawing_count(page)
+
+    has_text = text_chars > MIN_TEXT_CHARS
+
+    if has_text:
+        page_type = PAGE_MIXED if coverage >= MIXED_MIN_IMAGE_COVERAGE else PAGE_DIGITAL
+    elif coverage >= SCANNED_MIN_IMAGE_COVERAGE:
+        page_type = PAGE_SCANNED
+    elif drawings:
+        page_type = PAGE_VECTOR
+    elif images:
+        # Small images alone: full extraction, region OCR included
+        page_type = PAGE_MIXED
+    else:
+        page_type = PAGE_BLANK
+
+    return {
+        'type': page_type,
+        'text_chars': text_chars,
+        'image_count': len(images),
+        'image_coverage': round(coverage, 4),
+        'drawing_count': drawings
+    }
+
+
+def classify_document(doc, page_numbers=None):
+    """Classify the given 0-based pages (all pages by default)"""
+    if page_numbers is None:
+        page_numbers = range(len(doc))
+    return [dict(classify_page(doc[pno]), page=pno + 1) for pno in page_numbers]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python page_classifier.py <pdf_path>", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        doc = fitz.open(sys.argv[1])
+        print(json.dumps({'success': True, 'pages': classify_document(doc)}))
+        doc.close()
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Blank pixmap detection for the PyMuPDF converters
+
+Decides whether a rendered region holds anything worth saving without
+copying the sample buffer. The per-channel min/max comes from a numpy view
+of the samples when numpy is installed, or from a grid of sampled pixels
+(every k-th pixel of every k-th row, k growing with the pixmap size) walked
+row by row and stopped at the first row that shows real content.
+Pixmap.color_topusage and is_unicolor are not used: they build a dict of
+every distinct color, or loop over every sample in Python, which costs
+memory and time on photographic renders. A region is blank when
+it is fully transparent, or a single color matching the page background
+(white unless told otherwise); a solid colored fill is content. Differences
+up to the tolerance (anti-aliasing noise, JPEG ringing) still count as
+blank.
+
+top_color_share estimates how much of a pixmap its most frequent color
+covers from the same bounded grid, for the image encoder's format choice.
+"""
+
+import math
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Maximum per-channel spread (0-255) still considered blank
+BLANK_TOLERANCE = 8
+
+# Pixels examined by the scan without numpy; larger pixmaps are sampled on a grid
+SAMPLE_PIXELS = 64 * 1024
+
+
+def _samples_view(pix):
+    """Zero-copy view of the samples when PyMuPDF provides one"""
+    if hasattr(pix, 'samples_mv'):
+        return pix.samples_mv
+    return memoryview(pix.samples)
+
+
+def _white(pix):
+    """Background color of a pixmap's colorspace: no ink for CMYK, full intensity otherwise"""
+    n = pix.n - pix.alpha
+    return (0,) * n if n == 4 else (255,) * n
+
+
+def _matches(color, background, tolerance):
+    return all(abs(c - b) <= tolerance for c, b in zip(color, background))
+
+
+def _shows_content(low, high, color_channels, tolerance, background):
+    """True if pixels with these channel ranges are visible and not a uniform background"""
+    n = len(low)
+    # Fully transparent: whatever the colors are, nothing is visible
+    if n > color_channels and high[n - 1] <= tolerance:
+        return False
+    if any(high[c] - low[c] > tolerance for c in range(n)):
+        return True
+    return not (_matches(low[:color_channels], background, tolerance)
+                and _matches(high[:color_channels], background, tolerance))
+
+
+def _channel_ranges(pix, samples):
+    """Per-channel (min, max) over every pixel, vectorised with numpy"""
+    n = pix.n
+    rows = numpy.frombuffer(samples, dtype=numpy.uint8).reshape(pix.height, pix.stride)
+    # One strided view per channel: far faster than reducing an (pixels, n) array along axis 0
+    channels = [rows[:, channel:pix.width * n:n] for channel in range(n)]
+    return [int(values.min()) for values in channels], [int(values.max()) for values in channels]
+
+
+def _grid_step(pix):
+    """Row and column step of the sampling grid, 1 (every pixel) for small pixmaps"""
+    return max(1, math.ceil(math.sqrt(pix.width * pix.height / SAMPLE_PIXELS)))
+
+
+def is_blank_pixmap(pix, tolerance=BLANK_TOLERANCE, background=None):
+    """True if the pixmap is fully transparent, or a single color within tolerance of background.
+
+    background is a tuple of color channel values (0-255) without alpha,
+    white by default. Without numpy, pixmaps larger than SAMPLE_PIXELS are
+    judged on a grid of sampled pixels.
+    """
+    if pix.width == 0 or pix.height == 0:
+        return True
+
+    n = pix.n
+    color_channels = n - pix.alpha
+    if background is None:
+        background = _white(pix)
+
+    samples = _samples_view(pix)
+    if numpy is not None:
+        low, high = _channel_ranges(pix, samples)
+        return not _shows_content(low, high, color_channels, tolerance, background)
+
+    stride = pix.stride
+    row_bytes = pix.width * n
+    step = _grid_step(pix)
+
+    low = [255] * n
+    high = [0] * n
+
+    for row in range(0, pix.height, step):
+        start = row * stride
+        line = samples[start:start + row_bytes]
+        for channel in range(n):
+            values = line[channel::n * step]
+            low[channel] = min(low[channel], min(values))
+            high[channel] = max(high[channel], max(values))
+        if _shows_content(low, high, color_channels, tolerance, background):
+            return False
+
+    # Transparent everywhere, or uniform and close to the background
+    return True
+
+
+def top_color_share(pix):
+    """Share (0-1) of the pixels holding the most frequent color, estimated on the sampling grid.
+
+    At most SAMPLE_PIXELS pixels are counted, so memory stays bounded
+    whatever the number of distinct colors in the pixmap.
+    """
+    if pix.width == 0 or pix.height == 0:
+        return 1.0
+
+    n = pix.n
+    step = _grid_step(pix)
+    samples = _samples_view(pix)
+
+    if numpy is not None:
+        rows = numpy.frombuffer(samples, dtype=numpy.uint8).reshape(pix.height, pix.stride)
+        grid = rows[::step, :pix.width * n].reshape(-1, pix.width, n)[:, ::step].reshape(-1, n)
+        _colors, counts = numpy.unique(grid, axis=0, return_counts=True)
+        return int(counts.max()) / len(grid)
+
+    stride = pix.stride
+    row_bytes = pix.width * n
+    counts = Counter()
+    for row in range(0, pix.height, step):
+        start = row * stride
+        line = bytes(samples[start:start + row_bytes])
+        counts.update(line[i:i + n] for i in range(0, row_bytes, n * step))
+    return counts.most_common(1)[0][1] / sum(counts.values())
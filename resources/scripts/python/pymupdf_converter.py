@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Single entry point hosting every PyMuPDF converter version
+
+Usage: pymupdf_converter.py pdf_file image_dir [output_html] [--chain=auto,base64,v11,v10,v7,v2]
+                            [--timeout=SECONDS] [--strategy-timeout=SECONDS]
+
+The converters of the chain are tried one after the other in this process.
+The PDF is opened once and the per-page caches are shared between attempts
+(see page_cache.share_page_caches), so a failing converter costs its own run
+instead of a new interpreter that parses the whole file again. Each attempt
+is buffered in a temporary file: a converter failing halfway leaves nothing
+in the output.
+
+"auto" in the chain is replaced by the strategy converter_probe.py picks
+from a few sampled pages; the decision is added to the report.
+
+--strategy-timeout stops a converter after that many seconds and moves on
+to the next one. --timeout is the budget of the whole run: the last
+attempts are cut short so the run ends TIMEOUT_MARGIN seconds before it,
+leaving time to write the output and the report.
+
+The winning strategy and the timing of every attempt are written to stderr:
+Converter report: {"strategy": "v11", "attempts": [{"strategy": "base64", "ok": false, "seconds": 0.41, "error": "..."}, ...]}
+"""
+
+import importlib
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+
+from html_stream import output_stream
+from page_cache import share_page_caches
+from converter_probe import probe_document
+
+# Strategy name -> (module, function); modules are imported on first use
+STRATEGIES = {
+    'base64': ('pymupdf_converter_base64', 'pdf_to_html_base64'),
+    'v2': ('pymupdf_converter_v2', 'pdf_to_perfect_html'),
+    'v3': ('pymupdf_converter_v3', 'pdf_to_html_with_individual_elements'),
+    'v4': ('pymupdf_converter_v4', 'pdf_to_html_complete'),
+    'v5': ('pymupdf_converter_v5', 'pdf_to_html_individual_elements'),
+    'v6': ('pymupdf_converter_v6', 'pdf_to_html_elements_only'),
+    'v7': ('pymupdf_converter_v7', 'pdf_to_html_hybrid'),
+    'v8': ('pymupdf_converter_v8', 'pdf_to_html_smart_extraction'),
+    'v9': ('pymupdf_converter_v9', 'pdf_to_html_perfect_extraction'),
+    'v10': ('pymupdf_converter_v10', 'pdf_to_html_optimized'),
+    'v11': ('pymupdf_converter_v11', 'pdf_to_html_no_background'),
+    'perfect': ('pymupdf_perfect', 'pdf_to_perfect_html'),
+}
+
+# Placeholder resolved by the document probe
+STRATEGY_AUTO = 'auto'
+
+# Strategies embedding their images, they take no image directory
+SELF_CONTAINED = {'base64'}
+
+# Same order as the fallback_chain of config/pdf_converter.php
+DEFAULT_CHAIN = ('base64', 'v11', 'v10', 'v7', 'v2')
+
+# What the PHP service accepts as converted HTML
+HTML_MARKERS = ('<style>', '<div')
+
+READ_CHUNK = 64 * 1024
+
+# Seconds kept from --timeout to copy the winning output and write the report
+TIMEOUT_MARGIN = 5
+
+
+# Not an Exception: the converters' own "except Exception" handlers must not swallow it
+class StrategyTimeout(BaseException):
+    pass
+
+
+def validate_chain(chain):
+    for name in chain:
+        if name not in STRATEGIES and name != STRATEGY_AUTO:
+            raise ValueError(f'Unknown converter strategy: {name} (expected one of {", ".join(STRATEGIES)})')
+
+
+def get_strategy(name):
+    """Return the converter function registered under name"""
+    if name not in STRATEGIES:
+        raise ValueError(f'Unknown converter strategy: {name} (expected one of {", ".join(STRATEGIES)})')
+    module_name, function_name = STRATEGIES[name]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def run_strategy(name, doc, img_dir, out):
+    """Convert an opened document with one strategy, writing the HTML to out"""
+    convert = get_strategy(name)
+    if name in SELF_CONTAINED:
+        convert(doc, out=out)
+    else:
+        convert(doc, img_dir, out)
+
+
+@contextmanager
+def time_limit(seconds):
+    """Raise StrategyTimeout in the block after seconds; no limit when None or without SIGALRM"""
+    if seconds is None or not hasattr(signal, 'SIGALRM'):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise StrategyTimeout(f'timed out after {seconds:g}s')
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, max(seconds, 0.001))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _attempt_limit(strategy_timeout, deadline):
+    """Seconds granted to the next attempt, None when unlimited"""
+    limits = [strategy_timeout] if strategy_timeout else []
+    if deadline is not None:
+        limits.append(deadline - time.perf_counter())
+    return min(limits) if limits else None
+
+
+def resolve_chain(chain, probed):
+    """Replace "auto" with the probed strategy, keeping the first occurrence of each name"""
+    resolved = []
+    for name in chain:
+        name = probed if name == STRATEGY_AUTO else name
+        if name not in resolved:
+            resolved.append(name)
+    return resolved
+
+
+def _contains_html(stream):
+    """True if the stream holds one of HTML_MARKERS, read in bounded chunks"""
+    overlap = max(len(marker) for marker in HTML_MARKERS) - 1
+    tail = ''
+    while True:
+        chunk = stream.read(READ_CHUNK)
+        if not chunk:
+            return False
+        text = tail + chunk
+        if any(marker in text for marker in HTML_MARKERS):
+            return True
+        tail = text[-overlap:]
+
+
+def convert_with_fallback(pdf_path, img_dir, out, chain=DEFAULT_CHAIN, timeout=None, strategy_timeout=None):
+    """Try the strategies of chain in order and copy the first good output to out.
+
+    Each attempt is stopped after strategy_timeout seconds, and no attempt
+    runs past timeout (minus TIMEOUT_MARGIN) from the start of the call.
+    Returns the report: {"strategy": winning name or None, "attempts": [...]},
+    plus "probe" when the chain contains "auto".
+    """
+    validate_chain(chain)
+    deadline = time.perf_counter() + timeout - min(TIMEOUT_MARGIN, timeout / 2) if timeout else None
+    report = {'strategy': None, 'attempts': []}
+    doc = fitz.open(pdf_path)
+    try:
+        if STRATEGY_AUTO in chain:
+            started = time.perf_counter()
+            probe = probe_document(doc)
+            probe['seconds'] = round(time.perf_counter() - started, 3)
+            report['probe'] = probe
+            chain = resolve_chain(chain, probe['strategy'])
+
+        with share_page_caches(doc):
+            for name in chain:
+                attempt = {'strategy': name, 'ok': False}
+                limit = _attempt_limit(strategy_timeout, deadline)
+                if limit is not None and limit <= 0:
+                    attempt['error'] = 'no time left'
+                    report['attempts'].append(attempt)
+                    continue
+                started = time.perf_counter()
+                with tempfile.TemporaryFile('w+', encoding='utf-8') as buffer:
+                    try:
+                        with time_limit(limit):
+                            run_strategy(name, doc, img_dir, buffer)
+                        buffer.seek(0)
+                        attempt['ok'] = _contains_html(buffer)
+                        if not attempt['ok']:
+                            attempt['error'] = 'no HTML produced'
+                    except (Exception, StrategyTimeout) as e:
+                        attempt['error'] = str(e)
+                    attempt['seconds'] = round(time.perf_counter() - started, 3)
+                    report['attempts'].append(attempt)
+
+                    if attempt['ok']:
+                        buffer.seek(0)
+                        shutil.copyfileobj(buffer, out)
+                        out.flush()
+                        report['strategy'] = name
+                        break
+    finally:
+        doc.close()
+    return report
+
+
+def parse_chain(argv):
+    """Separate --chain=a,b,c and the timeouts from the positional arguments.
+
+    Returns (args, chain, timeouts), timeouts holding the keyword arguments
+    of convert_with_fallback.
+    """
+    chain = DEFAULT_CHAIN
+    timeouts = {}
+    args = []
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name == '--chain':
+            chain = tuple(item.strip() for item in value.split(',') if item.strip())
+            validate_chain(chain)
+        elif name in ('--timeout', '--strategy-timeout'):
+            try:
+                timeouts[name[2:].replace('-', '_')] = float(value)
+            except ValueError:
+                raise ValueError(f'{name} expects a number of seconds, got "{value}"')
+        else:
+            args.append(arg)
+    return args, chain, timeouts
+
+
+if __name__ == "__main__":
+    try:
+        args, chain, timeouts = parse_chain(sys.argv[1:])
+    except ValueError as e:
+        print(f"<div>Error: {str(e)}</div>")
+        sys.exit(1)
+
+    if len(args) < 2:
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html] [--chain=auto,base64,v11,...] "
+              "[--timeout=SECONDS] [--strategy-timeout=SECONDS]</div>")
+        sys.exit(1)
+
+    pdf_file = args[0]
+    img_dir = args[1]
+    output_path = args[2] if len(args) > 2 else None
+
+    os.makedirs(img_dir, exist_ok=True)
+
+    try:
+        with output_stream(output_path) as out:
+            report = convert_with_fallback(pdf_file, img_dir, out, chain, **timeouts)
+    except Exception as e:
+        print(f"<div>Error: {str(e)}</div>")
+        sys.exit(1)
+
+    sys.stderr.write(f"Converter report: {json.dumps(report)}\n")
+    if report['strategy'] is None:
+        print("<div>Error: every converter strategy failed</div>")
+        sys.exit(1)
@@ -1,20 +1,186 @@
 #!/usr/bin/env python3
 import fitz  # PyMuPDF
 import sys
+import json
 import base64
-import io
+import argparse
 import html
+import os
+import tempfile
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 
-def pdf_to_html_base64(pdf_path):
-    """
-    Extracts individual elements (text, images, vector drawings) from a PDF
-    and creates a self-contained HTML with all images embedded as base64.
+from image_encoding import ImageEncoder, FORMATS, FORMAT_AUTO, DEFAULT_QUALITY
+from content_stream import page_rules, RuleIndex
+from html_stream import HtmlStreamWriter, output_stream
+from page_cache import open_document, page_cache
+from html_styles import StyleRegistry
+from span_coalescing import iter_text_groups, PARAGRAPH_CSS
+
+LINE_CAPS = ("butt", "round", "square")
+LINE_JOINS = ("miter", "round", "bevel")
+
+# Page ranges per worker process in --workers mode
+RANGES_PER_WORKER = 4
+
+# Page ranges submitted ahead per worker; bounds the finished ranges held in memory
+IN_FLIGHT_PER_WORKER = 2
+
+# File extensions of image assets in split output
+ASSET_EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/webp': 'webp',
+}
+
+# Render resolution of inline images (drawn without an xref)
+INLINE_IMAGE_ZOOM = 2
+
+def _svg_color(color):
+    """Convert a PyMuPDF color tuple (0-1 floats) to a hex string"""
+    if not color or not isinstance(color, (tuple, list)) or len(color) < 3:
+        return "#000000"
+    return "#{:02x}{:02x}{:02x}".format(*(int(max(0, min(1, c)) * 255) for c in color[:3]))
+
+def _drawing_path_data(drawing):
+    """Build the SVG path data of a drawing from its items"""
+    d = []
+    current = None
+    for item in drawing.get("items", []):
+        op = item[0]
+        if op == "l":
+            p1, p2 = item[1], item[2]
+            if current is None or current != p1:
+                d.append(f"M{p1.x:.2f} {p1.y:.2f}")
+            d.append(f"L{p2.x:.2f} {p2.y:.2f}")
+            current = p2
+        elif op == "c":
+            p1, p2, p3, p4 = item[1], item[2], item[3], item[4]
+            if current is None or current != p1:
+                d.append(f"M{p1.x:.2f} {p1.y:.2f}")
+            d.append(f"C{p2.x:.2f} {p2.y:.2f} {p3.x:.2f} {p3.y:.2f} {p4.x:.2f} {p4.y:.2f}")
+            current = p4
+        elif op == "re":
+            r = item[1]
+            d.append(f"M{r.x0:.2f} {r.y0:.2f}H{r.x1:.2f}V{r.y1:.2f}H{r.x0:.2f}Z")
+            current = None
+        elif op == "qu":
+            q = item[1]
+            d.append(f"M{q.ul.x:.2f} {q.ul.y:.2f}L{q.ur.x:.2f} {q.ur.y:.2f}"
+                     f"L{q.lr.x:.2f} {q.lr.y:.2f}L{q.ll.x:.2f} {q.ll.y:.2f}Z")
+            current = None
+    if drawing.get("closePath") and current is not None:
+        d.append("Z")
+    return "".join(d)
+
+def drawings_to_svg(drawings, page_width, page_height):
+    """Convert all vector drawings of a page into a single inline SVG layer"""
+    paths = []
+    for drawing in drawings:
+        d = _drawing_path_data(drawing)
+        if not d:
+            continue
+        
+        fill = drawing.get("fill")
+        stroke = drawing.get("color")
+        attrs = [f'd="{d}"']
+        
+        if fill:
+            attrs.append(f'fill="{_svg_color(fill)}"')
+            fill_opacity = drawing.get("fill_opacity", drawing.get("opacity"))
+            if fill_opacity is not None and fill_opacity < 1:
+                attrs.append(f'fill-opacity="{fill_opacity:.3f}"')
+            if drawing.get("even_odd"):
+                attrs.append('fill-rule="evenodd"')
+        else:
+            attrs.append('fill="none"')
+        
+        if stroke:
+            attrs.append(f'stroke="{_svg_color(stroke)}"')
+            attrs.append(f'stroke-width="{drawing.get("width") or 1:.2f}"')
+            stroke_opacity = drawing.get("stroke_opacity", drawing.get("opacity"))
+            if stroke_opacity is not None and stroke_opacity < 1:
+                attrs.append(f'stroke-opacity="{stroke_opacity:.3f}"')
+            line_cap = drawing.get("lineCap")
+            if line_cap:
+                cap = line_cap[0] if isinstance(line_cap, (tuple, list)) else line_cap
+                if cap in (1, 2):
+                    attrs.append(f'stroke-linecap="{LINE_CAPS[cap]}"')
+            line_join = drawing.get("lineJoin")
+            if line_join in (1, 2):
+                attrs.append(f'stroke-linejoin="{LINE_JOINS[int(line_join)]}"')
+            dashes = drawing.get("dashes")
+            if dashes and dashes.startswith("[") and not dashes.startswith("[]"):
+                pattern, _, phase = dashes[1:].partition("]")
+                attrs.append(f'stroke-dasharray="{pattern.strip()}"')
+                if phase.strip() and phase.strip() != "0":
+                    attrs.append(f'stroke-dashoffset="{phase.strip()}"')
+        elif not fill:
+            continue
+        
+        paths.append(f'<path {" ".join(attrs)}/>')
+    
+    if not paths:
+        return ""
+    
+    return (f'<svg class="pdf-vector pdf-vector-layer" xmlns="http://www.w3.org/2000/svg" '
+            f'width="{page_width}" height="{page_height}" viewBox="0 0 {page_width} {page_height}" '
+            f'style="left:0;top:0;width:{page_width}px;height:{page_height}px;pointer-events:none;" '
+            f'data-vector-layer="true">{"".join(paths)}</svg>')
+
+class ImageRegistry:
+    """Document-level image registry.
+    
+    Each image xref is extracted and encoded once and emitted once as a
+    <template id="pdf-img-N"> holding the data URI; every placement is an
+    <img class="pdf-image"> referring to it through data-image-ref, its src
+    filled in by IMAGE_RESOLVER. With asset_dir, the image is written to a
+    file in that directory instead and placements point their src at it.
     """
-    doc = fitz.open(pdf_path)
-    html_parts = []
     
-    # Start HTML with styles for absolute positioning of elements
-    html_parts.append("""<!DOCTYPE html>
+    def __init__(self, doc, encoder=None, asset_dir=None):
+        self.doc = doc
+        self.encoder = encoder or ImageEncoder()
+        self.asset_dir = asset_dir
+        self._refs = {}
+        self._pending = []
+    
+    def attributes_for(self, xref):
+        """Return the <img> attributes locating an image xref, encoding it on first use (None on failure)"""
+        if xref in self._refs:
+            return self._refs[xref]
+        
+        attributes = None
+        try:
+            mime_type, data = self.encoder.encode_xref(self.doc, xref)
+            if self.asset_dir:
+                name = f"img-{xref}.{ASSET_EXTENSIONS[mime_type]}"
+                # Workers sharing an xref write the same file: each one replaces it atomically
+                fd, temp_path = tempfile.mkstemp(dir=self.asset_dir, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, os.path.join(self.asset_dir, name))
+                # Relative to index.html, where the pages are inserted
+                attributes = f'src="assets/{name}"'
+            else:
+                ref = f"pdf-img-{xref}"
+                url = f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+                self._pending.append((xref, f'<template id="{ref}"><img src="{url}" alt=""></template>'))
+                attributes = f'data-image-ref="{ref}"'
+        except Exception as e:
+            sys.stderr.write(f"Error converting image {xref} to base64: {e}\n")
+        
+        self._refs[xref] = attributes
+        return attributes
+    
+    def take_pending(self):
+        """Return the (xref, <template>) definitions added since the last call"""
+        pending = self._pending
+        self._pending = []
+        return pending
+
+HTML_HEADER = """<!DOCTYPE html>
 <html>
 <head>
 <meta charset="UTF-8">
@@ -67,106 +233,158 @@ body {
     z-index: 3;
     pointer-events: none;
 }
-</style>
+""" + PARAGRAPH_CSS + """</style>
 </head>
-<body>""")
+<body>"""
+
+SPLIT_HEAD = """<link rel="stylesheet" href="assets/styles.css">
+"""
+
+# Fills in the src of deduplicated images from their <template> definition;
+# the editor does the same when it loads the HTML (PDFEditorCore.resolveImageReferences)
+IMAGE_RESOLVER = """
+<script>
+(function () {
+    document.querySelectorAll('img.pdf-image[data-image-ref]:not([src])').forEach(function (img) {
+        var definition = document.getElementById(img.dataset.imageRef);
+        var source = definition && definition.content.querySelector('img');
+        if (source) {
+            img.setAttribute('src', source.getAttribute('src'));
+        }
+    });
+})();
+</script>
+"""
+
+SPLIT_LOADER = """
+<script>
+(function () {
+    var observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (!entry.isIntersecting) {
+                return;
+            }
+            var placeholder = entry.target;
+            observer.unobserve(placeholder);
+            fetch(placeholder.dataset.src).then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status + ' ' + response.statusText);
+                }
+                return response.text();
+            }).then(function (fragment) {
+                var template = document.createElement('template');
+                template.innerHTML = fragment;
+                var page = template.content.firstElementChild;
+                placeholder.replaceWith(page);
+                document.dispatchEvent(new CustomEvent('pdf-page-loaded', {
+                    detail: {page: page, pageNumber: Number(page.dataset.pageNumber)}
+                }));
+            }).catch(function (error) {
+                console.error('Failed to load ' + placeholder.dataset.src, error);
+            });
+        });
+    }, {rootMargin: '1500px 0px'});
+    document.querySelectorAll('.pdf-page-placeholder').forEach(function (placeholder) {
+        observer.observe(placeholder);
+    });
+})();
+</script>
+"""
+
+def _same_rect(r1, r2, tolerance=1.0):
+    """True if two rectangles match within tolerance points on every side"""
+    return all(abs(a - b) <= tolerance for a, b in zip(r1, r2))
+
+def convert_page(page, page_num, images, styles, paragraphs=False):
+    """Convert one page to its HTML fragment; images and text styles are resolved through the registries.
+    
+    With paragraphs, the text runs of each block are grouped in one editable container.
     
-    for page_num, page in enumerate(doc):
-        page_width, page_height = page.rect.width, page.rect.height
-        html_parts.append(f'<div class="pdf-page-container" style="width:{page_width}px;height:{page_height}px;" data-page-number="{page_num + 1}">')
+    The content stream is interpreted once into a display list (see page_cache.py);
+    text, inline image renders and blank checks are all replayed from it.
+    """
+    parts = []
+    cache = page_cache(page)
+    # Cache failures propagate: an empty page must not pass for a converted one
+    text_dict = cache.text_dict()
+    image_bboxes = cache.image_bboxes()
+    page_width, page_height = page.rect.width, page.rect.height
+    parts.append(f'<div class="pdf-page-container" style="width:{page_width}px;height:{page_height}px;" data-page-number="{page_num + 1}">')
 
-        # --- Extract text spans ---
-        all_text_spans = []
-        try:
-            text_dict = page.get_text("dict", flags=fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE)
-            for block in text_dict.get("blocks", []):
-                if block["type"] == 0:  # text block
-                    for line in block.get("lines", []):
-                        for span in line.get("spans", []):
-                            all_text_spans.append(span)
-        except Exception as e:
-            sys.stderr.write(f"Error extracting text on page {page_num + 1}: {e}\n")
+    # --- Extract text spans ---
+    text_groups = []
+    try:
+        text_groups = list(iter_text_groups(text_dict, paragraphs))
+    except Exception as e:
+        sys.stderr.write(f"Error extracting text on page {page_num + 1}: {e}\n")
 
-        # --- Extract and convert raster images to base64 ---
-        raster_images = []
-        try:
-            raster_images = page.get_images(full=True)
-        except Exception as e:
-            sys.stderr.write(f"Error extracting raster images on page {page_num + 1}: {e}\n")
-            
-        # --- Extract vector drawings and lines ---
-        vector_drawings = []
-        horizontal_lines = []
-        
-        # Method 1: Standard drawings extraction
-        try:
-            drawings = page.get_drawings()
-            for drawing in drawings:
-                if drawing.get("items"):
-                    vector_drawings.append(drawing)
-        except Exception as e:
-            sys.stderr.write(f"Error extracting vector drawings on page {page_num + 1}: {e}\n")
-        
-        # Method 2: Extract paths (includes lines not detected as drawings)
-        try:
-            paths = page.get_cdrawings()
-            for path in paths:
-                # Check if it's a horizontal line
-                items = path.get("items", [])
-                for item in items:
-                    if item[0] == "l":  # line
-                        p1, p2 = item[1], item[2]
-                        # Check if it's horizontal (y coordinates similar)
-                        if abs(p1.y - p2.y) < 2:  # tolerance of 2 pixels
-                            line_rect = fitz.Rect(min(p1.x, p2.x), min(p1.y, p2.y) - 1,
-                                                max(p1.x, p2.x), max(p1.y, p2.y) + 1)
-                            horizontal_lines.append({
-                                "rect": line_rect,
-                                "stroke": path.get("stroke", (0, 0, 0)),
-                                "width": path.get("width", 1)
-                            })
-        except Exception as e:
-            sys.stderr.write(f"Error extracting paths on page {page_num + 1}: {e}\n")
+    # --- Extract and convert raster images to base64 ---
+    raster_images = []
+    try:
+        raster_images = page.get_images(full=True)
+    except Exception as e:
+        sys.stderr.write(f"Error extracting raster images on page {page_num + 1}: {e}\n")
         
-        # Method 3: Extract from page content stream (fallback for undetected lines)
-        try:
-            # Get the page's display list
-            dl = page.get_displaylist()
-            # Extract text and graphics
-            text_page = dl.get_textpage()
-            
-            # Try to find horizontal rules in the content
-            contents = page.read_contents()
-            if contents and b"re" in contents:  # rectangle operator
-                # Basic pattern matching for rectangles that might be lines
-                import re
-                # Pattern for thin rectangles (potential horizontal lines)
-                rect_pattern = re.compile(rb'(\d+\.?\d*)\s+(\d+\.?\d*)\s+(\d+\.?\d*)\s+(\d+\.?\d*)\s+re')
-                for match in rect_pattern.finditer(contents):
-                    try:
-                        x, y, w, h = map(float, match.groups())
-                        # Check if it's a horizontal line (height < 3 pixels)
-                        if h < 3 and w > 20:  # thin and wide enough
-                            line_rect = fitz.Rect(x, y, x + w, y + h)
-                            # Check if not already captured
-                            is_duplicate = False
-                            for existing in horizontal_lines:
-                                if abs(existing["rect"].y0 - line_rect.y0) < 2:
-                                    is_duplicate = True
-                                    break
-                            if not is_duplicate:
-                                horizontal_lines.append({
-                                    "rect": line_rect,
-                                    "stroke": (0, 0, 0),
-                                    "width": max(1, h)
-                                })
-                    except:
-                        pass
-        except Exception as e:
-            sys.stderr.write(f"Error extracting from content stream on page {page_num + 1}: {e}\n")
+    # --- Extract vector drawings and lines ---
+    vector_drawings = []
+    horizontal_lines = []
+    
+    # Method 1: Standard drawings extraction
+    try:
+        drawings = cache.drawings()
+        for drawing in drawings:
+            if drawing.get("items"):
+                vector_drawings.append(drawing)
+    except Exception as e:
+        sys.stderr.write(f"Error extracting vector drawings on page {page_num + 1}: {e}\n")
+    
+    # Method 2: Horizontal line segments of those same paths
+    rule_index = RuleIndex(tolerance=2)
+    try:
+        for path in vector_drawings:
+            for item in path["items"]:
+                if item[0] == "l":  # line
+                    (x0, y0), (x1, y1) = item[1], item[2]
+                    # Check if it's horizontal (y coordinates similar)
+                    if abs(y0 - y1) < 2:  # tolerance of 2 pixels
+                        line_rect = fitz.Rect(min(x0, x1), min(y0, y1) - 1,
+                                            max(x0, x1), max(y0, y1) + 1)
+                        horizontal_lines.append({
+                            "rect": line_rect,
+                            "stroke": path.get("color") or (0, 0, 0),
+                            "width": path.get("width") or 1
+                        })
+                        rule_index.add(line_rect)
+    except Exception as e:
+        sys.stderr.write(f"Error extracting paths on page {page_num + 1}: {e}\n")
+    
+    # Method 3: Scan the content stream for thin rectangles and lines
+    # (fallback for undetected rules; CTM aware, see content_stream.py)
+    try:
+        for rule in page_rules(page, max_thickness=3, min_length=20):
+            line_rect = fitz.Rect(rule["rect"])
+            if rule_index.is_duplicate(line_rect):
+                continue
+            horizontal_lines.append({
+                "rect": line_rect,
+                "stroke": rule["color"],
+                "width": rule["width"]
+            })
+            rule_index.add(line_rect)
+    except Exception as e:
+        sys.stderr.write(f"Error extracting from content stream on page {page_num + 1}: {e}\n")
 
-        # --- Add text spans to HTML ---
-        for span in all_text_spans:
+    # --- Add text to HTML, one element per run of same-style spans (see span_coalescing.py) ---
+    for paragraph_bbox, runs in text_groups:
+        # Inside a paragraph, runs are placed relative to it and the paragraph is edited as a whole
+        origin_x = origin_y = 0
+        editable = ' contenteditable="true"'
+        if paragraph_bbox:
+            origin_x, origin_y = paragraph_bbox[0], paragraph_bbox[1]
+            editable = ''
+            parts.append(f'<div contenteditable="true" class="pdf-paragraph" style="left:{origin_x:.1f}px;top:{origin_y:.1f}px;'
+                         f'width:{paragraph_bbox[2] - origin_x:.1f}px;height:{paragraph_bbox[3] - origin_y:.1f}px;z-index:10">')
+        for span in runs:
             text = span.get("text", "").strip()
             if not text:
                 continue
@@ -178,160 +396,289 @@ body {
             font_name = span.get("font", "Arial")
             
             escaped_text = html.escape(text)
-            style = (f"left:{bbox[0]:.1f}px;top:{bbox[1]:.1f}px;"
-                    f"font-size:{font_size:.1f}px;color:{color_hex};"
-                    f"font-family:'{font_name}',sans-serif")
-            html_parts.append(f'<span contenteditable="true" class="pdf-text" style="{style}">{escaped_text}</span>')
+            style_class = styles.class_for(f"font-size:{font_size:.1f}px;color:{color_hex};"
+                                           f"font-family:'{font_name}',sans-serif")
+            parts.append(f'<span{editable} class="pdf-text {style_class}" '
+                         f'style="left:{bbox[0] - origin_x:.1f}px;top:{bbox[1] - origin_y:.1f}px">{escaped_text}</span>')
+        if paragraph_bbox:
+            parts.append('</div>')
 
-        # --- Add raster images as base64 ---
-        for img_info in raster_images:
-            xref = img_info[0]
-            if xref == 0:
+    # --- Place raster images, each xref encoded once per document ---
+    placed_rects = []
+    for img_info in raster_images:
+        xref = img_info[0]
+        if xref == 0:
+            continue
+        
+        try:
+            attributes = images.attributes_for(xref)
+            if not attributes:
                 continue
             
-            try:
-                # Extract the image
-                pix = fitz.Pixmap(doc, xref)
-                
-                # Convert to PNG if necessary
-                if pix.alpha:
-                    pix = fitz.Pixmap(fitz.csRGB, pix)
-                
-                # Convert to base64
-                img_buffer = io.BytesIO()
-                pix.pil_save(img_buffer, format="PNG", optimize=True)
-                img_buffer.seek(0)
-                img_base64 = base64.b64encode(img_buffer.read()).decode('utf-8')
-                
-                # Get image rectangles on the page
-                img_rects = page.get_image_rects(xref, transform=True)
-                
-                for r in img_rects:
-                    if not r.is_empty:
-                        html_parts.append(
-                            f'<img src="data:image/png;base64,{img_base64}" '
-                            f'class="pdf-image" '
-                            f'style="left:{r.x0}px;top:{r.y0}px;width:{r.width}px;height:{r.height}px;" '
-                            f'alt="Image" />'
-                        )
-                
-                pix = None  # Free memory
-                
-            except Exception as e:
-                sys.stderr.write(f"Error converting image {xref} to base64: {e}\n")
+            for r in page.get_image_rects(xref):
+                if not r.is_empty:
+                    placed_rects.append(r)
+                    parts.append(
+                        f'<img {attributes} class="pdf-image" '
+                        f'style="left:{r.x0}px;top:{r.y0}px;width:{r.width}px;height:{r.height}px;" alt="Image" />'
+                    )
+            
+        except Exception as e:
+            sys.stderr.write(f"Error placing image {xref}: {e}\n")
 
-        # --- Render vector drawings as base64 images ---
-        for i, drawing in enumerate(vector_drawings):
-            try:
-                # Get the bounding box of the drawing
-                rect = drawing.get("rect")
-                if not rect or rect.is_empty:
-                    continue
-                
-                # Create a temporary page with just this drawing
-                temp_doc = fitz.open()
-                temp_page = temp_doc.new_page(width=page_width, height=page_height)
-                
-                # Render the drawing on the temporary page
-                shape = temp_page.new_shape()
-                for item in drawing.get("items", []):
-                    if item[0] == "l":  # line
-                        shape.draw_line(item[1], item[2])
-                    elif item[0] == "re":  # rectangle
-                        shape.draw_rect(item[1])
-                    elif item[0] == "qu":  # quad
-                        shape.draw_quad(item[1])
-                    elif item[0] == "c":  # curve
-                        shape.draw_bezier(item[1], item[2], item[3], item[4])
-                
-                # Get stroke and fill properties
-                stroke = drawing.get("stroke")
-                fill = drawing.get("fill")
-                width = drawing.get("width", 1)
-                
-                if stroke:
-                    stroke_color = stroke if isinstance(stroke, tuple) else (0, 0, 0)
-                else:
-                    stroke_color = None
-                    
-                if fill:
-                    fill_color = fill if isinstance(fill, tuple) else (0, 0, 0)
-                else:
-                    fill_color = None
-                
-                shape.finish(
-                    color=stroke_color,
-                    fill=fill_color,
-                    width=width
-                )
-                shape.commit()
-                
-                # Render the drawing area as an image
-                mat = fitz.Matrix(2, 2)  # 2x scale for better quality
-                clip = fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y1)
-                pix = temp_page.get_pixmap(matrix=mat, clip=clip)
-                
-                # Convert to base64
-                img_buffer = io.BytesIO()
-                pix.pil_save(img_buffer, format="PNG", optimize=True)
-                img_buffer.seek(0)
-                vec_base64 = base64.b64encode(img_buffer.read()).decode('utf-8')
-                
-                # Add to HTML with original position
-                html_parts.append(
-                    f'<img src="data:image/png;base64,{vec_base64}" '
-                    f'class="pdf-vector" '
-                    f'style="left:{rect.x0}px;top:{rect.y0}px;width:{rect.width}px;height:{rect.height}px;" '
-                    f'alt="Vector drawing" />'
-                )
-                
-                temp_doc.close()
-                pix = None  # Free memory
-                
-            except Exception as e:
-                sys.stderr.write(f"Error converting vector drawing {i} to base64: {e}\n")
-        
-        # --- Render horizontal lines as HTML elements ---
-        for i, line in enumerate(horizontal_lines):
-            try:
-                rect = line["rect"]
-                stroke = line.get("stroke", (0, 0, 0))
-                width = line.get("width", 1)
-                
-                # Convert stroke color to hex
-                if isinstance(stroke, tuple) and len(stroke) >= 3:
-                    color_hex = f"#{int(stroke[0]*255):02x}{int(stroke[1]*255):02x}{int(stroke[2]*255):02x}"
-                else:
-                    color_hex = "#000000"
-                
-                # Add as a div element styled as a line
-                html_parts.append(
-                    f'<div class="pdf-vector pdf-line" '
-                    f'style="position:absolute;left:{rect.x0}px;top:{rect.y0}px;'
-                    f'width:{rect.width}px;height:{max(1, width)}px;'
-                    f'background-color:{color_hex};" '
-                    f'data-line="true"></div>'
-                )
-            except Exception as e:
-                sys.stderr.write(f"Error adding horizontal line {i}: {e}\n")
+    # --- Inline images (no xref): clipped renders from the display list ---
+    try:
+        for r in image_bboxes:
+            r &= page.rect
+            if r.is_empty or any(_same_rect(r, placed) for placed in placed_rects):
+                continue
+            if cache.is_blank(r):
+                continue
+            mime_type, data = images.encoder.encode_pixmap(cache.render(r, INLINE_IMAGE_ZOOM))
+            img_base64 = base64.b64encode(data).decode('utf-8')
+            parts.append(
+                f'<img src="data:{mime_type};base64,{img_base64}" class="pdf-image" '
+                f'style="left:{r.x0}px;top:{r.y0}px;width:{r.width}px;height:{r.height}px;" alt="Image" />'
+            )
+    except Exception as e:
+        sys.stderr.write(f"Error rendering inline images on page {page_num + 1}: {e}\n")
 
-        html_parts.append('</div>')  # Close page container
+    # --- Render all vector drawings as one inline SVG layer ---
+    if vector_drawings:
+        try:
+            parts.append(drawings_to_svg(vector_drawings, page_width, page_height))
+        except Exception as e:
+            sys.stderr.write(f"Error converting vector drawings on page {page_num + 1} to SVG: {e}\n")
+    
+    # --- Render horizontal lines as HTML elements ---
+    for i, line in enumerate(horizontal_lines):
+        try:
+            rect = line["rect"]
+            stroke = line.get("stroke", (0, 0, 0))
+            width = line.get("width", 1)
+            
+            # Convert stroke color to hex
+            if isinstance(stroke, tuple) and len(stroke) >= 3:
+                color_hex = f"#{int(stroke[0]*255):02x}{int(stroke[1]*255):02x}{int(stroke[2]*255):02x}"
+            else:
+                color_hex = "#000000"
+            
+            # Add as a div element styled as a line
+            parts.append(
+                f'<div class="pdf-vector pdf-line" '
+                f'style="position:absolute;left:{rect.x0}px;top:{rect.y0}px;'
+                f'width:{rect.width}px;height:{max(1, width)}px;'
+                f'background-color:{color_hex};" '
+                f'data-line="true"></div>'
+            )
+        except Exception as e:
+            sys.stderr.write(f"Error adding horizontal line {i}: {e}\n")
 
-    html_parts.append('</body></html>')
+    parts.append('</div>')  # Close page container
+    return "".join(parts)
+
+def _convert_range(args):
+    """Worker: convert pages first..last (0-based, inclusive) with its own document.
+    
+    Returns the encoding stats and, per page, the HTML fragment with the image
+    templates and text style rules it introduced, so the parent can drop
+    definitions already sent.
+    """
+    pdf_path, first, last, encoder_options, asset_dir, paragraphs = args
+    doc = fitz.open(pdf_path)
+    encoder = ImageEncoder(**encoder_options)
+    images = ImageRegistry(doc, encoder, asset_dir)
+    # Per-range prefix: ranges never share a class name
+    styles = StyleRegistry(prefix=f't{first}-')
+    pages = []
+    for page_num in range(first, last + 1):
+        page_html = convert_page(doc[page_num], page_num, images, styles, paragraphs)
+        pages.append((page_html, styles.take_pending(), images.take_pending()))
     doc.close()
+    return encoder.stats, pages
+
+def _page_ranges(page_count, workers):
+    """Split pages into contiguous ranges, a few per worker to balance uneven pages"""
+    size = max(1, -(-page_count // (workers * RANGES_PER_WORKER)))
+    return [(first, min(first + size, page_count) - 1) for first in range(0, page_count, size)]
+
+def _first_sent(definitions, sent):
+    """Keep the definitions whose key is not in sent yet, adding their keys to it"""
+    new = []
+    for key, definition in definitions:
+        if key not in sent:
+            sent.add(key)
+            new.append(definition)
+    return new
+
+def iter_converted_pages(pdf_path, encoder, workers=1, asset_dir=None, paragraphs=False):
+    """Yield (page_html, style_rules, image_templates) in page order.
+    
+    style_rules are the (class name, CSS rule) pairs of the text styles first
+    used on that page (see html_styles.py) and image_templates
+    the <template> definitions of the images first used on that page.
+    With workers > 1, page ranges are converted in separate processes.
+    pdf_path may also be an opened document (see page_cache.open_document);
+    one opened from a stream or bytes has no file for the workers and is
+    converted in this process.
+    """
+    doc, owns_doc = open_document(pdf_path)
+    page_count = len(doc)
+    
+    # Workers reopen the file by name: documents opened from a stream or bytes convert in-process
+    if workers > 1 and not os.path.isfile(doc.name or ''):
+        workers = 1
     
-    return ''.join(html_parts)
+    if workers <= 1 or page_count < 2:
+        images = ImageRegistry(doc, encoder, asset_dir)
+        styles = StyleRegistry()
+        for page_num, page in enumerate(doc):
+            page_html = convert_page(page, page_num, images, styles, paragraphs)
+            yield (page_html, styles.take_pending(),
+                   [template for _xref, template in images.take_pending()])
+        if owns_doc:
+            doc.close()
+        return
+    
+    # Workers open their own copy of the file
+    pdf_path = doc.name
+    if owns_doc:
+        doc.close()
+    encoder_options = {
+        'image_format': encoder.image_format,
+        'quality': encoder.quality,
+        'passthrough': encoder.passthrough,
+    }
+    ranges = _page_ranges(page_count, workers)
+    jobs = ((pdf_path, first, last, encoder_options, asset_dir, paragraphs) for first, last in ranges)
+    workers = min(workers, len(ranges))
+    sent = set()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # A bounded window of ranges is in flight, results are consumed in page order
+        in_flight = deque(executor.submit(_convert_range, job)
+                          for job in islice(jobs, workers * IN_FLIGHT_PER_WORKER))
+        while in_flight:
+            stats, pages = in_flight.popleft().result()
+            job = next(jobs, None)
+            if job is not None:
+                in_flight.append(executor.submit(_convert_range, job))
+            encoder.merge_stats(stats)
+            for page_html, style_rules, image_templates in pages:
+                # Each worker encodes its own images, only the first definition of an xref is kept;
+                # style classes are prefixed per range and never collide
+                yield page_html, style_rules, _first_sent(image_templates, sent)
+    except BaseException:
+        # Strategy timeout or abandoned output: do not wait for the queued ranges
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+def pdf_to_html_base64(pdf_path, encoder=None, out=None, workers=1, paragraphs=False):
+    """
+    Extracts individual elements (text, images, vector drawings) from a PDF
+    and creates a self-contained HTML with all images embedded as base64.
+    Images are encoded according to the encoder policy (see image_encoding.py).
+    Pages are written to out as they are finished (see html_stream.py).
+    With workers > 1, page ranges are converted in separate processes and
+    written back in page order.
+    """
+    encoder = encoder or ImageEncoder()
+    writer = HtmlStreamWriter(out)
+    writer.write(HTML_HEADER)
+    writer.flush()
+    
+    styles = StyleRegistry()
+    pages = iter_converted_pages(pdf_path, encoder, workers, paragraphs=paragraphs)
+    for page_html, style_rules, image_templates in pages:
+        # Definitions first used on this page go right before it
+        styles.adopt(style_rules)
+        writer.write(styles.take_style_block())
+        writer.write("".join(image_templates))
+        writer.write(page_html)
+        writer.end_page()
+    
+    writer.write(IMAGE_RESOLVER)
+    writer.write('</body></html>')
+    return writer.close()
+
+def pdf_to_html_split(pdf_path, output_dir, encoder=None, workers=1, paragraphs=False):
+    """
+    Write a lazily loaded multi-file version of the HTML to output_dir:
+    - index.html: page placeholders at their final size and a loader that
+      fetches each page when it comes close to the viewport,
+    - pages/page-N.html: the page container of page N,
+    - assets/: image files, referenced by the pages' <img> elements, and
+      styles.css with the text style classes.
+    Once a page is inserted, a "pdf-page-loaded" event is dispatched on the
+    document with the page element and number; PDFEditorCore registers the
+    elements of the page on it. Returns the index path.
+
+    Command line only (--split-dir): PdfToHtmlService embeds the single-file
+    HTML in the editor and has no route serving the page files.
+    """
+    encoder = encoder or ImageEncoder()
+    pages_dir = os.path.join(output_dir, 'pages')
+    asset_dir = os.path.join(output_dir, 'assets')
+    os.makedirs(pages_dir, exist_ok=True)
+    os.makedirs(asset_dir, exist_ok=True)
+    
+    # Page sizes come from the page tree only, no content is interpreted
+    doc, owns_doc = open_document(pdf_path)
+    placeholders = [
+        f'<div class="pdf-page-container pdf-page-placeholder" data-page-number="{page_num + 1}" '
+        f'data-src="pages/page-{page_num + 1}.html" style="width:{page.rect.width}px;height:{page.rect.height}px;"></div>'
+        for page_num, page in enumerate(doc)
+    ]
+    if owns_doc:
+        doc.close()
+    
+    index_path = os.path.join(output_dir, 'index.html')
+    with open(index_path, 'w', encoding='utf-8') as f:
+        f.write(HTML_HEADER.replace('</head>', SPLIT_HEAD + '</head>', 1))
+        f.write("\n".join(placeholders))
+        f.write(SPLIT_LOADER)
+        f.write('</body></html>')
+    
+    with open(os.path.join(asset_dir, 'styles.css'), 'w', encoding='utf-8') as css:
+        pages = iter_converted_pages(pdf_path, encoder, workers, asset_dir, paragraphs)
+        for page_num, (page_html, style_rules, _image_templates) in enumerate(pages):
+            css.write("".join(rule for _name, rule in style_rules))
+            with open(os.path.join(pages_dir, f'page-{page_num + 1}.html'), 'w', encoding='utf-8') as f:
+                f.write(page_html)
+    
+    return index_path
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python pymupdf_converter_base64.py <pdf_path>", file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Convert a PDF to self-contained HTML with embedded images")
+    parser.add_argument("pdf_path")
+    # Image directory passed by the converter fallback chain, unused here
+    parser.add_argument("img_dir", nargs="?")
+    parser.add_argument("--image-format", choices=FORMATS, default=FORMAT_AUTO,
+                        help="auto picks JPEG for photos and PNG for flat graphics")
+    parser.add_argument("--image-quality", type=int, default=DEFAULT_QUALITY,
+                        help="quality of lossy formats (JPEG, WebP)")
+    parser.add_argument("--output", help="write the HTML to this file instead of stdout")
+    parser.add_argument("--split-dir",
+                        help="write index.html, one file per page and shared assets to this directory (lazy page loading)")
+    parser.add_argument("--no-passthrough", action="store_true",
+                        help="always re-encode images instead of reusing the original stream")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="convert page ranges in N processes (0 = one per CPU)")
+    parser.add_argument("--paragraphs", action="store_true",
+                        help="group the text runs of each block in one editable paragraph")
+    args = parser.parse_args()
     
-    pdf_path = sys.argv[1]
+    encoder = ImageEncoder(args.image_format, args.image_quality, passthrough=not args.no_passthrough)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
     
     try:
-        html_output = pdf_to_html_base64(pdf_path)
-        print(html_output)
+        if args.split_dir:
+            print(pdf_to_html_split(args.pdf_path, args.split_dir, encoder, workers, args.paragraphs))
+        else:
+            with output_stream(args.output) as out:
+                pdf_to_html_base64(args.pdf_path, encoder, out, workers, args.paragraphs)
+        sys.stderr.write(f"Image encoding stats: {json.dumps(encoder.summary())}\n")
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -1,106 +1,131 @@
 #!/usr/bin/env python3
-import fitz  # PyMuPDF
 import sys
 import os
 
-def pdf_to_html_optimized(pdf_path, img_dir):
-    """Optimized extraction - render page without text, add text with minimal hover"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+from html_stream import HtmlStreamWriter, output_stream
+from html_styles import StyleRegistry
+from span_coalescing import iter_text_groups, split_paragraph_option, PARAGRAPH_CSS
+from page_cache import open_document, page_cache, DICT_FLAGS
+from background_pipeline import BackgroundPipeline, HIDE_TEXT_REDACT, split_background_options
+from image_encoding import FORMAT_PNG, DEFAULT_QUALITY
+
+# Shared by every text span; per-span fonts and colors are interned classes (html_styles.py)
+TEXT_STYLES = """<style>
+.pdf-text-v10{position:absolute;font-family:Arial,sans-serif;background:transparent;padding:0;margin:0;border:none;cursor:text;line-height:1;z-index:3;display:inline-block}
+.pdf-text-v10:hover{background-color:rgba(255,255,0,0.05)}
+.pdf-text-v10:focus{outline:1px solid rgba(0,123,255,0.3);background-color:rgba(255,255,204,0.1)}
+""" + PARAGRAPH_CSS + """</style>"""
+
+def pdf_to_html_optimized(pdf_path, img_dir, out=None, hide_text=HIDE_TEXT_REDACT,
+                          image_format=FORMAT_PNG, image_quality=DEFAULT_QUALITY, paragraphs=False):
+    """Optimized extraction - render page without text, add text with minimal hover.
+    
+    Same-style spans on a baseline are merged into runs (span_coalescing.py);
+    with paragraphs, each text block becomes one editable container.
+    """
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
+    # 1x and 2x backgrounds for srcset, none at all when the page is white without its text
+    backgrounds = BackgroundPipeline(doc, img_dir, densities=(1, 2), filename="page_{page}_bg.png",
+                                     engine=hide_text, image_format=image_format, image_quality=image_quality,
+                                     skip_blank=True)
+    styles = StyleRegistry()
+    writer.write(TEXT_STYLES)
+    # Written out before the first page so the per-page style blocks prepended
+    # to each page buffer always follow the base stylesheet
+    writer.flush()
     
-    # Inline all styles directly - ultra minimal hover
+    # Inline coordinates only, hover and focus come from the shared text class
     for page_num, page in enumerate(doc):
         # Get page dimensions
         rect = page.rect
         width = rect.width
         height = rect.height
         
-        # Create a copy for background (without text)
-        temp_doc = fitz.open()
-        temp_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-        temp_page = temp_doc[0]
-        
-        # Remove all text
-        text_instances = page.get_text("dict")
-        for block in text_instances["blocks"]:
-            if block["type"] == 0:  # Text block
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        bbox = fitz.Rect(span["bbox"])
-                        temp_page.add_redact_annot(bbox)
-        
-        # Apply redactions
-        temp_page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
-        
-        # Render at 2x for quality
-        mat = fitz.Matrix(2, 2)
-        pix = temp_page.get_pixmap(matrix=mat, alpha=False)
-        
-        # Save background
-        bg_filename = f"page_{page_num + 1}_bg.png"
-        bg_path = os.path.join(img_dir, bg_filename)
-        pix.save(bg_path)
+        # Background without text, rendered right before the page is written out
+        blocks = page_cache(page).text_dict(DICT_FLAGS)
+        bg_filename = backgrounds.add_page(page_num, blocks)
+        bg_html = ""
+        if bg_filename:
+            bg_html = f'<img src="{bg_filename}" srcset="{backgrounds.srcset(page_num)}" style="position:absolute;top:0;left:0;width:{width}px;height:{height}px;pointer-events:none;user-select:none;z-index:1" />'
         
         # Start page HTML with inline styles
         page_html = f"""
         <div style="position:relative;margin:20px auto;width:{width}px;height:{height}px;background:white;box-shadow:0 2px 10px rgba(0,0,0,0.1);overflow:hidden">
-            <img src="{bg_filename}" style="position:absolute;top:0;left:0;width:{width*2}px;height:{height*2}px;transform:scale(0.5);transform-origin:top left;pointer-events:none;user-select:none;z-index:1" />
+            {bg_html}
         """
-        html_parts.append(page_html)
-        
-        # Add text with minimal hover area
-        blocks = page.get_text("dict")
+        writer.write(page_html)
         
-        for block in blocks["blocks"]:
-            if block["type"] == 0:  # Text block
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        text = span["text"].strip()
-                        if text:
-                            # Get exact position
-                            bbox = span["bbox"]
-                            x = bbox[0]
-                            y = bbox[1]
-                            
-                            font_size = span["size"]
-                            color = span["color"]
-                            font_name = span.get("font", "")
-                            flags = span.get("flags", 0)
-                            
-                            color_hex = f"#{color:06x}"
-                            font_weight = "bold" if (flags & 2**4) or "bold" in font_name.lower() else "normal"
-                            font_style = "italic" if (flags & 2**1) or "italic" in font_name.lower() else "normal"
-                            
-                            # Escape HTML
-                            text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-                            text = text.replace('"', "&quot;").replace("'", "&#39;")
-                            
-                            # Inline text with minimal hover styles
-                            text_html = f"""<span contenteditable="true" onmouseover="this.style.backgroundColor='rgba(255,255,0,0.05)'" onmouseout="this.style.backgroundColor='transparent'" onfocus="this.style.outline='1px solid rgba(0,123,255,0.3)';this.style.backgroundColor='rgba(255,255,204,0.1)'" onblur="this.style.outline='none';this.style.backgroundColor='transparent'" style="position:absolute;left:{x}px;top:{y}px;font-size:{font_size}px;color:{color_hex};font-weight:{font_weight};font-style:{font_style};font-family:Arial,sans-serif;background:transparent;padding:0;margin:0;border:none;cursor:text;line-height:1;z-index:3;display:inline-block">{text}</span>"""
-                            html_parts.append(text_html)
+        # Add text with minimal hover area, one element per run of same-style spans
+        for paragraph_bbox, runs in iter_text_groups(blocks, paragraphs):
+            # Inside a paragraph, runs are placed relative to it and the paragraph is edited as a whole
+            origin_x = origin_y = 0
+            editable = ' contenteditable="true"'
+            if paragraph_bbox:
+                origin_x, origin_y = paragraph_bbox[0], paragraph_bbox[1]
+                editable = ''
+                writer.write(f'<div contenteditable="true" class="pdf-paragraph" style="left:{origin_x}px;top:{origin_y}px;'
+                             f'width:{paragraph_bbox[2] - origin_x}px;height:{paragraph_bbox[3] - origin_y}px;z-index:3">')
+            for span in runs:
+                text = span["text"].strip()
+                if text:
+                    # Get exact position
+                    bbox = span["bbox"]
+                    x = bbox[0] - origin_x
+                    y = bbox[1] - origin_y
+                    
+                    font_size = span["size"]
+                    color = span["color"]
+                    font_name = span.get("font", "")
+                    flags = span.get("flags", 0)
+                    
+                    color_hex = f"#{color:06x}"
+                    font_weight = "bold" if (flags & 2**4) or "bold" in font_name.lower() else "normal"
+                    font_style = "italic" if (flags & 2**1) or "italic" in font_name.lower() else "normal"
+                    
+                    # Escape HTML
+                    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+                    text = text.replace('"', "&quot;").replace("'", "&#39;")
+                    
+                    style_class = styles.class_for(f"font-size:{font_size}px;color:{color_hex};font-weight:{font_weight};font-style:{font_style}")
+                    writer.write(f'<span{editable} class="pdf-text-v10 {style_class}" style="left:{x}px;top:{y}px">{text}</span>')
+            if paragraph_bbox:
+                writer.write('</div>')
         
-        html_parts.append("</div>")
+        writer.write("</div>")
+        # Classes first used on this page are defined right before it
+        writer.prepend(styles.take_style_block())
         
-        # Clean up
-        temp_doc.close()
-        pix = None
+        # The background file exists before the page referencing it is written out
+        backgrounds.render_page(page_num)
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    backgrounds.render()
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+    try:
+        args, options = split_background_options(sys.argv[1:])
+        args, options['paragraphs'] = split_paragraph_option(args)
+    except ValueError as e:
+        print(f"<div>Error: {str(e)}</div>")
+        sys.exit(1)
+    
+    if len(args) < 2:
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html] [--hide-text=redact|strip] [--background-format=png|jpeg|webp|auto] [--background-quality=85] [--paragraphs]</div>")
         sys.exit(1)
     
-    pdf_file = sys.argv[1]
-    img_dir = sys.argv[2]
+    pdf_file = args[0]
+    img_dir = args[1]
+    output_path = args[2] if len(args) > 2 else None
     
     os.makedirs(img_dir, exist_ok=True)
     
     try:
-        html = pdf_to_html_optimized(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_html_optimized(pdf_file, img_dir, out, **options)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         sys.exit(1)
\ No newline at end of file
@@ -3,18 +3,33 @@ import fitz  # PyMuPDF
 import sys
 import os
 
-def pdf_to_html_no_background(pdf_path, img_dir):
+from html_stream import HtmlStreamWriter, output_stream
+from html_styles import StyleRegistry
+from span_coalescing import iter_text_groups, split_paragraph_option, PARAGRAPH_CSS
+from page_cache import open_document, page_cache
+from spatial_utils import cluster_rects, RectGrid
+from pixmap_utils import is_blank_pixmap
+
+# Drawings closer than this (in points) are rendered together
+DRAWING_CLUSTER_GAP = 2
+
+DRAWING_DPI = 200
+
+def pdf_to_html_no_background(pdf_path, img_dir, out=None, paragraphs=False):
     """
     Extracts individual elements (text, images, vector drawings) from a PDF
     without creating a full-page background image.
     Focuses on a 1-by-1 element extraction approach, preserving fonts and
     rendering vector graphics as text-free images.
+    Same-style spans on a baseline are merged into runs; with paragraphs,
+    each text block becomes one editable container.
     """
-    doc = fitz.open(pdf_path)
-    html_parts = []
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
+    styles = StyleRegistry()
     
     # Start HTML with styles for absolute positioning of elements
-    html_parts.append("""<style>
+    writer.write("""<style>
 .pdf-page-container {
     position: relative;
     margin: 0 auto;
@@ -44,19 +59,25 @@ def pdf_to_html_no_background(pdf_path, img_dir):
     outline: 1px solid rgba(0, 123, 255, 0.4) !important;
     background: rgba(0, 123, 255, 0.05) !important;
 }
-</style>""")
+""" + PARAGRAPH_CSS + """</style>""")
+    # Written out before the first page so the per-page style blocks prepended
+    # to each page buffer always follow the base stylesheet
+    writer.flush()
     
     for page_num, page in enumerate(doc):
         page_width, page_height = page.rect.width, page.rect.height
-        html_parts.append(f'<div class="pdf-page-container" style="width:{page_width}px;height:{page_height}px;" data-page-number="{page_num + 1}">')
+        writer.write(f'<div class="pdf-page-container" style="width:{page_width}px;height:{page_height}px;" data-page-number="{page_num + 1}">')
 
         # --- STAGE 1: Data Extraction ---
         # Extract all text, image, and drawing information from the original page first.
+        cache = page_cache(page)
         
         all_text_spans = []
+        text_groups = []
         try:
-            text_blocks = page.get_text("dict", flags=fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE)["blocks"]
-            for block in text_blocks:
+            text_dict = cache.text_dict()
+            text_groups = list(iter_text_groups(text_dict, paragraphs))
+            for block in text_dict["blocks"]:
                 if block["type"] == 0:
                     for line in block["lines"]:
                         all_text_spans.extend(line["spans"])
@@ -71,37 +92,50 @@ def pdf_to_html_no_background(pdf_path, img_dir):
             
         vector_drawings = []
         try:
-            vector_drawings = page.get_drawings()
+            vector_drawings = cache.drawings()
         except Exception as e:
             sys.stderr.write(f"Error pre-extracting vector drawings on page {page_num + 1}: {e}\n")
 
         # --- STAGE 2: HTML Assembly ---
 
-        # Add editable text elements to HTML, preserving fonts
-        for span in all_text_spans:
-            text = span["text"]
-            if text.strip():
-                bbox = fitz.Rect(span["bbox"])
-                font_name = span.get("font", "sans-serif")
-                # Clean up font name for CSS
-                font_name = font_name.split("+")[-1].replace("-", " ")
-                
-                escaped_text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-                
-                style = (
-                    f'left:{bbox.x0}px;top:{bbox.y0}px;font-size:{span["size"]:.2f}px;'
-                    f'color:#{span["color"]:06x};font-family:"{font_name}";'
-                    f'font-weight:{"bold" if "bold" in font_name.lower() or (span["flags"] & 2**4) else "normal"};'
-                    f'font-style:{"italic" if "italic" in font_name.lower() or (span["flags"] & 2**1) else "normal"};'
-                )
-                html_parts.append(f'<span contenteditable="true" class="pdf-text" style="{style}">{escaped_text}</span>')
-
-        # Add raster images to HTML
+        # Add editable text elements to HTML, preserving fonts; same-style spans on a
+        # baseline are merged into one element per run (see span_coalescing.py)
+        for paragraph_bbox, runs in text_groups:
+            # Inside a paragraph, runs are placed relative to it and the paragraph is edited as a whole
+            origin_x = origin_y = 0
+            editable = ' contenteditable="true"'
+            if paragraph_bbox:
+                origin_x, origin_y = paragraph_bbox[0], paragraph_bbox[1]
+                editable = ''
+                writer.write(f'<div contenteditable="true" class="pdf-paragraph" style="left:{origin_x}px;top:{origin_y}px;'
+                             f'width:{paragraph_bbox[2] - origin_x}px;height:{paragraph_bbox[3] - origin_y}px;z-index:10">')
+            for span in runs:
+                text = span["text"]
+                if text.strip():
+                    bbox = fitz.Rect(span["bbox"])
+                    font_name = span.get("font", "sans-serif")
+                    # Clean up font name for CSS
+                    font_name = font_name.split("+")[-1].replace("-", " ")
+                    
+                    escaped_text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+                    
+                    style_class = styles.class_for(
+                        f'font-size:{span["size"]:.2f}px;'
+                        f'color:#{span["color"]:06x};font-family:"{font_name}";'
+                        f'font-weight:{"bold" if "bold" in font_name.lower() or (span["flags"] & 2**4) else "normal"};'
+                        f'font-style:{"italic" if "italic" in font_name.lower() or (span["flags"] & 2**1) else "normal"};'
+                    )
+                    writer.write(f'<span{editable} class="pdf-text {style_class}" style="left:{bbox.x0 - origin_x}px;top:{bbox.y0 - origin_y}px;">{escaped_text}</span>')
+            if paragraph_bbox:
+                writer.write('</div>')
+
+        # Add raster images to HTML, remembering where they are placed
+        image_placements = []
         for img_info in raster_images:
             xref = img_info[0]
             if xref == 0: continue
             
-            img_rects = page.get_image_rects(xref, transform=True)
+            img_rects = page.get_image_rects(xref)
             img_filename = f"p{page_num + 1}_img{xref}.png"
             img_path = os.path.join(img_dir, img_filename)
             
@@ -114,54 +148,76 @@ def pdf_to_html_no_background(pdf_path, img_dir):
 
             for r in img_rects:
                 if not r.is_empty:
-                    html_parts.append(f'<img src="{img_filename}" class="pdf-element" style="left:{r.x0}px;top:{r.y0}px;width:{r.width}px;height:{r.height}px;z-index:1" alt="Image" />')
+                    image_placements.append(r)
+                    writer.write(f'<img src="{img_filename}" class="pdf-element" style="left:{r.x0}px;top:{r.y0}px;width:{r.width}px;height:{r.height}px;z-index:1" alt="Image" />')
+
+        # Render vector drawings as images, but erase overlapping text and the raster
+        # images placed above from the render so they are not shown twice.
+        # Overlapping or touching drawings (e.g. table cell borders) are merged into
+        # clusters first so each area is rendered and saved only once.
+        # Index the erased rects once so each area only visits the ones overlapping it
+        erased_rects = [fitz.Rect(span["bbox"]) for span in all_text_spans] + image_placements
+        erased_grid = RectGrid()
+        for rect in erased_rects:
+            erased_grid.insert(rect)
+        render_matrix = fitz.Matrix(DRAWING_DPI / 72, DRAWING_DPI / 72)
 
-        # Render vector drawings as images, but erase overlapping text from the render
-        for i, drawing in enumerate(vector_drawings):
+        drawing_rects = []
+        for drawing in vector_drawings:
             drawing_rect = fitz.Rect(drawing.get("rect"))
             if drawing_rect.is_empty or drawing_rect.width < 3 or drawing_rect.height < 3:
                 continue
+            drawing_rects.append(drawing_rect)
+
+        for i, (cluster_bbox, _members) in enumerate(cluster_rects(drawing_rects, gap=DRAWING_CLUSTER_GAP)):
+            drawing_rect = fitz.Rect(cluster_bbox)
 
             # Render the graphic's area from the original page
-            pix = page.get_pixmap(clip=drawing_rect, dpi=200, alpha=True)
+            pix = page.get_pixmap(matrix=render_matrix, clip=drawing_rect, alpha=True)
 
-            # Erase any text that falls within this graphic's area
-            for span in all_text_spans:
-                text_rect = fitz.Rect(span["bbox"])
-                intersection = text_rect & drawing_rect
+            # Erase any text or image that falls within this graphic's area
+            for index in erased_grid.query(drawing_rect):
+                intersection = erased_rects[index] & drawing_rect
                 if not intersection.is_empty:
-                    # Convert intersection rect to pixmap coordinates and clear it
-                    relative_intersection = intersection - drawing_rect.top_left
-                    pix.clear_with(irect=relative_intersection.irect)
+                    # Convert the intersection to pixel coordinates and make it transparent;
+                    # clear_with() would leave the alpha channel opaque (black boxes)
+                    pix.set_rect((intersection * render_matrix).irect, (0,) * pix.n)
 
             # Save the pixmap only if it's not blank
-            if len(set(pix.samples)) > 2: # More than just transparent and one other color
+            if not is_blank_pixmap(pix):
                 img_filename = f"p{page_num + 1}_vec{i}.png"
                 img_path = os.path.join(img_dir, img_filename)
                 pix.save(img_path)
                 
-                html_parts.append(f'<img src="{img_filename}" class="pdf-element" style="left:{drawing_rect.x0}px;top:{drawing_rect.y0}px;width:{drawing_rect.width}px;height:{drawing_rect.height}px;z-index:2" alt="Vector Graphic" />')
+                writer.write(f'<img src="{img_filename}" class="pdf-element" style="left:{drawing_rect.x0}px;top:{drawing_rect.y0}px;width:{drawing_rect.width}px;height:{drawing_rect.height}px;z-index:2" alt="Vector Graphic" />')
             
             pix = None
 
-        html_parts.append('</div>')
+        writer.write('</div>')
+        # Text classes first used on this page are defined right before it
+        writer.prepend(styles.take_style_block())
+        
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+    args, paragraphs = split_paragraph_option(sys.argv[1:])
+    if len(args) < 2:
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html] [--paragraphs]</div>")
         sys.exit(1)
     
-    pdf_file = sys.argv[1]
-    img_dir = sys.argv[2]
+    pdf_file = args[0]
+    img_dir = args[1]
+    output_path = args[2] if len(args) > 2 else None
     
     os.makedirs(img_dir, exist_ok=True)
     
     try:
-        html = pdf_to_html_no_background(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_html_no_background(pdf_file, img_dir, out, paragraphs)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         sys.exit(1)
\ No newline at end of file
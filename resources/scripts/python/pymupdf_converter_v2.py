@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
-import fitz  # PyMuPDF
 import sys
-import os
 
-def pdf_to_perfect_html(pdf_path, img_dir):
+from html_stream import HtmlStreamWriter, output_stream
+from page_cache import open_document, page_cache, DICT_FLAGS
+from background_pipeline import BackgroundPipeline, HIDE_TEXT_REDACT, split_background_options
+from image_encoding import FORMAT_PNG, DEFAULT_QUALITY
+
+def pdf_to_perfect_html(pdf_path, img_dir, out=None, hide_text=HIDE_TEXT_REDACT,
+                        image_format=FORMAT_PNG, image_quality=DEFAULT_QUALITY):
     """Convert PDF to pixel-perfect HTML with background only (no text)"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
+    # Slightly larger redaction area to ensure complete removal, 3x zoom for excellent quality
+    backgrounds = BackgroundPipeline(doc, img_dir, zoom=3, filename="page_{page}_bg.png", margin=1,
+                                     engine=hide_text, image_format=image_format, image_quality=image_quality)
     
     for page_num, page in enumerate(doc):
         # Get page dimensions
@@ -15,41 +22,8 @@ def pdf_to_perfect_html(pdf_path, img_dir):
         height = rect.height
         
         # Method 1: Use redaction to remove all text before rendering
-        # Get all text instances
-        text_instances = page.get_text("dict")
-        
-        # Create a copy of the page to work with
-        temp_doc = fitz.open()
-        temp_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-        temp_page = temp_doc[0]
-        
-        # Apply redaction to remove all text
-        for block in text_instances["blocks"]:
-            if block["type"] == 0:  # Text block
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        # Get the bounding box of the text
-                        bbox = fitz.Rect(span["bbox"])
-                        # Add slightly larger redaction area to ensure complete removal
-                        bbox.x0 -= 1
-                        bbox.y0 -= 1
-                        bbox.x1 += 1
-                        bbox.y1 += 1
-                        # Add redaction annotation
-                        temp_page.add_redact_annot(bbox)
-        
-        # Apply all redactions (this removes the text and fills with white)
-        # Use fill color matching the page background
-        temp_page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
-        
-        # Now render the page without text
-        mat = fitz.Matrix(3, 3)  # 3x zoom for excellent quality
-        pix = temp_page.get_pixmap(matrix=mat, alpha=False, colorspace="rgb")
-        
-        # Save image to file
-        img_filename = f"page_{page_num + 1}_bg.png"
-        img_path = os.path.join(img_dir, img_filename)
-        pix.save(img_path)
+        blocks = page_cache(page).text_dict(DICT_FLAGS)
+        img_filename = backgrounds.add_page(page_num, blocks)
         
         # Calculate scaled dimensions
         scaled_width = width * 3
@@ -64,11 +38,9 @@ def pdf_to_perfect_html(pdf_path, img_dir):
             <!-- Editable text layer -->
             <div class="text-layer" style="position: absolute; top: 0; left: 0; width: {width}px; height: {height}px; z-index: 2;">
         """
-        html_parts.append(page_html)
-        
-        # Extract text blocks with exact positioning from ORIGINAL page
-        blocks = page.get_text("dict")
+        writer.write(page_html)
         
+        # Text blocks with exact positioning from ORIGINAL page
         for block in blocks["blocks"]:
             if block["type"] == 0:  # Text block
                 for line in block["lines"]:
@@ -117,31 +89,41 @@ def pdf_to_perfect_html(pdf_path, img_dir):
                                     {text}
                                 </div>
                             """
-                            html_parts.append(text_html)
+                            writer.write(text_html)
         
         closing_html = """
             </div>
         </div>
         """
-        html_parts.append(closing_html)
+        writer.write(closing_html)
         
-        # Clean up temp doc
-        temp_doc.close()
+        # The background file exists before the page referencing it is written out
+        backgrounds.render_page(page_num)
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    backgrounds.render()
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+    try:
+        args, options = split_background_options(sys.argv[1:])
+    except ValueError as e:
+        print(f"<div>Error: {str(e)}</div>")
+        sys.exit(1)
+    
+    if len(args) < 2:
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html] [--hide-text=redact|strip] [--background-format=png|jpeg|webp|auto] [--background-quality=85]</div>")
         sys.exit(1)
     
-    pdf_file = sys.argv[1]
-    img_dir = sys.argv[2]
+    pdf_file = args[0]
+    img_dir = args[1]
+    output_path = args[2] if len(args) > 2 else None
     
     try:
-        html = pdf_to_perfect_html(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_perfect_html(pdf_file, img_dir, out, **options)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         sys.exit(1)
\ No newline at end of file
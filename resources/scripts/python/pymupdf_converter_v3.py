@@ -4,13 +4,16 @@ import sys
 import os
 import base64
 
-def pdf_to_html_with_individual_elements(pdf_path, img_dir):
+from html_stream import HtmlStreamWriter, output_stream
+from page_cache import open_document
+
+def pdf_to_html_with_individual_elements(pdf_path, img_dir, out=None):
     """Convert PDF to HTML with individual images and text elements (not as background)"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
     
     # Start HTML document
-    html_parts.append("""
+    writer.write("""
     <style>
         .pdf-page-container {
             position: relative;
@@ -71,7 +74,7 @@ def pdf_to_html_with_individual_elements(pdf_path, img_dir):
         page_html = f"""
         <div class="pdf-page-container" id="page_{page_num + 1}" style="width: {width}px; height: {height}px;">
         """
-        html_parts.append(page_html)
+        writer.write(page_html)
         
         # Extract and add images as individual elements
         image_list = page.get_images(full=True)
@@ -113,7 +116,7 @@ def pdf_to_html_with_individual_elements(pdf_path, img_dir):
                                     height: {h}px;"
                              alt="Image {img_index}" />
                         """
-                        html_parts.append(img_html)
+                        writer.write(img_html)
                 
                 pix = None
                 
@@ -123,7 +126,7 @@ def pdf_to_html_with_individual_elements(pdf_path, img_dir):
         # Extract tables if present
         tables = extract_tables_from_page(page)
         for table in tables:
-            html_parts.append(table)
+            writer.write(table)
         
         # Extract text elements
         blocks = page.get_text("dict")
@@ -184,19 +187,22 @@ def pdf_to_html_with_individual_elements(pdf_path, img_dir):
                                 {text}
                             </div>
                             """
-                            html_parts.append(text_html)
+                            writer.write(text_html)
         
         # Extract vector graphics as SVG (if any)
         drawings = page.get_drawings()
         if drawings:
             svg_html = render_drawings_as_svg(drawings, page_num)
-            html_parts.append(svg_html)
+            writer.write(svg_html)
         
         # Close page container
-        html_parts.append("</div>")
+        writer.write("</div>")
+        
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 def extract_tables_from_page(page):
     """Extract tables from a PDF page"""
@@ -282,15 +288,16 @@ def render_drawings_as_svg(drawings, page_num):
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html]</div>")
         sys.exit(1)
     
     pdf_file = sys.argv[1]
     img_dir = sys.argv[2]
+    output_path = sys.argv[3] if len(sys.argv) > 3 else None
     
     try:
-        html = pdf_to_html_with_individual_elements(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_html_with_individual_elements(pdf_file, img_dir, out)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         sys.exit(1)
\ No newline at end of file
@@ -4,13 +4,19 @@ import sys
 import os
 import base64
 
-def pdf_to_html_complete(pdf_path, img_dir):
+from html_stream import HtmlStreamWriter, output_stream
+from page_cache import open_document
+from background_pipeline import BackgroundPipeline, HIDE_TEXT_REDACT, split_background_options
+from image_encoding import FORMAT_PNG, DEFAULT_QUALITY
+
+def pdf_to_html_complete(pdf_path, img_dir, out=None, hide_text=HIDE_TEXT_REDACT,
+                         image_format=FORMAT_PNG, image_quality=DEFAULT_QUALITY):
     """Convert PDF to HTML with COMPLETE visual preservation (background + individual elements)"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
     
     # Start HTML document with styles
-    html_parts.append("""
+    writer.write("""
     <style>
         .pdf-page-container {
             position: relative;
@@ -70,6 +76,11 @@ def pdf_to_html_complete(pdf_path, img_dir):
     </style>
     """)
     
+    # Slightly expanded white redactions, 2x zoom for good quality
+    backgrounds = BackgroundPipeline(doc, img_dir, zoom=2, filename="page_{page}_complete_bg.png",
+                                     margin=0.5, fill=(1, 1, 1), engine=hide_text,
+                                     image_format=image_format, image_quality=image_quality)
+    
     for page_num, page in enumerate(doc):
         # Get page dimensions
         rect = page.rect
@@ -79,45 +90,9 @@ def pdf_to_html_complete(pdf_path, img_dir):
         # STEP 1: Render the COMPLETE page as background (with text removed)
         # This captures ALL visual elements including backgrounds, borders, logos, etc.
         
-        # Create a copy of the page for background
-        temp_doc = fitz.open()
-        temp_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-        temp_page = temp_doc[0]
-        
-        # Get all text instances to remove them from background
-        text_instances = page.get_text("dict")
-        
-        # Remove text from the background version
-        for block in text_instances["blocks"]:
-            if block.get("type") == 0:  # Text block
-                for line in block.get("lines", []):
-                    for span in line.get("spans", []):
-                        bbox = span.get("bbox")
-                        if bbox and len(bbox) >= 4:
-                            # Create rect for redaction
-                            redact_rect = fitz.Rect(bbox)
-                            # Slightly expand to ensure complete removal
-                            redact_rect.x0 -= 0.5
-                            redact_rect.y0 -= 0.5
-                            redact_rect.x1 += 0.5
-                            redact_rect.y1 += 0.5
-                            temp_page.add_redact_annot(redact_rect, fill=(1, 1, 1))  # White fill
-        
-        # Apply redactions to remove text
-        temp_page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
-        
-        # Render the page without text as high-quality image
-        mat = fitz.Matrix(2, 2)  # 2x zoom for good quality
-        pix = temp_page.get_pixmap(matrix=mat, alpha=False)
-        
-        # Save background image
-        bg_filename = f"page_{page_num + 1}_complete_bg.png"
-        bg_path = os.path.join(img_dir, bg_filename)
-        pix.save(bg_path)
-        
-        # Clean up
-        temp_doc.close()
-        pix = None
+        # Text is removed from the document copy, the background is rendered at the end
+        blocks = page.get_text("dict")
+        bg_filename = backgrounds.add_page(page_num, blocks)
         
         # Start page container
         page_html = f"""
@@ -130,7 +105,7 @@ def pdf_to_html_complete(pdf_path, img_dir):
             <!-- Text layer -->
             <div class="text-layer">
         """
-        html_parts.append(page_html)
+        writer.write(page_html)
         
         # STEP 2: Extract individual images that might need to be editable/moveable
         # This is in addition to the background
@@ -182,7 +157,7 @@ def pdf_to_html_complete(pdf_path, img_dir):
                             # Note: opacity:0 because image is already in background
                             # but we keep it for potential editing
                             
-                            html_parts.append(img_html)
+                            writer.write(img_html)
                             
                             pix = None
                             
@@ -192,8 +167,6 @@ def pdf_to_html_complete(pdf_path, img_dir):
             print(f"<!-- Error processing images: {e} -->", file=sys.stderr)
         
         # STEP 3: Extract all text as editable elements
-        blocks = page.get_text("dict")
-        
         for block in blocks["blocks"]:
             if block.get("type") == 0:  # Text block
                 for line in block.get("lines", []):
@@ -239,31 +212,44 @@ def pdf_to_html_complete(pdf_path, img_dir):
                                 {text}
                             </div>
                             """
-                            html_parts.append(text_html)
+                            writer.write(text_html)
         
         # Close page container
-        html_parts.append("""
+        writer.write("""
             </div>
         </div>
         """)
+        
+        # The background file exists before the page referencing it is written out
+        backgrounds.render_page(page_num)
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    backgrounds.render()
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+    try:
+        args, options = split_background_options(sys.argv[1:])
+    except ValueError as e:
+        print(f"<div>Error: {str(e)}</div>")
+        sys.exit(1)
+    
+    if len(args) < 2:
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html] [--hide-text=redact|strip] [--background-format=png|jpeg|webp|auto] [--background-quality=85]</div>")
         sys.exit(1)
     
-    pdf_file = sys.argv[1]
-    img_dir = sys.argv[2]
+    pdf_file = args[0]
+    img_dir = args[1]
+    output_path = args[2] if len(args) > 2 else None
     
     # Ensure image directory exists
     os.makedirs(img_dir, exist_ok=True)
     
     try:
-        html = pdf_to_html_complete(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_html_complete(pdf_file, img_dir, out, **options)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         sys.exit(1)
\ No newline at end of file
@@ -4,13 +4,16 @@ import sys
 import os
 import base64
 
-def pdf_to_html_elements_only(pdf_path, img_dir):
+from html_stream import HtmlStreamWriter, output_stream
+from page_cache import open_document
+
+def pdf_to_html_elements_only(pdf_path, img_dir, out=None):
     """Convert PDF to HTML extracting ONLY individual elements - NO full background"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
     
     # Start with styles
-    html_parts.append("""
+    writer.write("""
     <style>
         .pdf-page-container {
             position: relative;
@@ -72,7 +75,7 @@ def pdf_to_html_elements_only(pdf_path, img_dir):
         page_html = f"""
         <div class="pdf-page-container" id="page_{page_num + 1}" style="width: {width}px; height: {height}px;">
         """
-        html_parts.append(page_html)
+        writer.write(page_html)
         
         # Track what areas have content to find hidden images
         content_areas = []
@@ -119,7 +122,7 @@ def pdf_to_html_elements_only(pdf_path, img_dir):
                                 height: {h}px;"
                          alt="Image {img_index}" />
                     """
-                    html_parts.append(img_html)
+                    writer.write(img_html)
                 
                 pix = None
                 
@@ -186,7 +189,7 @@ def pdf_to_html_elements_only(pdf_path, img_dir):
                                     {'; '.join(shape_styles)};">
                         </div>
                         """
-                        html_parts.append(shape_html)
+                        writer.write(shape_html)
                         
         except Exception as e:
             print(f"<!-- Error processing drawings: {e} -->", file=sys.stderr)
@@ -239,28 +242,32 @@ def pdf_to_html_elements_only(pdf_path, img_dir):
                                 {text}
                             </span>
                             """
-                            html_parts.append(text_html)
+                            writer.write(text_html)
         
         # Close page container
-        html_parts.append("</div>")
+        writer.write("</div>")
+        
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html]</div>")
         sys.exit(1)
     
     pdf_file = sys.argv[1]
     img_dir = sys.argv[2]
+    output_path = sys.argv[3] if len(sys.argv) > 3 else None
     
     # Ensure image directory exists
     os.makedirs(img_dir, exist_ok=True)
     
     try:
-        html = pdf_to_html_elements_only(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_html_elements_only(pdf_file, img_dir, out)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         sys.exit(1)
\ No newline at end of file
@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
-import fitz  # PyMuPDF
 import sys
 import os
 
-def pdf_to_html_hybrid(pdf_path, img_dir):
+from html_stream import HtmlStreamWriter, output_stream
+from page_cache import open_document, page_cache, DICT_FLAGS
+from background_pipeline import BackgroundPipeline, HIDE_TEXT_REDACT, split_background_options
+from image_encoding import FORMAT_PNG, DEFAULT_QUALITY
+
+def pdf_to_html_hybrid(pdf_path, img_dir, out=None, hide_text=HIDE_TEXT_REDACT,
+                       image_format=FORMAT_PNG, image_quality=DEFAULT_QUALITY):
     """Convert PDF - Extract graphical elements as background, text as editable"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
     
     # Minimal styles for tight selection
-    html_parts.append("""
+    writer.write("""
     <style>
         .pdf-page-container {
             position: relative;
@@ -62,40 +67,19 @@ def pdf_to_html_hybrid(pdf_path, img_dir):
     </style>
     """)
     
+    # Very tight redaction to preserve nearby graphics, 2x for balance between quality and size
+    backgrounds = BackgroundPipeline(doc, img_dir, zoom=2, filename="page_{page}_bg.png",
+                                     engine=hide_text, image_format=image_format, image_quality=image_quality)
+    
     for page_num, page in enumerate(doc):
         # Get page dimensions
         rect = page.rect
         width = rect.width
         height = rect.height
         
-        # Create a copy of the page for background
-        temp_doc = fitz.open()
-        temp_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-        temp_page = temp_doc[0]
-        
-        # Get all text instances to remove them
-        text_instances = page.get_text("dict")
-        
         # Remove only text, keep all graphical elements
-        for block in text_instances["blocks"]:
-            if block["type"] == 0:  # Text block
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        bbox = fitz.Rect(span["bbox"])
-                        # Very tight redaction to preserve nearby graphics
-                        temp_page.add_redact_annot(bbox)
-        
-        # Apply redactions (removes text only)
-        temp_page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
-        
-        # Render at high quality (2x for balance between quality and size)
-        mat = fitz.Matrix(2, 2)
-        pix = temp_page.get_pixmap(matrix=mat, alpha=False)
-        
-        # Save background image
-        img_filename = f"page_{page_num + 1}_bg.png"
-        img_path = os.path.join(img_dir, img_filename)
-        pix.save(img_path)
+        blocks = page_cache(page).text_dict(DICT_FLAGS)
+        img_filename = backgrounds.add_page(page_num, blocks)
         
         # Calculate scaled dimensions
         scaled_width = width * 2
@@ -115,11 +99,9 @@ def pdf_to_html_hybrid(pdf_path, img_dir):
             <!-- Text layer -->
             <div class="text-layer">
         """
-        html_parts.append(page_html)
+        writer.write(page_html)
         
         # Extract text with very precise positioning
-        blocks = page.get_text("dict")
-        
         for block in blocks["blocks"]:
             if block["type"] == 0:  # Text block
                 for line in block["lines"]:
@@ -151,34 +133,44 @@ def pdf_to_html_hybrid(pdf_path, img_dir):
                             
                             # Create minimal text element
                             text_html = f"""<span contenteditable="true" class="pdf-text" style="left:{x}px;top:{y}px;font-size:{font_size}px;color:{color_hex};font-weight:{font_weight};font-style:{font_style};font-family:Arial,sans-serif;">{text}</span>"""
-                            html_parts.append(text_html)
+                            writer.write(text_html)
         
         # Close containers
-        html_parts.append("""
+        writer.write("""
             </div>
         </div>
         """)
         
-        # Clean up
-        temp_doc.close()
+        # The background file exists before the page referencing it is written out
+        backgrounds.render_page(page_num)
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    backgrounds.render()
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+    try:
+        args, options = split_background_options(sys.argv[1:])
+    except ValueError as e:
+        print(f"<div>Error: {str(e)}</div>")
+        sys.exit(1)
+    
+    if len(args) < 2:
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html] [--hide-text=redact|strip] [--background-format=png|jpeg|webp|auto] [--background-quality=85]</div>")
         sys.exit(1)
     
-    pdf_file = sys.argv[1]
-    img_dir = sys.argv[2]
+    pdf_file = args[0]
+    img_dir = args[1]
+    output_path = args[2] if len(args) > 2 else None
     
     # Ensure image directory exists
     os.makedirs(img_dir, exist_ok=True)
     
     try:
-        html = pdf_to_html_hybrid(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_html_hybrid(pdf_file, img_dir, out, **options)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         sys.exit(1)
\ No newline at end of file
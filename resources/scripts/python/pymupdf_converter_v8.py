@@ -3,13 +3,17 @@ import fitz  # PyMuPDF
 import sys
 import os
 
-def pdf_to_html_smart_extraction(pdf_path, img_dir):
+from html_stream import HtmlStreamWriter, output_stream
+from pixmap_utils import is_blank_pixmap
+from page_cache import open_document, page_cache
+
+def pdf_to_html_smart_extraction(pdf_path, img_dir, out=None):
     """Smart extraction - render only non-text areas as images"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
     
     # Ultra-minimal styles for precise selection
-    html_parts.append("""
+    writer.write("""
     <style>
         .pdf-page-container {
             position: relative;
@@ -55,7 +59,7 @@ def pdf_to_html_smart_extraction(pdf_path, img_dir):
         page_html = f"""
         <div class="pdf-page-container" style="width: {width}px; height: {height}px;">
         """
-        html_parts.append(page_html)
+        writer.write(page_html)
         
         # Get text blocks to know where NOT to render
         text_blocks = page.get_text("dict")["blocks"]
@@ -100,7 +104,7 @@ def pdf_to_html_smart_extraction(pdf_path, img_dir):
                                 width: {img_rect.width}px; 
                                 height: {img_rect.height}px;" />
                     """
-                    html_parts.append(img_html)
+                    writer.write(img_html)
                 
                 pix = None
                 
@@ -127,6 +131,9 @@ def pdf_to_html_smart_extraction(pdf_path, img_dir):
         # Divide page into strips and check for content
         strip_height = 100  # Check in 100px strips
         
+        # Strips are clipped renders of one display list per page, built on first use
+        cache = None
+        
         for y in range(0, int(height), strip_height):
             strip_rect = fitz.Rect(0, y, width, min(y + strip_height, height))
             
@@ -136,24 +143,14 @@ def pdf_to_html_smart_extraction(pdf_path, img_dir):
             if not has_text:
                 # This strip might have graphics - render it
                 # But first check if it's not just white space
-                temp_doc = fitz.open()
-                temp_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-                temp_page = temp_doc[0]
+                if cache is None:
+                    cache = page_cache(page)
                 
                 # Get pixmap of this strip
-                mat = fitz.Matrix(1, 1)
-                pix = temp_page.get_pixmap(matrix=mat, clip=strip_rect, alpha=False)
+                pix = cache.render(strip_rect)
                 
                 # Check if it has content (not all white)
-                # Sample a few pixels to see if they're all white
-                samples = pix.samples
-                has_content = False
-                
-                # Quick check - if the samples vary, there's content
-                if len(set(samples[:100])) > 2:  # More than just white
-                    has_content = True
-                
-                if has_content:
+                if not is_blank_pixmap(pix):
                     # Save this strip as an image
                     strip_filename = f"page_{page_num + 1}_strip_{int(y)}.png"
                     strip_path = os.path.join(img_dir, strip_filename)
@@ -168,10 +165,9 @@ def pdf_to_html_smart_extraction(pdf_path, img_dir):
                                 width: {width}px; 
                                 height: {strip_rect.height}px;" />
                     """
-                    html_parts.append(strip_html)
+                    writer.write(strip_html)
                 
                 pix = None
-                temp_doc.close()
         
         # Extract vector graphics/drawings
         try:
@@ -209,7 +205,7 @@ def pdf_to_html_smart_extraction(pdf_path, img_dir):
                                             height:{rect_item.height}px;
                                             {';'.join(styles)}"></div>
                                 """
-                                html_parts.append(shape_html)
+                                writer.write(shape_html)
         except:
             pass
         
@@ -238,26 +234,30 @@ def pdf_to_html_smart_extraction(pdf_path, img_dir):
                             text = text.replace('"', "&quot;").replace("'", "&#39;")
                             
                             text_html = f"""<span contenteditable="true" class="pdf-text" style="left:{x}px;top:{y}px;font-size:{font_size}px;color:{color_hex};font-weight:{font_weight};font-style:{font_style};font-family:Arial,sans-serif">{text}</span>"""
-                            html_parts.append(text_html)
+                            writer.write(text_html)
+        
+        writer.write("</div>")
         
-        html_parts.append("</div>")
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html]</div>")
         sys.exit(1)
     
     pdf_file = sys.argv[1]
     img_dir = sys.argv[2]
+    output_path = sys.argv[3] if len(sys.argv) > 3 else None
     
     os.makedirs(img_dir, exist_ok=True)
     
     try:
-        html = pdf_to_html_smart_extraction(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_html_smart_extraction(pdf_file, img_dir, out)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         sys.exit(1)
\ No newline at end of file
@@ -2,18 +2,17 @@
 import fitz  # PyMuPDF
 import sys
 import os
-from pdf2image import convert_from_path
-from PIL import Image, ImageChops
-import tempfile
-import io
 
-def pdf_to_html_perfect_extraction(pdf_path, img_dir):
+from html_stream import HtmlStreamWriter, output_stream
+from page_cache import open_document
+
+def pdf_to_html_perfect_extraction(pdf_path, img_dir, out=None):
     """Perfect extraction - renders graphics perfectly, text precisely positioned"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
     
     # Ultra-precise styles with tight text selection
-    html_parts.append("""
+    writer.write("""
     <style>
         * {
             box-sizing: border-box;
@@ -69,21 +68,8 @@ def pdf_to_html_perfect_extraction(pdf_path, img_dir):
     </style>
     """)
     
-    # Convert PDF to images using pdf2image for perfect graphic capture
-    try:
-        # Use pdf2image to get high quality page images
-        pages_pil = convert_from_path(pdf_path, dpi=150)
-    except:
-        # Fallback to PyMuPDF rendering if pdf2image fails
-        pages_pil = []
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            mat = fitz.Matrix(150/72, 150/72)  # 150 DPI
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
-            pages_pil.append(img)
-            pix = None
+    # Pages are rasterised one at a time, only for the masked background
+    mat = fitz.Matrix(150/72, 150/72)  # 150 DPI
     
     for page_num, page in enumerate(doc):
         # Get page dimensions
@@ -96,56 +82,37 @@ def pdf_to_html_perfect_extraction(pdf_path, img_dir):
         <div class="pdf-page-container" style="width: {width}px; height: {height}px;">
             <div class="pdf-graphic-layer">
         """
-        html_parts.append(page_html)
+        writer.write(page_html)
         
         # METHOD 1: Extract background without text using masking
-        if page_num < len(pages_pil):
-            # Get the full page image
-            full_page_img = pages_pil[page_num]
-            
-            # Create a version without text by masking text areas
-            temp_doc = fitz.open()
-            temp_doc.insert_pdf(doc, from_page=page_num, to_page=page_num)
-            temp_page = temp_doc[0]
-            
-            # Get text blocks
-            text_blocks = page.get_text("dict")["blocks"]
-            
-            # Apply white rectangles over text areas
-            for block in text_blocks:
-                if block["type"] == 0:  # Text block
-                    bbox = fitz.Rect(block["bbox"])
-                    # Draw white rectangle over text
-                    temp_page.draw_rect(bbox, color=(1, 1, 1), fill=(1, 1, 1))
-            
-            # Render the masked page
-            mat = fitz.Matrix(150/72, 150/72)  # 150 DPI
-            pix = temp_page.get_pixmap(matrix=mat, alpha=False)
-            
-            # Save as background
-            bg_filename = f"page_{page_num + 1}_graphics.png"
-            bg_path = os.path.join(img_dir, bg_filename)
-            pix.save(bg_path)
-            
-            # Add background image
-            scale = 72/150  # Scale from 150 DPI back to 72 DPI
-            img_width = full_page_img.width * scale
-            img_height = full_page_img.height * scale
-            
-            bg_html = f"""
-            <img src="{bg_filename}" 
-                 class="pdf-graphic" 
-                 style="left: 0; 
-                        top: 0; 
-                        width: {img_width}px; 
-                        height: {img_height}px;
-                        position: absolute;
-                        z-index: 0;" />
-            """
-            html_parts.append(bg_html)
-            
-            temp_doc.close()
-            pix = None
+        blocks = page.get_text("dict")
+        
+        # Render the page, then paint the text areas white on the pixmap
+        pix = page.get_pixmap(matrix=mat, alpha=False)
+        for block in blocks["blocks"]:
+            if block["type"] == 0:  # Text block
+                bbox = fitz.Rect(block["bbox"]) * mat
+                # One extra pixel around the block, like the stroked rectangle used before
+                pix.set_rect(fitz.IRect(bbox.x0 - 1, bbox.y0 - 1, bbox.x1 + 1, bbox.y1 + 1) & pix.irect, (255, 255, 255))
+        
+        # Save as background
+        bg_filename = f"page_{page_num + 1}_graphics.png"
+        bg_path = os.path.join(img_dir, bg_filename)
+        pix.save(bg_path)
+        pix = None
+        
+        # Add background image, sized from the page itself
+        bg_html = f"""
+        <img src="{bg_filename}" 
+             class="pdf-graphic" 
+             style="left: 0; 
+                    top: 0; 
+                    width: {width}px; 
+                    height: {height}px;
+                    position: absolute;
+                    z-index: 0;" />
+        """
+        writer.write(bg_html)
         
         # METHOD 2: Extract individual images that might be overlaid
         image_list = page.get_images(full=True)
@@ -178,7 +145,7 @@ def pdf_to_html_perfect_extraction(pdf_path, img_dir):
                                     height: {img_rect.height}px;
                                     z-index: 1;" />
                         """
-                        html_parts.append(img_html)
+                        writer.write(img_html)
                         
                         pix = None
                         
@@ -186,11 +153,9 @@ def pdf_to_html_perfect_extraction(pdf_path, img_dir):
                 print(f"<!-- Error extracting image {img_index}: {e} -->", file=sys.stderr)
         
         # Close graphic layer
-        html_parts.append("</div>")
+        writer.write("</div>")
         
         # METHOD 3: Extract text with ultra-precise positioning
-        blocks = page.get_text("dict")
-        
         for block in blocks["blocks"]:
             if block["type"] == 0:  # Text block
                 for line in block["lines"]:
@@ -220,26 +185,30 @@ def pdf_to_html_perfect_extraction(pdf_path, img_dir):
                             
                             # Create text element with EXACT dimensions
                             text_html = f"""<span contenteditable="true" class="pdf-text" style="position:absolute;left:{x}px;top:{y}px;font-size:{font_size}px;color:{color_hex};font-weight:{font_weight};font-style:{font_style};font-family:Arial,sans-serif;display:inline-block">{text}</span>"""
-                            html_parts.append(text_html)
+                            writer.write(text_html)
+        
+        writer.write("</div>")
         
-        html_parts.append("</div>")
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html]</div>")
         sys.exit(1)
     
     pdf_file = sys.argv[1]
     img_dir = sys.argv[2]
+    output_path = sys.argv[3] if len(sys.argv) > 3 else None
     
     os.makedirs(img_dir, exist_ok=True)
     
     try:
-        html = pdf_to_html_perfect_extraction(pdf_file, img_dir)
-        print(html)
+        with output_stream(output_path) as out:
+            pdf_to_html_perfect_extraction(pdf_file, img_dir, out)
     except Exception as e:
         print(f"<div>Error: {str(e)}</div>")
         import traceback
@@ -1,14 +1,39 @@
 #!/usr/bin/env python3
-import fitz  # PyMuPDF
 import sys
-import base64
-import io
 import os
 
-def pdf_to_perfect_html(pdf_path, img_dir):
-    """Convert PDF to pixel-perfect HTML with complete visual rendering"""
-    doc = fitz.open(pdf_path)
-    html_parts = []
+from html_stream import HtmlStreamWriter, output_stream
+from html_styles import StyleRegistry
+from span_coalescing import iter_text_groups, split_paragraph_option, PARAGRAPH_CSS
+from page_cache import open_document
+from background_pipeline import BackgroundPipeline, KEEP_TEXT, split_background_options
+from image_encoding import FORMAT_PNG, DEFAULT_QUALITY
+
+# Transparent text overlay shown on hover and focus; font sizes and weights are interned classes (html_styles.py)
+OVERLAY_STYLES = """<style>
+.pdf-overlay-text{position:absolute;color:transparent;font-family:Arial,sans-serif;background:transparent;padding:0 2px;border:1px solid transparent;cursor:text;white-space:nowrap;z-index:3}
+.pdf-overlay-text:hover{background:rgba(255,255,0,0.3);border:1px solid #007bff}
+.pdf-overlay-text:focus,.pdf-paragraph:focus .pdf-overlay-text{color:#000;background:rgba(255,255,255,0.95)}
+""" + PARAGRAPH_CSS + """</style>"""
+
+def pdf_to_perfect_html(pdf_path, img_dir, out=None, image_format=FORMAT_PNG, image_quality=DEFAULT_QUALITY,
+                        paragraphs=False):
+    """Convert PDF to pixel-perfect HTML with complete visual rendering.
+    
+    Same-style spans on a baseline are merged into runs (span_coalescing.py);
+    with paragraphs, each text block becomes one editable container.
+    """
+    doc, owns_doc = open_document(pdf_path)
+    writer = HtmlStreamWriter(out)
+    # Complete renders at 1x, 2x and 3x for srcset, skipped for empty pages
+    backgrounds = BackgroundPipeline(doc, img_dir, densities=(1, 2, 3), filename="page_{page}_bg.png",
+                                     engine=KEEP_TEXT, image_format=image_format, image_quality=image_quality,
+                                     skip_blank=True)
+    styles = StyleRegistry()
+    writer.write(OVERLAY_STYLES)
+    # Written out before the first page so the per-page style blocks prepended
+    # to each page buffer always follow the base stylesheet
+    writer.flush()
     
     for page_num, page in enumerate(doc):
         # Get page dimensions
@@ -16,96 +41,97 @@ def pdf_to_perfect_html(pdf_path, img_dir):
         width = rect.width
         height = rect.height
         
+        # Extract text blocks with exact positioning
+        blocks = page.get_text("dict")
+
         # Convert page to high-quality image for background (includes ALL visual elements)
-        # Use higher resolution for better quality
-        mat = fitz.Matrix(3, 3)  # 3x zoom for excellent quality
-        pix = page.get_pixmap(matrix=mat, alpha=False, colorspace="rgb")
-        
-        # Save image to file
-        img_filename = f"page_{page_num + 1}_bg.png"
-        img_path = os.path.join(img_dir, img_filename)
-        pix.save(img_path)
-        
-        # Calculate scaled dimensions
-        scaled_width = width * 3
-        scaled_height = height * 3
+        img_filename = backgrounds.add_page(page_num, blocks)
+        bg_html = ""
+        if img_filename:
+            bg_html = f'<img src="{img_filename}" srcset="{backgrounds.srcset(page_num)}" class="pdf-page-background" style="position: absolute; top: 0; left: 0; width: {width}px; height: {height}px; pointer-events: none; user-select: none; z-index: 1;" />'
         
         # Use file path instead of base64
         # This will be replaced with proper URL later
-        html_parts.append(f''''
+        writer.write(f'''
         <div class="pdf-page-container" style="position: relative; margin: 0 auto; width: {width}px; height: {height}px; background: white; box-shadow: 0 2px 10px rgba(0,0,0,0.1); overflow: hidden;">
             <!-- Complete PDF render as background (includes logos, tables, all formatting) -->
-            <img src="{img_filename}" class="pdf-page-background" style="position: absolute; top: 0; left: 0; width: {scaled_width}px; height: {scaled_height}px; transform: scale(0.333333); transform-origin: top left; pointer-events: none; user-select: none; z-index: 1;" />
+            {bg_html}
             
             <!-- Transparent editable text overlay -->
             <div class="text-layer" style="position: absolute; top: 0; left: 0; width: {width}px; height: {height}px; z-index: 2;">
-        '''')  
+        ''')  
         
-        # Extract text blocks with exact positioning
-        blocks = page.get_text("dict")
-        
-        for block in blocks["blocks"]:
-            if block["type"] == 0:  # Text block
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        text = span["text"].strip()
-                        if text:
-                            # Get exact position and style (no scaling needed, we match the original size)
-                            x = span["bbox"][0]
-                            y = span["bbox"][1]
-                            font_size = span["size"]
-                            font_name = span["font"]
-                            color = span["color"]
-                            
-                            # Convert color to hex
-                            color_hex = f"#{color:06x}"
-                            
-                            # Check for bold/italic
-                            font_weight = "bold" if "bold" in font_name.lower() else "normal"
-                            font_style = "italic" if "italic" in font_name.lower() else "normal"
-                            
-                            # Escape HTML special characters in text
-                            text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;").replace("'", "&#39;")
-                            
-                            # Create completely transparent editable text overlay
-                            html_parts.append(f''''
-                                <div contenteditable="true" 
-                                     style="position: absolute; 
-                                            left: {x}px; 
-                                            top: {y}px; 
-                                            font-size: {font_size}px; 
-                                            color: transparent; 
-                                            font-weight: {font_weight}; 
-                                            font-style: {font_style};
-                                            font-family: Arial, sans-serif;
-                                            background: transparent;
-                                            padding: 0 2px;
-                                            border: 1px solid transparent;
-                                            cursor: text;
-                                            white-space: nowrap;
-                                            z-index: 3;"
-                                     onmouseover="this.style.background='rgba(255,255,0,0.3)'; this.style.border='1px solid #007bff'"
-                                     onmouseout="this.style.background='transparent'; this.style.border='1px solid transparent'"
-                                     onfocus="this.style.color='#000'; this.style.background='rgba(255,255,255,0.95)'"
-                                     onblur="this.style.color='transparent'; this.style.background='transparent'">
-                                    {text}
-                                </div>
-                            '''')  
+        # One element per run of same-style spans (see span_coalescing.py)
+        for paragraph_bbox, runs in iter_text_groups(blocks, paragraphs):
+            # Inside a paragraph, runs are placed relative to it and the paragraph is edited as a whole
+            origin_x = origin_y = 0
+            editable = ' contenteditable="true"'
+            if paragraph_bbox:
+                origin_x, origin_y = paragraph_bbox[0], paragraph_bbox[1]
+                editable = ''
+                writer.write(f'<div contenteditable="true" class="pdf-paragraph" style="left:{origin_x}px;top:{origin_y}px;'
+                             f'width:{paragraph_bbox[2] - origin_x}px;height:{paragraph_bbox[3] - origin_y}px;z-index:3">')
+            for span in runs:
+                text = span["text"].strip()
+                if text:
+                    # Get exact position and style (no scaling needed, we match the original size)
+                    x = span["bbox"][0] - origin_x
+                    y = span["bbox"][1] - origin_y
+                    font_size = span["size"]
+                    font_name = span["font"]
+                    
+                    # Check for bold/italic
+                    font_weight = "bold" if "bold" in font_name.lower() else "normal"
+                    font_style = "italic" if "italic" in font_name.lower() else "normal"
+                    
+                    # Escape HTML special characters in text
+                    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;").replace("'", "&#39;")
+                    
+                    style_class = styles.class_for(f"font-size:{font_size}px;font-weight:{font_weight};font-style:{font_style}")
+                    writer.write(f'<div{editable} class="pdf-overlay-text {style_class}" style="left:{x}px;top:{y}px">{text}</div>')
+            if paragraph_bbox:
+                writer.write('</div>')
         
-        html_parts.append(''''
+        writer.write('''
             </div>
         </div>
-        '''')  
+        ''')
+        # Classes first used on this page are defined right before it
+        writer.prepend(styles.take_style_block())
+        
+        # The background file exists before the page referencing it is written out
+        backgrounds.render_page(page_num)
+        writer.end_page()
     
-    doc.close()
-    return "".join(html_parts)
+    backgrounds.render()
+    if owns_doc:
+        doc.close()
+    return writer.close()
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("<div>Error: Usage: script.py pdf_file image_dir</div>")
+    try:
+        # The text stays in the renders, under the transparent overlay: there is nothing to hide
+        if any(arg.partition('=')[0] == '--hide-text' for arg in sys.argv[1:]):
+            raise ValueError('--hide-text is not supported: pixel-perfect pages keep their text in the render')
+        args, options = split_background_options(sys.argv[1:])
+        args, paragraphs = split_paragraph_option(args)
+    except ValueError as e:
+        print(f"<div>Error: {str(e)}</div>")
+        sys.exit(1)
+    
+    if len(args) < 2:
+        print("<div>Error: Usage: script.py pdf_file image_dir [output_html] [--background-format=png|jpeg|webp|auto] [--background-quality=85] [--paragraphs]</div>")
         sys.exit(1)
     
-    pdf_file = sys.argv[1]
-    img_dir = sys.argv[2]
-    html = pdf_to_perfect_html(pdf_file, img_dir)
-    print(html)
+    pdf_file = args[0]
+    img_dir = args[1]
+    output_path = args[2] if len(args) > 2 else None
+    
+    os.makedirs(img_dir, exist_ok=True)
+    
+    try:
+        with output_stream(output_path) as out:
+            pdf_to_perfect_html(pdf_file, img_dir, out, options['image_format'], options['image_quality'], paragraphs)
+    except Exception as e:
+        print(f"<div>Error: {str(e)}</div>")
+        sys.exit(1)
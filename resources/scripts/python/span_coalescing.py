@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Span coalescing for the text layers of the PyMuPDF converters
+
+PyMuPDF starts a new span at every font change, and kerning-heavy PDFs
+(text placed word by word or glyph by glyph) produce one span, often one
+line, per word or glyph. Spans on the same baseline with an identical style
+that touch (kerned glyphs, a font split mid-word) are merged into runs, each
+run becoming a single element placed at its first span's position. Any wider
+gap (word spacing without a space glyph, tab stops, table columns) starts a
+new positioned run, so merged text never drifts by more than a sliver.
+
+Runs can also be grouped per text block into paragraphs: one positioned
+container per block, its runs placed relative to it.
+"""
+
+# Baselines closer than this fraction of the font size are the same line
+BASELINE_TOLERANCE = 0.1
+
+# Largest horizontal gap, in font sizes, still merged into one run; the
+# merged text is drawn without it, so it bounds how far a span can move
+MAX_GAP = 0.05
+
+# Widest whitespace span, in font sizes, merged as a single space; wider ones
+# (space runs used as tab stops) end the run
+MAX_SPACE_WIDTH = 0.5
+
+# Overlap (negative gap), in font sizes, still merged; tight kerning produces it
+MAX_OVERLAP = 0.3
+
+# Lines whose direction is further than this from left-to-right are left as they are
+HORIZONTAL_TOLERANCE = 0.01
+
+# Shared by the paragraph containers of every converter
+PARAGRAPH_CSS = """.pdf-paragraph{position:absolute;margin:0;padding:0;white-space:nowrap}
+.pdf-paragraph:focus{outline:1px solid rgba(0,123,255,0.4)}
+"""
+
+
+def _style_key(span):
+    return (span.get("font"), round(span.get("size", 0), 2), span.get("color"), span.get("flags", 0))
+
+
+def _baseline(span):
+    origin = span.get("origin")
+    return origin[1] if origin else span["bbox"][3]
+
+
+def _is_horizontal(line):
+    direction = line.get("dir", (1, 0))
+    return abs(direction[1]) <= HORIZONTAL_TOLERANCE and direction[0] > 0
+
+
+def _same_line(run, span):
+    """True if span continues run on the same baseline, close enough to be merged"""
+    size = max(run.get("size", 0), span.get("size", 0), 1)
+    if abs(_baseline(run) - _baseline(span)) > BASELINE_TOLERANCE * size:
+        return False
+    gap = span["bbox"][0] - run["bbox"][2]
+    return -MAX_OVERLAP * size <= gap <= MAX_GAP * size
+
+
+def coalesce_spans(spans):
+    """Merge consecutive spans sharing baseline and style into runs.
+
+    Runs are new dicts with the keys of a PyMuPDF span (text, bbox, size,
+    font, color, flags, origin); the spans are not modified. Whitespace-only
+    spans between two runs only contribute their space, whatever their font,
+    as long as they are no wider than a space.
+    """
+    runs = []
+    for span in spans:
+        text = span.get("text", "")
+        if not text:
+            continue
+        run = runs[-1] if runs else None
+
+        if run is not None and not text.strip():
+            width = span["bbox"][2] - span["bbox"][0]
+            if (_same_line(run, span) and not run["text"].endswith(" ")
+                    and width <= MAX_SPACE_WIDTH * max(span.get("size", 0), 1)):
+                run["text"] += " "
+                run["bbox"] = (run["bbox"][0], run["bbox"][1], max(run["bbox"][2], span["bbox"][2]), run["bbox"][3])
+            continue
+
+        if run is not None and _style_key(run) == _style_key(span) and _same_line(run, span):
+            run["text"] += text
+            x0, y0, x1, y1 = run["bbox"]
+            sx0, sy0, sx1, sy1 = span["bbox"]
+            run["bbox"] = (min(x0, sx0), min(y0, sy0), max(x1, sx1), max(y1, sy1))
+            continue
+
+        run = dict(span)
+        run["bbox"] = tuple(span["bbox"])
+        runs.append(run)
+    return runs
+
+
+def block_runs(block):
+    """Runs of a text block; horizontal lines are coalesced across line boundaries"""
+    runs = []
+    pending = []
+    for line in block.get("lines", []):
+        if _is_horizontal(line):
+            pending.extend(line.get("spans", []))
+            continue
+        # Rotated or vertical text keeps its spans
+        runs.extend(coalesce_spans(pending))
+        pending = []
+        runs.extend(span for span in line.get("spans", []) if span.get("text"))
+    runs.extend(coalesce_spans(pending))
+    return runs
+
+
+def iter_text_groups(text_dict, paragraphs=False):
+    """Yield (paragraph_bbox, runs) for the text blocks of a page text dict.
+
+    Without paragraphs, a single (None, runs) pair holds every run of the
+    page. With paragraphs, each text block gives one pair whose bbox is the
+    union of its runs.
+    """
+    if not paragraphs:
+        runs = []
+        for block in text_dict.get("blocks", []):
+            if block.get("type") == 0:
+                runs.extend(block_runs(block))
+        yield None, runs
+        return
+
+    for block in text_dict.get("blocks", []):
+        if block.get("type") != 0:
+            continue
+        runs = [run for run in block_runs(block) if run["text"].strip()]
+        if runs:
+            bbox = (min(run["bbox"][0] for run in runs), min(run["bbox"][1] for run in runs),
+                    max(run["bbox"][2] for run in runs), max(run["bbox"][3] for run in runs))
+            yield bbox, runs
+
+
+def split_paragraph_option(argv):
+    """Separate the --paragraphs flag from the other arguments; returns (args, paragraphs)"""
+    args = [arg for arg in argv if arg != '--paragraphs']
+    return args, len(args) != len(argv)
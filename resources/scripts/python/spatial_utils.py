@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Rectangle grouping helpers for the PyMuPDF converters
+
+Rectangles are plain (x0, y0, x1, y1) sequences, so fitz.Rect works as is.
+"""
+
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def _merge_pass(boxes, gap):
+    """One union-find pass: merge boxes that intersect or are within gap of each other"""
+    parents = list(range(len(boxes)))
+
+    # Sweep on x0 so each box is only compared with boxes that can still reach it
+    order = sorted(range(len(boxes)), key=lambda i: boxes[i][0])
+    active = []
+    for i in order:
+        x0, y0, x1, y1 = boxes[i]
+        active = [j for j in active if boxes[j][2] + gap >= x0]
+        for j in active:
+            _bx0, by0, _bx1, by1 = boxes[j]
+            if by0 <= y1 + gap and y0 <= by1 + gap:
+                ri, rj = _find(parents, i), _find(parents, j)
+                if ri != rj:
+                    parents[ri] = rj
+        active.append(i)
+
+    groups = {}
+    for i in range(len(boxes)):
+        groups.setdefault(_find(parents, i), []).append(i)
+    return list(groups.values())
+
+
+def cluster_rects(rects, gap=0.0):
+    """Group rectangles that overlap or lie within gap points of each other.
+
+    Returns a list of (bbox, indices) pairs, where bbox is the union of the
+    member rectangles as an (x0, y0, x1, y1) tuple and indices refer to the
+    input list. Merging is repeated until no two cluster bboxes overlap, so
+    rendering each bbox once covers every input rectangle exactly once.
+    """
+    clusters = [(tuple(r), [i]) for i, r in enumerate(rects)]
+
+    while True:
+        groups = _merge_pass([bbox for bbox, _members in clusters], gap)
+        if len(groups) == len(clusters):
+            return clusters
+
+        merged = []
+        for group in groups:
+            members = []
+            for k in group:
+                members.extend(clusters[k][1])
+            boxes = [clusters[k][0] for k in group]
+            bbox = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                    max(b[2] for b in boxes), max(b[3] for b in boxes))
+            merged.append((bbox, sorted(members)))
+        clusters = merged
+
+
+class RectGrid:
+    """Uniform grid index of rectangles for fast overlap queries.
+
+    Each rectangle is registered in every cell it touches; a query only
+    visits the cells covered by the query rectangle.
+    """
+
+    def __init__(self, cell_size=50.0):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._rects = []
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        return (int(rect[0] // size), int(rect[1] // size),
+                int(rect[2] // size), int(rect[3] // size))
+
+    def insert(self, rect):
+        """Add a rectangle and return its index"""
+        index = len(self._rects)
+        self._rects.append(tuple(rect))
+        cx0, cy0, cx1, cy1 = self._cell_range(rect)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                self._cells.setdefault((cx, cy), []).append(index)
+        return index
+
+    def query(self, rect):
+        """Return the indices of the rectangles overlapping rect, in insertion order"""
+        x0, y0, x1, y1 = rect
+        cx0, cy0, cx1, cy1 = self._cell_range(rect)
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for index in self._cells.get((cx, cy), ()):
+                    if index in found:
+                        continue
+                    rx0, ry0, rx1, ry1 = self._rects[index]
+                    if rx0 < x1 and x0 < rx1 and ry0 < y1 and y0 < ry1:
+                        found.add(index)
+        return sorted(found)
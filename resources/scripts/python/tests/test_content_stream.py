@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Unit tests of content_stream.py: tokenizer, text stripping and rule detection
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from content_stream import (  # noqa: E402
+    OPERATOR, Name, RuleIndex, find_rules, iter_operations, strip_text, tokenize,
+)
+
+# PDF to page space of a US Letter page (y axis flipped)
+LETTER_PAGE_MATRIX = (1.0, 0.0, 0.0, -1.0, 0.0, 792.0)
+
+
+def _operators(data):
+    return [value for kind, value in tokenize(data) if kind == OPERATOR]
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_operands(self):
+        operations = list(iter_operations(b"/F1 12 Tf [(a) -20 (b)] TJ <</MCID 0>> BDC (x\\)y (z)) Tj"))
+        self.assertEqual(operations[0], (b"Tf", [Name(b"F1"), 12.0]))
+        self.assertEqual(operations[1], (b"TJ", [[b"a", -20.0, b"b"]]))
+        self.assertEqual(operations[2], (b"BDC", [{Name(b"MCID"): 0.0}]))
+        self.assertEqual(operations[3], (b"Tj", [b"x\\)y (z)"]))
+
+    def test_inline_image_data_is_skipped(self):
+        data = b"q BI /W 2 /H 1 /BPC 8 /CS /G ID \x00Tj\xff EI Q"
+        self.assertEqual(_operators(data), [b"q", b"BI", b"ID", b"EI", b"Q"])
+
+
+class StripTextTest(unittest.TestCase):
+
+    def test_removes_text_showing_operators(self):
+        data = b"BT /F1 12 Tf 72 700 Td (Hello) Tj [(W) 10 (orld)] TJ (a) ' 1 2 (b) \" ET 0 0 10 10 re f"
+        ops = _operators(strip_text(data))
+        self.assertEqual(ops, [b"BT", b"Tf", b"Td", b"ET", b"re", b"f"])
+
+    def test_invisible_text_is_removed(self):
+        ops = _operators(strip_text(b"BT 3 Tr (hidden) Tj ET"))
+        self.assertEqual(ops, [b"BT", b"Tr", b"ET"])
+
+    def test_clip_only_text_is_kept(self):
+        stripped = strip_text(b"BT 7 Tr (clip) Tj ET")
+        self.assertEqual(_operators(stripped), [b"BT", b"Tr", b"Tj", b"ET"])
+        self.assertIn(b"(clip) Tj", stripped)
+
+    def test_visible_clip_text_becomes_clip_only(self):
+        stripped = strip_text(b"BT 5 Tr (clip) Tj ET")
+        operations = list(iter_operations(stripped))
+        self.assertEqual([op for op, _operands in operations], [b"BT", b"Tr", b"Tr", b"Tj", b"Tr", b"ET"])
+        # Switched to clip only around the text, then back to the mode of the stream
+        self.assertEqual([operands for op, operands in operations if op == b"Tr"], [[5.0], [7.0], [5.0]])
+
+    def test_render_mode_is_restored_by_Q(self):
+        stripped = strip_text(b"q BT 7 Tr ET Q BT (shown) Tj ET")
+        self.assertNotIn(b"shown", stripped)
+
+
+class FindRulesTest(unittest.TestCase):
+
+    def test_filled_rect(self):
+        rules = find_rules(b"0 0 1 rg 10 20 100 1.5 re f")
+        self.assertEqual(len(rules), 1)
+        self.assertEqual(rules[0]["kind"], "rect")
+        self.assertEqual(rules[0]["rect"], (10.0, 20.0, 110.0, 21.5))
+        self.assertEqual(rules[0]["color"], (0.0, 0.0, 1.0))
+
+    def test_ctm_transformed_rect(self):
+        rules = find_rules(b"q 2 0 0 2 10 20 cm 0 0 50 1 re f Q 0 0 50 1 re f")
+        self.assertEqual([rule["rect"] for rule in rules], [(10.0, 20.0, 110.0, 22.0), (0.0, 0.0, 50.0, 1.0)])
+
+    def test_ctm_scaled_out_of_range(self):
+        # 1.5 high in user space, 4.5 high on the page: not a rule any more
+        self.assertEqual(find_rules(b"3 0 0 3 0 0 cm 0 0 50 1.5 re f"), [])
+
+    def test_page_matrix(self):
+        rules = find_rules(b"10 20 100 1 re f", page_matrix=LETTER_PAGE_MATRIX)
+        self.assertEqual(rules[0]["rect"], (10.0, 771.0, 110.0, 772.0))
+
+    def test_stroked_line_width_scaled_by_ctm(self):
+        rules = find_rules(b"0.5 G 2 w 2 0 0 2 0 0 cm 10 100 m 60 100 l S")
+        self.assertEqual(len(rules), 1)
+        rule = rules[0]
+        self.assertEqual(rule["kind"], "line")
+        self.assertEqual(rule["width"], 4.0)
+        self.assertEqual(rule["rect"], (20.0, 198.0, 120.0, 202.0))
+        self.assertEqual(rule["color"], (0.5, 0.5, 0.5))
+
+    def test_ignores_short_tall_and_unpainted_paths(self):
+        data = b"0 0 10 1 re f 0 0 100 10 re f 0 0 100 1 re n 10 10 m 10 100 l S"
+        self.assertEqual(find_rules(data), [])
+
+
+class RuleIndexTest(unittest.TestCase):
+
+    def test_duplicates(self):
+        index = RuleIndex(tolerance=2.0)
+        index.add((0, 100, 50, 101))
+        self.assertTrue(index.is_duplicate((10, 102, 20, 103)))
+        self.assertTrue(index.is_duplicate((10, 98, 20, 99)))
+        # Too far on y, or no horizontal overlap
+        self.assertFalse(index.is_duplicate((10, 102.5, 20, 103)))
+        self.assertFalse(index.is_duplicate((50, 100, 70, 101)))
+
+    def test_matches_brute_force(self):
+        index = RuleIndex(tolerance=1.5)
+        rules = [((i * 7) % 300, (i * 13) % 500 / 3, (i * 7) % 300 + 40, 0) for i in range(200)]
+        for rule in rules:
+            index.add(rule)
+        for probe in [((i * 11) % 300, (i * 17) % 500 / 3, (i * 11) % 300 + 25, 0) for i in range(200)]:
+            expected = any(abs(y0 - probe[1]) <= 1.5 and x0 < probe[2] and probe[0] < x1
+                           for x0, y0, x1, _y1 in rules)
+            self.assertEqual(index.is_duplicate(probe), expected, probe)
+
+
+if __name__ == "__main__":
+    unittest.main()
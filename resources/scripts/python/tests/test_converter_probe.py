@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Unit tests of converter_probe.py
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+if fitz is not None:
+    from converter_probe import (
+        STRATEGY_BACKGROUND, STRATEGY_ELEMENTS, VECTOR_HEAVY_DRAWINGS,
+        choose_strategy, probe_document, sample_pages,
+    )
+    from page_classifier import PAGE_BLANK, PAGE_DIGITAL, PAGE_SCANNED, PAGE_VECTOR
+
+
+def _metrics(page_types, drawings=0, text_chars=500):
+    return {
+        'sampled_pages': list(range(1, sum(page_types.values()) + 1)),
+        'page_types': page_types,
+        'drawings_per_page': drawings,
+        'text_chars_per_page': text_chars,
+    }
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class ChooseStrategyTest(unittest.TestCase):
+
+    def test_sample_pages(self):
+        self.assertEqual(sample_pages(3), [0, 1, 2])
+        self.assertEqual(sample_pages(101), [0, 25, 50, 75, 100])
+        self.assertEqual(sample_pages(0), [])
+
+    def test_empty_document(self):
+        self.assertEqual(choose_strategy(_metrics({}))[0], STRATEGY_BACKGROUND)
+
+    def test_scanned_majority(self):
+        self.assertEqual(choose_strategy(_metrics({PAGE_SCANNED: 3, PAGE_DIGITAL: 2}))[0], STRATEGY_BACKGROUND)
+        self.assertEqual(choose_strategy(_metrics({PAGE_SCANNED: 2, PAGE_DIGITAL: 3}))[0], STRATEGY_ELEMENTS)
+
+    def test_vector_heavy(self):
+        strategy, reasons = choose_strategy(_metrics({PAGE_DIGITAL: 5}, drawings=VECTOR_HEAVY_DRAWINGS))
+        self.assertEqual(strategy, STRATEGY_BACKGROUND)
+        self.assertIn(str(VECTOR_HEAVY_DRAWINGS), reasons[0])
+
+    def test_no_text(self):
+        self.assertEqual(choose_strategy(_metrics({PAGE_VECTOR: 2, PAGE_BLANK: 1}))[0], STRATEGY_BACKGROUND)
+
+    def test_text_pages(self):
+        strategy, reasons = choose_strategy(_metrics({PAGE_DIGITAL: 4, PAGE_VECTOR: 1}, drawings=12))
+        self.assertEqual(strategy, STRATEGY_ELEMENTS)
+        self.assertEqual(len(reasons), 1)
+
+    def test_probe_document(self):
+        doc = fitz.open()
+        for page_num in range(8):
+            doc.new_page().insert_text((72, 72), f"Page {page_num + 1} with enough text to count", fontsize=12)
+        result = probe_document(doc)
+        self.assertEqual(result['strategy'], STRATEGY_ELEMENTS)
+        self.assertEqual(result['metrics']['sampled_pages'], [1, 3, 5, 6, 8])
+        self.assertEqual(result['metrics']['page_types'], {PAGE_DIGITAL: 5})
+
+
+if __name__ == "__main__":
+    unittest.main()
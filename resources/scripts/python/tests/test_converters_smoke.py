@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Smoke test of every converter entry point
+
+A small PDF (text, a filled rectangle, a line and a raster image on every
+other page) is generated and each converter script is run on it the way
+PdfToHtmlService runs it. Each run must exit 0, keep the text of the pages
+and only reference image files that exist. This catches a shared module
+(page_cache.py, background_pipeline.py...) breaking every converter at once.
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+PAGES = 5
+
+# Converters taking "pdf_file image_dir [output_html]"
+FILE_CONVERTERS = (
+    'pymupdf_converter_v2.py',
+    'pymupdf_converter_v3.py',
+    'pymupdf_converter_v4.py',
+    'pymupdf_converter_v5.py',
+    'pymupdf_converter_v6.py',
+    'pymupdf_converter_v7.py',
+    'pymupdf_converter_v8.py',
+    'pymupdf_converter_v9.py',
+    'pymupdf_converter_v10.py',
+    'pymupdf_converter_v11.py',
+    'pymupdf_perfect.py',
+)
+
+# Seconds a converter may take on the generated document
+RUN_TIMEOUT = 120
+
+SOURCE = re.compile(r'(?:src|srcset)="([^"]+)"')
+
+
+def _write_sample_pdf(path):
+    image = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 30), False)
+    image.clear_with(255)
+    image.set_rect(fitz.IRect(5, 5, 35, 25), (200, 30, 30))
+    png = image.tobytes("png")
+
+    doc = fitz.open()
+    for page_num in range(PAGES):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {page_num + 1} hello world", fontsize=12)
+        page.insert_text((72, 120), "Second line of text", fontsize=10)
+        page.draw_rect(fitz.Rect(100, 200, 300, 260), color=(0, 0, 1), fill=(0.9, 0.9, 0.2))
+        page.draw_line((50, 300), (400, 300))
+        if page_num % 2 == 0:
+            page.insert_image(fitz.Rect(300, 400, 420, 490), stream=png)
+    doc.save(path)
+    doc.close()
+
+
+def _run(args):
+    return subprocess.run([sys.executable] + args, cwd=SCRIPTS_DIR, capture_output=True,
+                          text=True, timeout=RUN_TIMEOUT)
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class ConverterSmokeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.pdf_path = os.path.join(cls.tmp.name, "sample.pdf")
+        _write_sample_pdf(cls.pdf_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def assertConverted(self, html, img_dir=None):
+        self.assertNotIn("<div>Error", html)
+        for page_num in range(PAGES):
+            self.assertIn(f"Page {page_num + 1} hello world", html)
+        if img_dir is None:
+            return
+        for value in SOURCE.findall(html):
+            for source in value.split(","):
+                name = source.strip().split(" ")[0]
+                if name and not name.startswith("data:"):
+                    self.assertTrue(os.path.isfile(os.path.join(img_dir, name)), f"missing {name}")
+
+    def test_file_converters(self):
+        for script in FILE_CONVERTERS:
+            with self.subTest(script=script):
+                img_dir = os.path.join(self.tmp.name, script + "-images")
+                output = os.path.join(self.tmp.name, script + ".html")
+                # PdfToHtmlService creates the image directory before running a script
+                os.makedirs(img_dir)
+                result = _run([script, self.pdf_path, img_dir, output])
+                self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+                with open(output, encoding="utf-8") as f:
+                    self.assertConverted(f.read(), img_dir)
+
+    def test_class_rules_follow_the_base_stylesheet(self):
+        # Per-page style blocks are prepended to the page buffer; on page 1
+        # they must not end up ahead of the converter's own stylesheet
+        for script in ('pymupdf_converter_v10.py', 'pymupdf_converter_v11.py', 'pymupdf_perfect.py'):
+            with self.subTest(script=script):
+                img_dir = os.path.join(self.tmp.name, script + "-order-images")
+                output = os.path.join(self.tmp.name, script + "-order.html")
+                os.makedirs(img_dir)
+                result = _run([script, self.pdf_path, img_dir, output])
+                self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+                with open(output, encoding="utf-8") as f:
+                    html = f.read()
+                self.assertLess(html.index("</style>"), html.index("<style>.t0{"), html[:200])
+
+    def test_v11_vector_renders_erase_text(self):
+        # Text over a filled rectangle is emitted as text; its area of the
+        # rectangle's render must be transparent, not painted over
+        doc = fitz.open()
+        page = doc.new_page()
+        page.draw_rect(fitz.Rect(95, 95, 325, 195), color=(0, 0, 0), fill=(0.9, 0.9, 0.2))
+        page.insert_text((110, 150), "Boxed text", fontsize=24)
+        pdf_path = os.path.join(self.tmp.name, "boxed.pdf")
+        doc.save(pdf_path)
+        doc.close()
+
+        img_dir = os.path.join(self.tmp.name, "boxed-images")
+        os.makedirs(img_dir)
+        result = _run(["pymupdf_converter_v11.py", pdf_path, img_dir, os.path.join(img_dir, "out.html")])
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        box = fitz.Pixmap(os.path.join(img_dir, "p1_vec0.png"))
+        # Inside the first glyph, relative to the clip origin (95, 95) at 200 DPI
+        zoom = 200 / 72
+        self.assertEqual(box.pixel(int((115 - 95) * zoom), int((143 - 95) * zoom))[-1], 0)
+        # Away from the text the rectangle is still drawn
+        self.assertEqual(box.pixel(int((300 - 95) * zoom), int((185 - 95) * zoom))[-1], 255)
+
+    def test_v11_vector_renders_leave_out_raster_images(self):
+        # A frame drawn around an image: the image is emitted on its own, so
+        # the render of the frame must not contain it again
+        image = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 30), False)
+        image.set_rect(image.irect, (200, 30, 30))
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(100, 100, 220, 190), stream=image.tobytes("png"))
+        page.draw_rect(fitz.Rect(95, 95, 225, 195), color=(0, 0, 0), width=2)
+        pdf_path = os.path.join(self.tmp.name, "framed.pdf")
+        doc.save(pdf_path)
+        doc.close()
+
+        img_dir = os.path.join(self.tmp.name, "framed-images")
+        os.makedirs(img_dir)
+        result = _run(["pymupdf_converter_v11.py", pdf_path, img_dir, os.path.join(img_dir, "out.html")])
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertTrue(os.path.isfile(os.path.join(img_dir, "p1_vec0.png")))
+        frame = fitz.Pixmap(os.path.join(img_dir, "p1_vec0.png"))
+        # Middle of the image area, relative to the clip origin (95, 95) at 200 DPI
+        zoom = 200 / 72
+        self.assertEqual(frame.pixel(int((160 - 95) * zoom), int((145 - 95) * zoom))[-1], 0)
+        # The frame itself is still drawn
+        self.assertEqual(frame.pixel(int((160 - 95) * zoom), 1)[-1], 255)
+
+    def test_base64_converter(self):
+        output = os.path.join(self.tmp.name, "base64.html")
+        result = _run(["pymupdf_converter_base64.py", self.pdf_path, "--output", output])
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        with open(output, encoding="utf-8") as f:
+            html = f.read()
+        self.assertConverted(html)
+        self.assertIn('<template id="pdf-img-', html)
+
+    def test_fallback_chain_entry_point(self):
+        img_dir = os.path.join(self.tmp.name, "chain-images")
+        output = os.path.join(self.tmp.name, "chain.html")
+        result = _run(["pymupdf_converter.py", self.pdf_path, img_dir, output,
+                       "--chain=auto,base64,v11,v10,v7,v2"])
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        report = json.loads(re.search(r"^Converter report: (.+)$", result.stderr, re.M).group(1))
+        # The first strategy of the chain must not need a fallback
+        self.assertTrue(report["attempts"][0]["ok"], report)
+        with open(output, encoding="utf-8") as f:
+            self.assertConverted(f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
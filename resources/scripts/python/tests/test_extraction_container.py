@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Unit tests of extraction_container.py
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction_container import (  # noqa: E402
+    COMPRESSION_NONE, COMPRESSION_ZLIB, ContainerError,
+    ExtractionContainerReader, ExtractionContainerWriter,
+)
+
+
+class ExtractionContainerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "doc.gpx")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        for compression in (COMPRESSION_NONE, COMPRESSION_ZLIB):
+            with self.subTest(compression=compression):
+                with ExtractionContainerWriter(self.path, 3, compression=compression) as writer:
+                    # Pages are stored in extraction order, not page order
+                    writer.add_page(3, {"text": "third", "blocks": [1, 2, 3]})
+                    writer.add_page(1, {"text": "première page"})
+                    writer.add_section("metadata", {"title": "Doc"})
+
+                with ExtractionContainerReader(self.path) as reader:
+                    self.assertEqual(reader.page_count, 3)
+                    self.assertEqual(reader.section_names, ["metadata"])
+                    self.assertEqual(reader.read_page(1), {"text": "première page"})
+                    self.assertIsNone(reader.read_page(2))
+                    self.assertEqual(reader.read_page(3), {"text": "third", "blocks": [1, 2, 3]})
+                    self.assertEqual(reader.read_section("metadata"), {"title": "Doc"})
+
+    def test_out_of_range_and_unknown_section(self):
+        with ExtractionContainerWriter(self.path, 1) as writer:
+            with self.assertRaises(ContainerError):
+                writer.add_page(2, {})
+            with self.assertRaises(ContainerError):
+                writer.add_section("a_section_name_too_long", {})
+
+        with ExtractionContainerReader(self.path) as reader:
+            with self.assertRaises(ContainerError):
+                reader.read_page(0)
+            with self.assertRaises(ContainerError):
+                reader.read_section("outline")
+
+    def test_abort_deletes_partial_file(self):
+        with self.assertRaises(RuntimeError):
+            with ExtractionContainerWriter(self.path, 2) as writer:
+                writer.add_page(1, {"text": "written before the failure"})
+                raise RuntimeError("extraction failed")
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"%PDF-1.7" + b"\0" * 64)
+        with self.assertRaises(ContainerError):
+            ExtractionContainerReader(self.path)
+
+        with open(self.path, "wb") as f:
+            f.write(b"GIGA")
+        with self.assertRaises(ContainerError):
+            ExtractionContainerReader(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Unit tests of html_styles.py
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_styles import StyleRegistry  # noqa: E402
+
+BOLD = "font-weight:bold;font-size:12.0px"
+RED = "color:#ff0000;font-size:9.0px"
+
+
+class StyleRegistryTest(unittest.TestCase):
+
+    def test_same_declarations_share_a_class(self):
+        styles = StyleRegistry()
+        self.assertEqual(styles.class_for(BOLD), "t0")
+        self.assertEqual(styles.class_for(RED), "t1")
+        self.assertEqual(styles.class_for(BOLD), "t0")
+        self.assertEqual(len(styles), 2)
+
+    def test_prefix(self):
+        styles = StyleRegistry(prefix="t12-")
+        self.assertEqual(styles.class_for(RED), "t12-0")
+        self.assertEqual(styles.take_pending(), [("t12-0", ".t12-0{" + RED + "}")])
+
+    def test_rules_are_handed_out_once(self):
+        styles = StyleRegistry()
+        styles.class_for(BOLD)
+        self.assertEqual(styles.take_pending(), [("t0", ".t0{" + BOLD + "}")])
+        styles.class_for(BOLD)
+        self.assertEqual(styles.take_pending(), [])
+
+    def test_style_block(self):
+        styles = StyleRegistry()
+        self.assertEqual(styles.take_style_block(), "")
+        styles.class_for(BOLD)
+        styles.class_for(RED)
+        self.assertEqual(styles.take_style_block(), "<style>.t0{" + BOLD + "}.t1{" + RED + "}</style>")
+        self.assertEqual(styles.take_style_block(), "")
+
+    def test_adopt_rules_of_another_registry(self):
+        worker = StyleRegistry(prefix="t4-")
+        worker.class_for(RED)
+        styles = StyleRegistry()
+        styles.adopt(worker.take_pending())
+        self.assertEqual(styles.take_style_block(), "<style>.t4-0{" + RED + "}</style>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unit tests of image_encoding.py
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+if fitz is not None:
+    from image_encoding import FORMAT_AUTO, FORMAT_JPEG, FORMAT_PNG, ImageEncoder
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8"
+
+
+def _flat(width=200, height=150):
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pix.clear_with(255)
+    pix.set_rect(fitz.IRect(20, 20, 120, 80), (30, 60, 200))
+    return pix
+
+
+def _photo(width=200, height=150, alpha=False):
+    rng = random.Random(0)
+    n = 4 if alpha else 3
+    samples = bytes(rng.randrange(256) for _ in range(width * height * n))
+    return fitz.Pixmap(fitz.csRGB, width, height, samples, alpha)
+
+
+def _document_with(*pixmaps, formats=("png",)):
+    """Document with one page per image, returns (doc, xrefs)"""
+    doc = fitz.open()
+    for pix, fmt in zip(pixmaps, formats):
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(50, 50, 250, 200), stream=pix.tobytes(fmt))
+    xrefs = [page.get_images()[0][0] for page in doc]
+    return doc, xrefs
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class FormatPolicyTest(unittest.TestCase):
+
+    def assertEncodedAs(self, encoder, pix, mime):
+        self.assertEqual(encoder.encode_pixmap(pix)[0], mime)
+
+    def test_auto(self):
+        encoder = ImageEncoder(FORMAT_AUTO)
+        self.assertEncodedAs(encoder, _flat(), "image/png")
+        self.assertEncodedAs(encoder, _photo(), "image/jpeg")
+        # Icons stay lossless whatever their content
+        self.assertEncodedAs(encoder, _photo(32, 32), "image/png")
+
+    def test_alpha_is_never_jpeg(self):
+        self.assertEncodedAs(ImageEncoder(FORMAT_AUTO), _photo(alpha=True), "image/png")
+        self.assertEncodedAs(ImageEncoder(FORMAT_JPEG), _photo(alpha=True), "image/png")
+
+    def test_forced_format(self):
+        self.assertEncodedAs(ImageEncoder(FORMAT_JPEG), _flat(), "image/jpeg")
+        self.assertEncodedAs(ImageEncoder(FORMAT_PNG), _photo(), "image/png")
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ImageEncoder("gif")
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class EncodeTest(unittest.TestCase):
+
+    def test_encode_pixmap(self):
+        encoder = ImageEncoder(FORMAT_AUTO)
+        mime, data = encoder.encode_pixmap(_flat())
+        self.assertEqual(mime, "image/png")
+        self.assertTrue(data.startswith(PNG_SIGNATURE))
+        mime, data = encoder.encode_pixmap(_photo())
+        self.assertEqual(mime, "image/jpeg")
+        self.assertTrue(data.startswith(JPEG_SIGNATURE))
+
+        summary = encoder.summary()
+        self.assertEqual(summary[FORMAT_PNG]['count'], 1)
+        self.assertEqual(summary[FORMAT_JPEG]['count'], 1)
+        self.assertEqual(summary['total']['count'], 2)
+
+    def test_passthrough_keeps_the_original_stream(self):
+        doc, (png_xref, jpeg_xref) = _document_with(_flat(), _photo(), formats=("png", "jpeg"))
+        encoder = ImageEncoder(FORMAT_AUTO)
+        self.assertEqual(encoder.encode_xref(doc, jpeg_xref), ("image/jpeg", doc.extract_image(jpeg_xref)["image"]))
+        mime, _data = encoder.encode_xref(doc, png_xref)
+        self.assertEqual(mime, "image/png")
+        self.assertEqual(encoder.summary()['passthrough']['count'], 2)
+
+    def test_forced_format_reencodes(self):
+        doc, (jpeg_xref,) = _document_with(_photo(), formats=("jpeg",))
+        mime, data = ImageEncoder(FORMAT_PNG).encode_xref(doc, jpeg_xref)
+        self.assertEqual(mime, "image/png")
+        self.assertTrue(data.startswith(PNG_SIGNATURE))
+
+        encoder = ImageEncoder(FORMAT_AUTO, passthrough=False)
+        encoder.encode_xref(doc, jpeg_xref)
+        self.assertNotIn('passthrough', encoder.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Unit tests of json_output.py, with and without orjson
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_output  # noqa: E402
+
+
+class FakeRect(tuple):
+    """Iterable geometry like fitz.Rect"""
+
+
+class FakeQuad:
+    """Four points with the ul/ur/lr/ll attributes of fitz.Quad"""
+
+    def __init__(self, *points):
+        self.ul, self.ur, self.ll, self.lr = points
+
+    def __iter__(self):
+        return iter((self.ul, self.ur, self.ll, self.lr))
+
+
+class Unknown:
+    def __str__(self):
+        return "unknown"
+
+
+SAMPLE = {
+    "text": "é – ünicode",
+    "bbox": (1.5, 2, 3, 4),
+    "raw": b"\x00\x01",
+    "nested": [{"rect": FakeRect((0, 0, 1, 1))}, None, True],
+    "other": Unknown(),
+    3: "non-string key",
+}
+
+EXPECTED = {
+    "text": "é – ünicode",
+    "bbox": [1.5, 2, 3, 4],
+    "raw": "AAE=",
+    "nested": [{"rect": [0, 0, 1, 1]}, None, True],
+    "other": "unknown",
+    "3": "non-string key",
+}
+
+
+class JsonOutputTest(unittest.TestCase):
+
+    def _backends(self):
+        yield "stdlib", None
+        if json_output.orjson is not None:
+            yield "orjson", json_output.orjson
+
+    def test_dumps(self):
+        for name, backend in self._backends():
+            with self.subTest(backend=name), mock.patch.object(json_output, "orjson", backend):
+                self.assertEqual(json.loads(json_output.dumps(SAMPLE)), EXPECTED)
+
+    def test_dump_writes_chunks_and_newline(self):
+        large = {"pages": [{"text": "x" * 1000, "n": i} for i in range(300)]}
+        for name, backend in self._backends():
+            with self.subTest(backend=name), mock.patch.object(json_output, "orjson", backend):
+                stream = io.BytesIO()
+                json_output.dump(large, stream)
+                data = stream.getvalue()
+                self.assertTrue(data.endswith(b"\n"))
+                self.assertEqual(json.loads(data), large)
+
+    def test_geom(self):
+        self.assertIsNone(json_output.geom(None))
+        self.assertEqual(json_output.geom(FakeRect((0, 1, 2, 3))), (0, 1, 2, 3))
+        quad = FakeQuad(FakeRect((0, 0)), FakeRect((1, 0)), FakeRect((0, 1)), FakeRect((1, 1)))
+        self.assertEqual(json_output.geom(quad), ((0, 0), (1, 0), (0, 1), (1, 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Unit tests of page_classifier.py
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+if fitz is not None:
+    from page_classifier import (
+        PAGE_BLANK, PAGE_DIGITAL, PAGE_MIXED, PAGE_SCANNED, PAGE_VECTOR,
+        classify_document, classify_page,
+    )
+
+TEXT = "A paragraph of native text, long enough to count."
+
+
+def _png(width=60, height=40):
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pix.clear_with(200)
+    return pix.tobytes("png")
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class ClassifyPageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = fitz.open()
+
+    def tearDown(self):
+        self.doc.close()
+
+    def _page(self, text=None, image_rect=None, drawing=False):
+        page = self.doc.new_page()
+        if image_rect is not None:
+            page.insert_image(image_rect, stream=_png(), keep_proportion=False)
+        if text:
+            page.insert_text((72, 72), text, fontsize=11)
+        if drawing:
+            page.draw_rect(fitz.Rect(100, 300, 300, 400), color=(0, 0, 0))
+        return page
+
+    def test_digital(self):
+        result = classify_page(self._page(TEXT))
+        self.assertEqual(result['type'], PAGE_DIGITAL)
+        self.assertEqual(result['text_chars'], len(TEXT))
+        self.assertEqual(result['image_count'], 0)
+
+    def test_blank(self):
+        self.assertEqual(classify_page(self._page())['type'], PAGE_BLANK)
+        # A few characters alone do not make a text page
+        self.assertEqual(classify_page(self._page("12"))['type'], PAGE_BLANK)
+
+    def test_scanned(self):
+        result = classify_page(self._page(image_rect=fitz.Rect(0, 0, 595, 842)))
+        self.assertEqual(result['type'], PAGE_SCANNED)
+        self.assertEqual(result['image_coverage'], 1.0)
+
+    def test_scanned_page_with_a_page_number(self):
+        result = classify_page(self._page("- 3 -", image_rect=fitz.Rect(0, 0, 595, 842)))
+        self.assertEqual(result['type'], PAGE_SCANNED)
+        self.assertEqual(result['text_chars'], 5)
+
+    def test_mixed(self):
+        self.assertEqual(classify_page(self._page(TEXT, image_rect=fitz.Rect(72, 100, 272, 300)))['type'], PAGE_MIXED)
+        # A small image without text still goes through the full extraction
+        self.assertEqual(classify_page(self._page(image_rect=fitz.Rect(72, 100, 132, 140)))['type'], PAGE_MIXED)
+
+    def test_small_image_on_text_page_is_digital(self):
+        self.assertEqual(classify_page(self._page(TEXT, image_rect=fitz.Rect(72, 100, 82, 110)))['type'], PAGE_DIGITAL)
+
+    def test_vector(self):
+        result = classify_page(self._page(drawing=True))
+        self.assertEqual(result['type'], PAGE_VECTOR)
+        self.assertGreater(result['drawing_count'], 0)
+
+    def test_classify_document(self):
+        self._page(TEXT)
+        self._page()
+        self.assertEqual([(page['page'], page['type']) for page in classify_document(self.doc)],
+                         [(1, PAGE_DIGITAL), (2, PAGE_BLANK)])
+        self.assertEqual([page['page'] for page in classify_document(self.doc, [1])], [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
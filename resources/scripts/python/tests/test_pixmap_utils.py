@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Unit tests of pixmap_utils.py
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+import pixmap_utils  # noqa: E402
+from pixmap_utils import is_blank_pixmap, top_color_share  # noqa: E402
+
+
+def _pixmap(width=40, height=30, fill=255, alpha=False):
+    """RGB pixmap cleared to fill, fully transparent when fill is None"""
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), alpha)
+    if fill is None:
+        pix.clear_with()
+    else:
+        pix.clear_with(fill)
+    return pix
+
+
+def _without_numpy():
+    return mock.patch.object(pixmap_utils, "numpy", None)
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class IsBlankPixmapTest(unittest.TestCase):
+
+    def assertBlank(self, pix, expected, **kwargs):
+        self.assertEqual(is_blank_pixmap(pix, **kwargs), expected)
+        with _without_numpy():
+            self.assertEqual(is_blank_pixmap(pix, **kwargs), expected, "without numpy")
+
+    def test_white_is_blank(self):
+        self.assertBlank(_pixmap(), True)
+        self.assertBlank(_pixmap(2000, 1500), True)
+
+    def test_transparent_is_blank(self):
+        self.assertBlank(_pixmap(fill=None, alpha=True), True)
+
+    def test_dark_pixel_is_content(self):
+        pix = _pixmap()
+        pix.set_pixel(20, 15, (0, 0, 0))
+        self.assertBlank(pix, False)
+
+    def test_noise_within_tolerance_is_blank(self):
+        pix = _pixmap()
+        pix.set_pixel(3, 4, (250, 252, 249))
+        self.assertBlank(pix, True)
+        self.assertBlank(pix, False, tolerance=2)
+
+    def test_solid_color_is_content(self):
+        pix = _pixmap()
+        pix.set_rect(pix.irect, (200, 30, 30))
+        self.assertBlank(pix, False)
+        self.assertBlank(pix, True, background=(200, 30, 30))
+
+    def test_cmyk_background_is_no_ink(self):
+        no_ink = fitz.Pixmap(fitz.csCMYK, 40, 30, bytes(40 * 30 * 4), False)
+        black = fitz.Pixmap(fitz.csCMYK, 40, 30, bytes([0, 0, 0, 255]) * (40 * 30), False)
+        self.assertBlank(no_ink, True)
+        self.assertBlank(black, False)
+
+    def test_large_banded_pixmap(self):
+        pix = _pixmap(1200, 1600)
+        pix.set_rect(fitz.IRect(0, 800, 1200, 840), (0, 0, 0))
+        self.assertBlank(pix, False)
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class TopColorShareTest(unittest.TestCase):
+
+    def assertShare(self, pix, expected, delta=0.0):
+        self.assertAlmostEqual(top_color_share(pix), expected, delta=delta)
+        with _without_numpy():
+            self.assertAlmostEqual(top_color_share(pix), expected, delta=delta, msg="without numpy")
+
+    def test_flat(self):
+        self.assertShare(_pixmap(), 1.0)
+
+    def test_half_and_half(self):
+        pix = _pixmap(40, 40)
+        pix.set_rect(fitz.IRect(0, 0, 40, 20), (0, 0, 0))
+        self.assertShare(pix, 0.5)
+
+    def test_many_colors_on_a_bounded_grid(self):
+        width, height = 1000, 1000
+        samples = bytes((x * 7 + y * 13 + c) % 256 for y in range(height) for x in range(width) for c in range(3))
+        pix = fitz.Pixmap(fitz.csRGB, width, height, samples, False)
+        self.assertShare(pix, 0.0, delta=0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
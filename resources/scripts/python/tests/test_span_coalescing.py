@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Unit tests of span_coalescing.py
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from span_coalescing import (  # noqa: E402
+    block_runs, coalesce_spans, iter_text_groups, split_paragraph_option,
+)
+
+
+def span(text, x0, x1, baseline=100.0, size=10.0, font="Helvetica", color=0, flags=0):
+    return {"text": text, "bbox": (x0, baseline - size, x1, baseline + 2), "origin": (x0, baseline),
+            "size": size, "font": font, "color": color, "flags": flags}
+
+
+def line(*spans, direction=(1.0, 0.0)):
+    return {"dir": direction, "spans": list(spans)}
+
+
+class CoalesceSpansTest(unittest.TestCase):
+
+    def test_glyph_spans_merge_into_one_run(self):
+        spans = [span("H", 10, 16), span("e", 16, 21), span("y", 21.5, 26)]
+        runs = coalesce_spans(spans)
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0]["text"], "Hey")
+        self.assertEqual(runs[0]["bbox"], (10, 90.0, 26, 102.0))
+        self.assertEqual(runs[0]["origin"], (10, 100.0))
+        # Input spans are left untouched
+        self.assertEqual(spans[0]["text"], "H")
+
+    def test_word_gap_starts_a_positioned_run(self):
+        runs = coalesce_spans([span("Hello", 10, 40), span("world", 43, 70)])
+        self.assertEqual([run["text"] for run in runs], ["Hello", "world"])
+        self.assertEqual([run["origin"] for run in runs], [(10, 100.0), (43, 100.0)])
+
+    def test_whitespace_span_only_adds_a_space(self):
+        runs = coalesce_spans([span("a", 10, 15), span(" ", 15, 18, font="Symbol"), span("b", 18, 23)])
+        self.assertEqual([run["text"] for run in runs], ["a b"])
+
+    def test_wide_whitespace_span_ends_the_run(self):
+        runs = coalesce_spans([span("a", 10, 15), span("    ", 15, 35), span("b", 35, 40)])
+        self.assertEqual([run["text"] for run in runs], ["a", "b"])
+        self.assertEqual(runs[1]["origin"], (35, 100.0))
+
+    def test_kept_apart(self):
+        cases = {
+            "style change": [span("a", 10, 15), span("b", 15, 20, flags=16)],
+            "column gap": [span("a", 10, 15), span("b", 40, 45)],
+            "narrow gap": [span("a", 10, 15), span("b", 16, 21)],
+            "other baseline": [span("a", 10, 15), span("b", 15, 20, baseline=112)],
+            "large overlap": [span("a", 10, 15), span("b", 5, 10)],
+        }
+        for name, spans in cases.items():
+            with self.subTest(name):
+                self.assertEqual(len(coalesce_spans(spans)), 2)
+
+    def test_empty_spans_are_dropped(self):
+        self.assertEqual(coalesce_spans([span("", 0, 0)]), [])
+
+
+class GroupingTest(unittest.TestCase):
+
+    def test_block_runs_across_lines_and_rotated_lines(self):
+        block = {"type": 0, "lines": [
+            line(span("Hel", 10, 25)),
+            line(span("lo", 25, 35)),
+            line(span("up", 50, 60), direction=(0.0, -1.0)),
+        ]}
+        self.assertEqual([run["text"] for run in block_runs(block)], ["Hello", "up"])
+
+    def test_iter_text_groups(self):
+        text_dict = {"blocks": [
+            {"type": 0, "lines": [line(span("First", 10, 35))]},
+            {"type": 1},
+            {"type": 0, "lines": [line(span("Second", 10, 40, baseline=200)),
+                                  line(span("block", 10, 35, baseline=212))]},
+        ]}
+        groups = list(iter_text_groups(text_dict))
+        self.assertEqual(len(groups), 1)
+        self.assertIsNone(groups[0][0])
+        self.assertEqual([run["text"] for run in groups[0][1]], ["First", "Second", "block"])
+
+        paragraphs = list(iter_text_groups(text_dict, paragraphs=True))
+        self.assertEqual([bbox for bbox, _runs in paragraphs], [(10, 90.0, 35, 102.0), (10, 190.0, 40, 214.0)])
+        self.assertEqual([[run["text"] for run in runs] for _bbox, runs in paragraphs], [["First"], ["Second", "block"]])
+
+    def test_split_paragraph_option(self):
+        self.assertEqual(split_paragraph_option(["a.pdf", "--paragraphs", "out"]), (["a.pdf", "out"], True))
+        self.assertEqual(split_paragraph_option(["a.pdf"]), (["a.pdf"], False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests of spatial_utils.py
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spatial_utils import RectGrid, cluster_rects  # noqa: E402
+
+
+def _random_rects(count, seed):
+    rng = random.Random(seed)
+    rects = []
+    for _ in range(count):
+        x0, y0 = rng.uniform(0, 600), rng.uniform(0, 800)
+        rects.append((x0, y0, x0 + rng.uniform(0.5, 120), y0 + rng.uniform(0.5, 60)))
+    return rects
+
+
+def _overlaps(a, b, gap=0.0):
+    return a[0] <= b[2] + gap and b[0] <= a[2] + gap and a[1] <= b[3] + gap and b[1] <= a[3] + gap
+
+
+class ClusterRectsTest(unittest.TestCase):
+
+    def test_merges_overlapping_and_close_rects(self):
+        rects = [(0, 0, 10, 10), (5, 5, 20, 20), (100, 100, 110, 110), (112, 100, 120, 110)]
+        clusters = cluster_rects(rects, gap=3)
+        self.assertEqual(sorted(clusters), [((0, 0, 20, 20), [0, 1]), ((100, 100, 120, 110), [2, 3])])
+
+    def test_gap(self):
+        rects = [(0, 0, 10, 10), (15, 0, 25, 10)]
+        self.assertEqual(len(cluster_rects(rects)), 2)
+        self.assertEqual(len(cluster_rects(rects, gap=5)), 1)
+
+    def test_merged_bbox_swallows_new_neighbours(self):
+        # (0,0)-(10,10) and (20,20)-(30,30) are joined by the diagonal one; the union
+        # bbox then overlaps (25,0)-(28,5), which touches none of the three rects
+        rects = [(0, 0, 10, 10), (20, 20, 30, 30), (8, 8, 22, 22), (25, 0, 28, 5)]
+        self.assertEqual(cluster_rects(rects), [((0, 0, 30, 30), [0, 1, 2, 3])])
+
+    def test_clusters_partition_and_do_not_overlap(self):
+        rects = _random_rects(300, seed=1)
+        clusters = cluster_rects(rects, gap=1)
+
+        members = sorted(i for _bbox, indices in clusters for i in indices)
+        self.assertEqual(members, list(range(len(rects))))
+        for bbox, indices in clusters:
+            for i in indices:
+                self.assertTrue(bbox[0] <= rects[i][0] and bbox[1] <= rects[i][1]
+                                and rects[i][2] <= bbox[2] and rects[i][3] <= bbox[3])
+        for a in range(len(clusters)):
+            for b in range(a + 1, len(clusters)):
+                self.assertFalse(_overlaps(clusters[a][0], clusters[b][0], gap=1))
+
+
+class RectGridTest(unittest.TestCase):
+
+    def test_query_matches_brute_force(self):
+        rects = _random_rects(500, seed=2)
+        for cell_size in (10.0, 50.0, 400.0):
+            with self.subTest(cell_size=cell_size):
+                grid = RectGrid(cell_size)
+                for i, rect in enumerate(rects):
+                    self.assertEqual(grid.insert(rect), i)
+                for query in _random_rects(200, seed=3):
+                    expected = [i for i, r in enumerate(rects)
+                                if r[0] < query[2] and query[0] < r[2] and r[1] < query[3] and query[1] < r[3]]
+                    self.assertEqual(grid.query(query), expected)
+
+    def test_touching_edges_do_not_overlap(self):
+        grid = RectGrid(10.0)
+        grid.insert((0, 0, 10, 10))
+        self.assertEqual(grid.query((10, 0, 20, 10)), [])
+        self.assertEqual(grid.query((9.5, 9.5, 20, 20)), [0])
+
+    def test_negative_coordinates(self):
+        grid = RectGrid(10.0)
+        grid.insert((-25, -25, -15, -15))
+        self.assertEqual(grid.query((-20, -20, -19, -19)), [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
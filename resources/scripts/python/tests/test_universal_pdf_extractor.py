@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the per-page routing in universal_pdf_extractor.py
+
+OCR is replaced by stubs: the tests check which OCR passes a page gets and
+where their results land, not tesseract itself.
+
+Run from resources/scripts/python:
+    python3 -m unittest discover -s tests
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+if fitz is not None:
+    import universal_pdf_extractor
+    from page_classifier import PAGE_BLANK, PAGE_MIXED, PAGE_SCANNED
+
+
+def _png(width=60, height=40):
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    pix.clear_with(200)
+    return pix.tobytes("png")
+
+
+def _ocr_block(text):
+    return {'type': 0, 'bbox': (72, 100, 132, 140),
+            'lines': [{'spans': [{'text': text}]}]}
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class OcrRoutingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = fitz.open()
+
+    def tearDown(self):
+        self.doc.close()
+
+    def _extract(self, page, region_blocks, page_ocr="page OCR text"):
+        with mock.patch.object(universal_pdf_extractor, 'perform_region_ocr', return_value=region_blocks) as region, \
+                mock.patch.object(universal_pdf_extractor, 'perform_ocr', return_value=page_ocr) as full:
+            components = universal_pdf_extractor.extract_page_components(page, self.doc, {})
+        return components, region, full
+
+    def test_region_ocr_replaces_page_ocr_on_image_only_pages(self):
+        page = self.doc.new_page()
+        page.insert_image(fitz.Rect(72, 100, 132, 140), stream=_png())
+
+        components, region, full = self._extract(page, [_ocr_block("Signed")])
+        self.assertEqual(components['classification']['type'], PAGE_MIXED)
+        region.assert_called_once()
+        full.assert_not_called()
+        self.assertEqual(components['text']['blocks'], [_ocr_block("Signed")])
+        self.assertNotIn('ocr', components['text'])
+
+    def test_page_ocr_when_region_ocr_finds_nothing(self):
+        page = self.doc.new_page()
+        page.insert_image(fitz.Rect(72, 100, 132, 140), stream=_png())
+
+        components, _region, full = self._extract(page, [])
+        full.assert_called_once()
+        self.assertEqual(components['text']['ocr'], "page OCR text")
+
+
+@unittest.skipIf(fitz is None, "PyMuPDF is not installed")
+class ComponentSchemaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = fitz.open()
+
+    def tearDown(self):
+        self.doc.close()
+
+    def _extract(self, page):
+        with mock.patch.object(universal_pdf_extractor, 'perform_ocr', return_value="page OCR text"):
+            return universal_pdf_extractor.extract_page_components(page, self.doc, {})
+
+    def test_scanned_page_keeps_its_native_text_next_to_ocr(self):
+        page = self.doc.new_page()
+        page.insert_image(page.rect, stream=_png(), keep_proportion=False)
+        page.insert_text((72, 800), "p. 3", fontsize=10)
+
+        components = self._extract(page)
+        self.assertEqual(components['classification']['type'], PAGE_SCANNED)
+        self.assertIn("p. 3", components['text']['raw_text'])
+        self.assertTrue(components['text']['blocks'])
+        self.assertIn('text_page', components['text'])
+        self.assertEqual(components['text']['ocr'], "page OCR text")
+
+    def test_blank_page_keeps_text_and_background_components(self):
+        page = self.doc.new_page()
+
+        components = self._extract(page)
+        self.assertEqual(components['classification']['type'], PAGE_BLANK)
+        self.assertIn('text_page', components['text'])
+        self.assertEqual(components['text']['raw_text'].strip(), '')
+        self.assertIn('backgrounds', components)
+        self.assertNotIn('ocr', components['text'])
+
+
+if __name__ == "__main__":
+    unittest.main()
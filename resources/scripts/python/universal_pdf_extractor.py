@@ -14,17 +14,10 @@ from pathlib import Path
 import re
 import hashlib
 
-def safe_json_dump(obj):
-    """Safely dump object to JSON, handling special types"""
-    def default(o):
-        if isinstance(o, (fitz.Point, fitz.Rect, fitz.Matrix)):
-            return str(o)
-        elif isinstance(o, bytes):
-            return base64.b64encode(o).decode('utf-8')
-        else:
-            return str(o)
-    
-    return json.dumps(obj, ensure_ascii=False, default=default)
+import json_output
+from json_output import geom
+from extraction_container import ExtractionContainerWriter
+from page_classifier import classify_page, PAGE_SCANNED, PAGE_MIXED, PAGE_BLANK
 
 def extract_pdf_components(pdf_path):
     """Extract ALL components from PDF with maximum detail"""
@@ -51,109 +44,16 @@ def extract_pdf_components(pdf_path):
                 'links': {},
                 'backgrounds': {},
                 'fonts': extract_fonts(doc),
-                'layers': {}
+                'layers': {},
+                'classification': {}
             }
         }
         
-        # Process each page
+        # Process each page, region OCR results shared across pages
+        ocr_cache = {}
         for page_num, page in enumerate(doc, 1):
-            # Get page dimensions and properties
-            rect = page.rect
-            rotation = page.rotation
-            
-            page_info = {
-                'width': rect.width,
-                'height': rect.height,
-                'rotation': rotation,
-                'mediabox': [rect.x0, rect.y0, rect.x1, rect.y1],
-                'cropbox': list(page.cropbox),
-                'bleedbox': list(page.bleedbox) if page.bleedbox else None,
-                'trimbox': list(page.trimbox) if page.trimbox else None,
-                'artbox': list(page.artbox) if page.artbox else None
-            }
-            
-            # Extract all components for this page
-            
-            # 1. Text with complete formatting and positioning
-            text_data = extract_text_complete(page)
-            
-            # Always try to extract text, even if it seems empty
-            # Try multiple methods for CID fonts
-            raw_text = page.get_text().strip()
-            
-            # If no text, try with text page
-            if not raw_text:
-                try:
-                    tp = page.get_textpage()
-                    raw_text = tp.extractText()
-                except:
-                    pass
-            
-            # If still no text, try HTML extraction and parse it
-            if not raw_text:
-                try:
-                    html_text = page.get_text("html")
-                    # Extract text from HTML
-                    import re
-                    raw_text = re.sub(r'<[^>]+>', '', html_text)
-                except:
-                    pass
-            
-            # Log for debugging (commented to avoid JSON corruption)
-            # if raw_text:
-            #     import sys
-            #     print(f"Page {page_num} has {len(raw_text)} chars of raw text", file=sys.stderr)
-            
-            if text_data or raw_text:
-                result['components']['text'][page_num] = {
-                    'page_info': page_info,
-                    'blocks': text_data['blocks'] if text_data else [],
-                    'chars': text_data.get('chars', []) if text_data else [],
-                    'raw_text': raw_text,
-                    'text_page': extract_text_page_data(page)
-                }
-            
-            # 2. Images with all metadata and positioning
-            images = extract_images_complete(page, doc)
-            if images:
-                result['components']['images'][page_num] = images
-            
-            # 3. Vector graphics and drawings
-            drawings = extract_drawings_complete(page)
-            if drawings:
-                result['components']['drawings'][page_num] = drawings
-            
-            # 4. Tables detection and extraction
-            tables = extract_tables_advanced(page)
-            if tables:
-                result['components']['tables'][page_num] = tables
-            
-            # 5. Form fields and widgets
-            forms = extract_forms_complete(page)
-            if forms:
-                result['components']['forms'][page_num] = forms
-            
-            # 6. Annotations (comments, highlights, etc.)
-            annotations = extract_annotations_complete(page)
-            if annotations:
-                result['components']['annotations'][page_num] = annotations
-            
-            # 7. Links (internal and external)
-            links = extract_links_complete(page)
-            if links:
-                result['components']['links'][page_num] = links
-            
-            # 8. Page background/watermark detection
-            background = detect_background_elements(page)
-            if background:
-                result['components']['backgrounds'][page_num] = background
-            
-            # 9. OCR if needed (for scanned pages)
-            if not text_data or len(text_data.get('blocks', [])) == 0:
-                ocr_text = perform_ocr(page)
-                if ocr_text:
-                    result['components']['text'][page_num] = result['components']['text'].get(page_num, {})
-                    result['components']['text'][page_num]['ocr'] = ocr_text
+            for name, data in extract_page_components(page, doc, ocr_cache).items():
+                result['components'][name][page_num] = data
         
         doc.close()
         return result
@@ -165,6 +65,146 @@ def extract_pdf_components(pdf_path):
             'traceback': traceback.format_exc()
         }
 
+def extract_page_components(page, doc, ocr_cache=None):
+    """Extract all components of a single page, keyed by component name.
+    
+    ocr_cache is the region OCR cache of the document (see perform_region_ocr);
+    pass the same dict for every page so shared images are recognised once.
+    
+    Besides the components extracted for every page, the result holds:
+    - 'classification': the page type and the measures behind it (page_classifier.py)
+    - text['ocr']: full-page OCR, always run on scanned pages next to the native
+      text, and on other non-blank pages only when they produced no text block
+    - OCR blocks of the images of mixed pages, appended to text['blocks'] and
+      text['raw_text'] like native text
+    Scanned and blank pages without any drawing skip the drawing and table
+    passes, so they have no 'drawings' or 'tables' component.
+    """
+    components = {}
+    
+    # Get page dimensions and properties
+    rect = page.rect
+    rotation = page.rotation
+    
+    page_info = {
+        'width': rect.width,
+        'height': rect.height,
+        'rotation': rotation,
+        'mediabox': [rect.x0, rect.y0, rect.x1, rect.y1],
+        'cropbox': list(page.cropbox),
+        'bleedbox': list(page.bleedbox) if page.bleedbox else None,
+        'trimbox': list(page.trimbox) if page.trimbox else None,
+        'artbox': list(page.artbox) if page.artbox else None
+    }
+    
+    # Classify the page first so scanned and blank pages skip the expensive
+    # drawing and table passes unless the page actually has drawings
+    classification = classify_page(page)
+    components['classification'] = classification
+    page_type = classification['type']
+    lightweight = page_type in (PAGE_SCANNED, PAGE_BLANK)
+    extract_vectors = not lightweight or classification['drawing_count'] > 0
+    
+    # Extract all components for this page
+    
+    # 1. Text with complete formatting and positioning
+    text_data = extract_text_complete(page)
+    
+    # Always try to extract text, even if it seems empty
+    # Try multiple methods for CID fonts
+    raw_text = page.get_text().strip()
+    
+    # If no text, try with text page
+    if not raw_text:
+        try:
+            tp = page.get_textpage()
+            raw_text = tp.extractText()
+        except:
+            pass
+    
+    # If still no text, try HTML extraction and parse it
+    if not raw_text:
+        try:
+            html_text = page.get_text("html")
+            # Extract text from HTML
+            import re
+            raw_text = re.sub(r'<[^>]+>', '', html_text)
+        except:
+            pass
+    
+    # Log for debugging (commented to avoid JSON corruption)
+    # if raw_text:
+    #     import sys
+    #     print(f"Page {page.number + 1} has {len(raw_text)} chars of raw text", file=sys.stderr)
+    
+    if text_data or raw_text:
+        components['text'] = {
+            'page_info': page_info,
+            'blocks': text_data['blocks'] if text_data else [],
+            'chars': text_data.get('chars', []) if text_data else [],
+            'raw_text': raw_text,
+            'text_page': extract_text_page_data(page)
+        }
+    
+    # 2. Images with all metadata and positioning
+    images = extract_images_complete(page, doc)
+    if images:
+        components['images'] = images
+    
+    # 3. Vector graphics and drawings
+    # 4. Tables detection and extraction
+    if extract_vectors:
+        drawings = extract_drawings_complete(page)
+        if drawings:
+            components['drawings'] = drawings
+        
+        tables = extract_tables_advanced(page)
+        if tables:
+            components['tables'] = tables
+    
+    # 5. Form fields and widgets
+    forms = extract_forms_complete(page)
+    if forms:
+        components['forms'] = forms
+    
+    # 6. Annotations (comments, highlights, etc.)
+    annotations = extract_annotations_complete(page)
+    if annotations:
+        components['annotations'] = annotations
+    
+    # 7. Links (internal and external)
+    links = extract_links_complete(page)
+    if links:
+        components['links'] = links
+    
+    # 8. Page background/watermark detection
+    background = detect_background_elements(page)
+    if background:
+        components['backgrounds'] = background
+    
+    # 9. Region OCR for images on mixed pages (scanned signature, pasted screenshot...)
+    if page_type == PAGE_MIXED and 'text' in components:
+        ocr_blocks = perform_region_ocr(page, doc, ocr_cache)
+        if ocr_blocks:
+            text_component = components['text']
+            text_component['blocks'] = text_component['blocks'] + ocr_blocks
+            ocr_lines = [span['text'] for block in ocr_blocks for line in block['lines'] for span in line['spans']]
+            text_component['raw_text'] = '\n'.join(filter(None, [text_component['raw_text']] + ocr_lines))
+    
+    # 10. OCR: always for scanned pages (a page number or stamp does not make
+    # the scan readable), otherwise only when neither the text layer nor the
+    # region OCR above produced any text block
+    if page_type == PAGE_SCANNED:
+        ocr_text = perform_ocr(page, force=True)
+        if ocr_text:
+            components.setdefault('text', {})['ocr'] = ocr_text
+    elif page_type != PAGE_BLANK and not components.get('text', {}).get('blocks'):
+        ocr_text = perform_ocr(page)
+        if ocr_text:
+            components.setdefault('text', {})['ocr'] = ocr_text
+    
+    return components
+
 def extract_metadata(doc):
     """Extract complete document metadata"""
     metadata = doc.metadata.copy() if doc.metadata else {}
@@ -641,7 +681,7 @@ def extract_images_complete(page, doc):
                             'y': rect.y0,
                             'width': rect.width,
                             'height': rect.height,
-                            'transform': page.get_image_bbox(name) if name else None
+                            'transform': geom(page.get_image_bbox(name)) if name else None
                         })
                 else:
                     # If no rects found, try to get position from page resources
@@ -992,7 +1032,7 @@ def extract_links_complete(page):
                 'kind': link.get('kind'),  # 1=internal, 2=external, 3=launch, 4=named
                 'from': [link['from'].x0, link['from'].y0, link['from'].x1, link['from'].y1] if 'from' in link else None,
                 'page': link.get('page'),
-                'to': link.get('to'),
+                'to': geom(link.get('to')),
                 'file': link.get('file'),
                 'uri': link.get('uri'),
                 'xref': link.get('xref')
@@ -1059,13 +1099,13 @@ def detect_background_elements(page):
     
     return background
 
-def perform_ocr(page):
-    """Perform OCR on page if needed"""
+def perform_ocr(page, force=False):
+    """Perform OCR on page if needed (page without text, or force)"""
     ocr_result = None
     
     try:
         # Check if page has no text
-        text = page.get_text()
+        text = '' if force else page.get_text()
         if not text.strip():
             # Page seems to be scanned - perform OCR
             # Note: This requires tesseract to be installed
@@ -1083,7 +1123,8 @@ def perform_ocr(page):
                     result = subprocess.run(
                         ['tesseract', tmp.name, 'stdout', '--dpi', '300', 'hocr'],
                         capture_output=True,
-                        text=True
+                        text=True,
+                        timeout=PAGE_OCR_TIMEOUT
                     )
                     
                     if result.returncode == 0:
@@ -1104,6 +1145,285 @@ def perform_ocr(page):
     
     return ocr_result
 
+# Images smaller than this (in pixels) are not worth sending to tesseract
+REGION_OCR_MIN_WIDTH = 32
+REGION_OCR_MIN_HEIGHT = 16
+
+# Seconds tesseract may spend on one image or page
+REGION_OCR_TIMEOUT = 60
+PAGE_OCR_TIMEOUT = 180
+
+def _region_ocr_tsv(doc, xref, dpi, cache):
+    """Tesseract TSV of an image xref, cached by xref (None if OCR failed or was skipped)"""
+    import subprocess
+    import tempfile
+    
+    if xref in cache:
+        return cache[xref]
+    
+    result = None
+    pix = fitz.Pixmap(doc, xref)
+    if pix.width >= REGION_OCR_MIN_WIDTH and pix.height >= REGION_OCR_MIN_HEIGHT:
+        # Tesseract wants gray or RGB without alpha
+        if pix.colorspace and pix.colorspace.n > 3:
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
+            pix.save(tmp.name)
+        try:
+            completed = subprocess.run(
+                ['tesseract', tmp.name, 'stdout', '--dpi', str(dpi), 'tsv'],
+                capture_output=True,
+                text=True,
+                timeout=REGION_OCR_TIMEOUT
+            )
+            if completed.returncode == 0:
+                result = (completed.stdout, pix.width, pix.height)
+        except subprocess.TimeoutExpired:
+            sys.stderr.write(f"Region OCR timed out for image {xref}\n")
+        finally:
+            os.unlink(tmp.name)
+    
+    cache[xref] = result
+    return result
+
+def perform_region_ocr(page, doc, cache=None):
+    """OCR only the images placed on the page, at their native resolution.
+    
+    Each image is decoded and recognised once per document when the same
+    cache dict is passed for every page (results are keyed by xref, no page
+    render) and the recognised words are mapped
+    back to page coordinates through each placement matrix. Images whose
+    area already carries a text layer are skipped. A failing image does not
+    stop the others. Returns text blocks in the same shape as
+    extract_text_complete.
+    """
+    blocks = []
+    if cache is None:
+        cache = {}
+    
+    for img in page.get_images(full=True):
+        xref = img[0]
+        if xref == 0:
+            continue
+        
+        try:
+            placements = page.get_image_rects(xref, transform=True)
+            # Skip images whose area already has extractable text (e.g. OCR layer)
+            placements = [(bbox, matrix) for bbox, matrix in placements
+                          if not bbox.is_empty and not page.get_textbox(bbox).strip()]
+            if not placements:
+                continue
+            
+            # Effective resolution of the image as placed on the page
+            bbox = placements[0][0]
+            dpi = max(int(img[2] / (bbox.width / 72.0)), 70) if bbox.width > 0 else 300
+            
+            ocr = _region_ocr_tsv(doc, xref, dpi, cache)
+            if not ocr:
+                continue
+            
+            tsv, width, height = ocr
+            for bbox, matrix in placements:
+                blocks.extend(ocr_tsv_to_blocks(tsv, width, height, matrix, xref))
+        except FileNotFoundError:
+            # Tesseract not available
+            break
+        except Exception as e:
+            sys.stderr.write(f"Region OCR failed for image {xref} on page {page.number + 1}: {e}\n")
+    
+    return blocks
+
+def ocr_tsv_to_blocks(tsv, img_width, img_height, matrix, xref):
+    """Convert tesseract TSV output into text blocks in page coordinates"""
+    lines = {}
+    
+    for row in tsv.splitlines()[1:]:
+        cols = row.split('\t')
+        if len(cols) < 12 or not cols[11].strip():
+            continue
+        
+        try:
+            conf = float(cols[10])
+        except ValueError:
+            continue
+        if conf < 0:
+            continue
+        
+        left, top, width, height = (int(v) for v in cols[6:10])
+        
+        # Pixel coordinates -> unit image space -> page space
+        p0 = fitz.Point(left / img_width, top / img_height) * matrix
+        p1 = fitz.Point((left + width) / img_width, (top + height) / img_height) * matrix
+        word_bbox = fitz.Rect(p0, p1)
+        word_bbox.normalize()
+        
+        key = (int(cols[2]), int(cols[3]), int(cols[4]))  # block, paragraph, line
+        lines.setdefault(key, []).append({
+            'text': cols[11],
+            'bbox': [word_bbox.x0, word_bbox.y0, word_bbox.x1, word_bbox.y1],
+            'conf': conf
+        })
+    
+    blocks_by_id = {}
+    for (block_num, par_num, line_num), words in sorted(lines.items()):
+        x0 = min(w['bbox'][0] for w in words)
+        y0 = min(w['bbox'][1] for w in words)
+        x1 = max(w['bbox'][2] for w in words)
+        y1 = max(w['bbox'][3] for w in words)
+        
+        block = blocks_by_id.setdefault(block_num, {
+            'type': 'text',
+            'bbox': [x0, y0, x1, y1],
+            'ocr': True,
+            'source_xref': xref,
+            'lines': []
+        })
+        bb = block['bbox']
+        block['bbox'] = [min(bb[0], x0), min(bb[1], y0), max(bb[2], x1), max(bb[3], y1)]
+        
+        block['lines'].append({
+            'bbox': [x0, y0, x1, y1],
+            'spans': [{
+                'text': ' '.join(w['text'] for w in words),
+                'bbox': [x0, y0, x1, y1],
+                'font': 'OCR',
+                'size': y1 - y0,
+                'color': '#000000',
+                'bold': False,
+                'italic': False,
+                'confidence': sum(w['conf'] for w in words) / len(words),
+                'words': words
+            }],
+            'dir': [1, 0],
+            'wmode': 0
+        })
+    
+    return list(blocks_by_id.values())
+
+def extract_pdf_to_container(pdf_path, output_path):
+    """Extract all components into a random-access container file (see extraction_container.py)"""
+    try:
+        doc = fitz.open(pdf_path)
+        fitz.TOOLS.set_aa_level(0)
+        
+        with ExtractionContainerWriter(output_path, len(doc), serializer=json_output.dumps) as writer:
+            writer.add_section('metadata', extract_metadata(doc))
+            writer.add_section('outline', extract_outline(doc))
+            writer.add_section('embedded_files', extract_embedded_files(doc))
+            writer.add_section('fonts', extract_fonts(doc))
+            
+            # Each page is written as soon as it is extracted
+            ocr_cache = {}
+            for page_num, page in enumerate(doc, 1):
+                writer.add_page(page_num, {
+                    'page': page_num,
+                    'components': extract_page_components(page, doc, ocr_cache)
+                })
+        
+        page_count = len(doc)
+        doc.close()
+        
+        return {
+            'success': True,
+            'pages': page_count,
+            'format': 'container',
+            'output': output_path,
+            'size': os.path.getsize(output_path)
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+
+def extract_page_range(pdf_path, first_page, last_page=None):
+    """Extract all components of one page or a range of pages (1-based, inclusive)"""
+    try:
+        doc = fitz.open(pdf_path)
+        fitz.TOOLS.set_aa_level(0)
+        
+        last_page = last_page or first_page
+        if first_page < 1 or last_page > doc.page_count or first_page > last_page:
+            page_count = doc.page_count
+            doc.close()
+            return {
+                'success': False,
+                'error': f'Page range {first_page}-{last_page} out of range (1-{page_count})'
+            }
+        
+        result = {
+            'success': True,
+            'pages': doc.page_count,
+            'range': [first_page, last_page],
+            'components': {
+                'text': {},
+                'images': {},
+                'drawings': {},
+                'tables': {},
+                'forms': {},
+                'annotations': {},
+                'links': {},
+                'backgrounds': {},
+                'classification': {}
+            }
+        }
+        
+        ocr_cache = {}
+        for page_num in range(first_page, last_page + 1):
+            page = doc[page_num - 1]
+            for name, data in extract_page_components(page, doc, ocr_cache).items():
+                result['components'][name][page_num] = data
+        
+        doc.close()
+        return result
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+
+def probe_pdf(pdf_path):
+    """Cheap document overview: page count, page sizes, outline and metadata.
+    
+    Only the page tree is read, page content streams are never interpreted.
+    """
+    try:
+        doc = fitz.open(pdf_path)
+        
+        page_sizes = []
+        for page in doc:
+            rect = page.rect
+            page_sizes.append({
+                'width': rect.width,
+                'height': rect.height,
+                'rotation': page.rotation
+            })
+        
+        result = {
+            'success': True,
+            'pages': doc.page_count,
+            'page_sizes': page_sizes,
+            'outline': extract_outline(doc),
+            'metadata': extract_metadata(doc)
+        }
+        
+        doc.close()
+        return result
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+
 def render_page_as_image(pdf_path, page_num, dpi=150):
     """Render a specific page as high-quality image"""
     try:
@@ -1172,13 +1492,27 @@ def main():
             page_num = int(sys.argv[3]) if len(sys.argv) > 3 else 1
             dpi = int(sys.argv[4]) if len(sys.argv) > 4 else 150
             result = render_page_as_image(pdf_path, page_num, dpi)
+        elif action == 'extract-page':
+            first_page = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+            last_page = int(sys.argv[4]) if len(sys.argv) > 4 else first_page
+            result = extract_page_range(pdf_path, first_page, last_page)
+        elif action == 'probe':
+            result = probe_pdf(pdf_path)
+        elif action == 'extract-container':
+            if len(sys.argv) < 4:
+                result = {
+                    'success': False,
+                    'error': 'Usage: python universal_pdf_extractor.py extract-container <pdf_path> <output_path>'
+                }
+            else:
+                result = extract_pdf_to_container(pdf_path, sys.argv[3])
         else:
             result = {
                 'success': False,
                 'error': f'Unknown action: {action}'
             }
         
-        print(safe_json_dump(result))
+        json_output.dump(result)
         
     except Exception as e:
         print(json.dumps({